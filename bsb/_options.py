@@ -116,6 +116,128 @@ class ProfilingOption(
         return False
 
 
+class PoolBackendOption(
+    BsbOption,
+    name="pool_backend",
+    cli=("pool", "pool-backend"),
+    project=("pool_backend",),
+    script=("pool_backend",),
+    env=("BSB_POOL_BACKEND",),
+):
+    """
+    Set the job pool backend to use when not running under MPI. ``serial`` runs the jobs
+    one after the other, ``processes`` spreads them over local worker processes and
+    ``threads`` over local worker threads.
+    """
+
+    def get_default(self):
+        return "serial"
+
+
+class PoolWorkersOption(
+    BsbOption,
+    name="pool_workers",
+    cli=("j", "workers"),
+    project=("pool_workers",),
+    script=("pool_workers",),
+    env=("BSB_POOL_WORKERS",),
+):
+    """
+    Set the amount of local workers of the job pool. Defaults to the amount of CPU cores.
+    """
+
+    def setter(self, value):
+        return int(value)
+
+    def getter(self, value):
+        return int(value)
+
+    def get_default(self):
+        return None
+
+
+class PoolTraceOption(
+    BsbOption,
+    name="pool_trace",
+    cli=("trace", "pool-trace"),
+    project=("pool_trace",),
+    script=("pool_trace",),
+    env=("BSB_POOL_TRACE",),
+):
+    """
+    Write the timings and resource usage of each job to a Chrome trace file at the given
+    path, to inspect the job pool execution in ``chrome://tracing`` or Perfetto.
+    """
+
+    def get_default(self):
+        return None
+
+
+class PoolProgressOption(
+    BsbOption,
+    name="pool_progress",
+    cli=("progress", "pool-progress"),
+    project=("pool_progress",),
+    script=("pool_progress",),
+    env=("BSB_POOL_PROGRESS",),
+):
+    """
+    Send the progress of the job pool to the given sinks: ``log`` reports a progress
+    line every few seconds, ``json`` writes each job event as a line of JSON to stdout,
+    and ``json:<path>`` to a file. Multiple sinks can be comma separated.
+    """
+
+    def get_default(self):
+        return None
+
+
+class WriteBufferOption(
+    BsbOption,
+    name="write_buffer",
+    cli=("write-buffer",),
+    project=("write_buffer",),
+    script=("write_buffer",),
+    env=("BSB_WRITE_BUFFER",),
+):
+    """
+    Set the amount of bytes of placement and connectivity data that each job can buffer
+    in memory before writing it to the storage. Set to 0 to write all data immediately.
+    """
+
+    def setter(self, value):
+        return int(value)
+
+    def getter(self, value):
+        return int(value)
+
+    def get_default(self):
+        return 64 * 1024 * 1024
+
+
+class DatasetCacheOption(
+    BsbOption,
+    name="dataset_cache",
+    cli=("dataset-cache",),
+    project=("dataset_cache",),
+    script=("dataset_cache",),
+    env=("BSB_DATASET_CACHE",),
+):
+    """
+    Set the amount of bytes of loaded datasets that each process keeps in memory, so that
+    repeated loads of the same data are served from memory. Set to 0 to disable the
+    cache.
+    """
+
+    def setter(self, value):
+        return int(value)
+
+    def getter(self, value):
+        return int(value)
+
+    def get_default(self):
+        return 256 * 1024 * 1024
+
+
 def verbosity():
     return VerbosityOption
 
@@ -134,3 +256,27 @@ def config():
 
 def profiling():
     return ProfilingOption
+
+
+def pool_backend():
+    return PoolBackendOption
+
+
+def pool_workers():
+    return PoolWorkersOption
+
+
+def pool_trace():
+    return PoolTraceOption
+
+
+def pool_progress():
+    return PoolProgressOption
+
+
+def write_buffer():
+    return WriteBufferOption
+
+
+def dataset_cache():
+    return DatasetCacheOption
@@ -50,6 +50,12 @@ class Clear(
     pass
 
 
+class Resume(
+    BsbOption, name="resume", cli=("resume",), env=("BSB_RESUME_MODE",), flag=True
+):
+    pass
+
+
 class Output(BsbOption, name="output", cli=("output", "o"), env=("BSB_OUTPUT_FILE",)):
     pass
 
@@ -145,6 +151,7 @@ class BsbCompile(BaseCommand, name="compile"):
             force=context.force,
             append=context.append,
             redo=context.redo,
+            resume=context.resume,
         )
 
         if context.plot:
@@ -167,6 +174,7 @@ class BsbCompile(BaseCommand, name="compile"):
             "append": Append(),
             "redo": Redo(),
             "clear": Clear(),
+            "resume": Resume(),
             "plot": Plot(),
             "output": Output(),
         }
@@ -175,6 +183,35 @@ class BsbCompile(BaseCommand, name="compile"):
         pass
 
 
+class BsbPlan(BaseCommand, name="plan"):
+    def handler(self, context):
+        cfg = from_file(context.config)
+        network = Scaffold(cfg)
+        network.resize(context.x, context.y, context.z)
+        plan = network.plan(
+            skip_placement=context.skip_placement,
+            skip_connectivity=context.skip_connectivity,
+            only=_flatten_arr_args(context.only),
+            skip=_flatten_arr_args(context.skip),
+        )
+        print(plan)
+
+    def get_options(self):
+        return {
+            "x": XScale(),
+            "y": YScale(),
+            "z": ZScale(),
+            "skip": Skip(),
+            "only": Only(),
+            "config": ConfigOption(positional=True),
+            "no_placement": SkipPlacement(),
+            "no_connectivity": SkipConnectivity(),
+        }
+
+    def add_parser_arguments(self, parser):
+        pass
+
+
 class BsbReconfigure(BaseCommand, name="reconfigure"):
     def handler(self, context):
         cfg = from_file(context.config)
@@ -3,8 +3,9 @@ import numpy as np
 import functools
 from .strategy import ConnectionStrategy
 from ..exceptions import SourceQualityError
-from .. import config, _util as _gutil
+from .. import config
 from ..config import types
+from ..mixins import ThreadSafe
 from ..reporting import warn
 
 
@@ -21,11 +22,13 @@ class Convergence(ConnectionStrategy):
         raise NotImplementedError("Needs to be restored, please open an issue.")
 
 
-class AllToAll(ConnectionStrategy):
+class AllToAll(ThreadSafe, ConnectionStrategy):
     """
     All to all connectivity between two neural populations
     """
 
+    roi_before_placement = True
+
     def get_region_of_interest(self, chunk):
         # All to all needs all pre chunks per post chunk.
         # Fingers crossed for out of memory errors.
@@ -33,9 +36,7 @@ class AllToAll(ConnectionStrategy):
 
     @functools.cache
     def _get_all_post_chunks(self):
-        all_ps = (ct.get_placement_set() for ct in self.postsynaptic.cell_types)
-        chunks = set(_gutil.ichain(ps.get_all_chunks() for ps in all_ps))
-        return list(chunks)
+        return self.get_all_chunks(self.postsynaptic.cell_types)
 
     def connect(self, pre, post):
         for from_ps in pre.placement.values():
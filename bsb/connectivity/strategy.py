@@ -3,6 +3,9 @@ from ..config import refs, types
 from ..profiling import node_meter
 from ..reporting import report, warn
 from .._util import SortableByAfter, obj_str_insert
+from .. import _util as _gutil
+from ..services.pool import count_rows
+from ..services.policy import JobPolicy
 import abc
 from itertools import chain
 
@@ -49,6 +52,11 @@ class ConnectionStrategy(abc.ABC, SortableByAfter):
     presynaptic = config.attr(type=Hemitype, required=True)
     postsynaptic = config.attr(type=Hemitype, required=True)
     after = config.reflist(refs.connectivity_ref)
+    policy = config.attr(type=JobPolicy, default=dict, call_default=True)
+    #: Whether the regions of interest can be determined from the chunks that the queued
+    #: placement jobs will place cells in. Such strategies can be queued together with
+    #: the placement, and each of their jobs starts once the chunks it needs are placed.
+    roi_before_placement = False
 
     def __init_subclass__(cls, **kwargs):
         super(cls, cls).__init_subclass__(**kwargs)
@@ -57,6 +65,7 @@ class ConnectionStrategy(abc.ABC, SortableByAfter):
 
     def __boot__(self):
         self._queued_jobs = []
+        self._queued_chunks = {}
 
     @obj_str_insert
     def __repr__(self):
@@ -93,7 +102,8 @@ class ConnectionStrategy(abc.ABC, SortableByAfter):
         cs = self.scaffold.require_connectivity_set(
             pre_set.cell_type, post_set.cell_type, tag if tag is not None else self.name
         )
-        cs.connect(pre_set, post_set, src_locs, dest_locs)
+        self.scaffold.storage.connect(cs, pre_set, post_set, src_locs, dest_locs)
+        count_rows(len(src_locs))
 
     @abc.abstractmethod
     def get_region_of_interest(self, chunk):
@@ -107,15 +117,12 @@ class ConnectionStrategy(abc.ABC, SortableByAfter):
         """
         # Reset jobs that we own
         self._queued_jobs = []
+        self._queued_chunks = pool.get_queued_chunks(self.get_cell_types())
         # Get the queued jobs of all the strategies we depend on.
         deps = set(chain.from_iterable(strat._queued_jobs for strat in self.get_after()))
         pre_types = self.presynaptic.cell_types
         # Iterate over each chunk that is populated by our presynaptic cell types.
-        from_chunks = set(
-            chain.from_iterable(
-                ct.get_placement_set().get_all_chunks() for ct in pre_types
-            )
-        )
+        from_chunks = set(self.get_all_chunks(pre_types))
         rois = {
             chunk: roi
             for chunk in from_chunks
@@ -132,5 +139,14 @@ class ConnectionStrategy(abc.ABC, SortableByAfter):
             self._queued_jobs.append(job)
         report(f"Queued {len(self._queued_jobs)} jobs for {self.name}", level=2)
 
+    def get_all_chunks(self, cell_types):
+        """
+        Return the chunks that contain cells of the given cell types, including the
+        chunks of the placement jobs that are queued in the same pool as this strategy.
+        """
+        placed = (ct.get_placement_set().get_all_chunks() for ct in cell_types)
+        queued = (self._queued_chunks.get(ct.name, []) for ct in cell_types)
+        return _gutil.unique(chain(*placed, *queued))
+
     def get_cell_types(self):
         return set(self.presynaptic.cell_types) | set(self.postsynaptic.cell_types)
@@ -15,7 +15,7 @@ from .exceptions import (
 )
 from .reporting import report, warn
 from .config._config import Configuration
-from .services.pool import create_job_pool
+from .services.pool import create_job_pool, count_rows, JobJournal
 from .services import MPI
 from .simulation import get_simulation_adapter
 from ._util import obj_str_insert
@@ -246,43 +246,95 @@ class Scaffold:
         )
 
     @meter()
-    def run_placement(self, strategies=None, DEBUG=True, pipelines=True):
+    def run_placement(self, strategies=None, DEBUG=True, pipelines=True, journal=None):
         """
         Run placement strategies.
+
+        :param journal: Journal to record the completed jobs in, and to resume from.
+        :type journal: ~bsb.services.pool.JobJournal
         """
         if pipelines:
             self.run_pipelines()
         if strategies is None:
             strategies = list(self.placement.values())
         strategies = PlacementStrategy.resolve_order(strategies)
-        pool = create_job_pool(self)
-        if pool.is_master():
-            for strategy in strategies:
-                strategy.queue(pool, self.network.chunk_size)
-            loop = self._progress_terminal_loop(pool, debug=DEBUG)
-            try:
-                pool.execute(loop)
-            except Exception:
-                self._stop_progress_loop(loop, debug=DEBUG)
-                raise
-            finally:
-                self._stop_progress_loop(loop, debug=DEBUG)
-        else:
-            pool.execute()
+        self._run_jobs(placement=strategies, DEBUG=DEBUG, journal=journal)
 
     @meter()
-    def run_connectivity(self, strategies=None, DEBUG=True, pipelines=True):
+    def run_connectivity(self, strategies=None, DEBUG=True, pipelines=True, journal=None):
         """
         Run connection strategies.
+
+        :param journal: Journal to record the completed jobs in, and to resume from.
+        :type journal: ~bsb.services.pool.JobJournal
         """
         if pipelines:
             self.run_pipelines()
         if strategies is None:
             strategies = list(self.connectivity.values())
         strategies = ConnectionStrategy.resolve_order(strategies)
-        pool = create_job_pool(self)
+        self._run_jobs(connectivity=strategies, DEBUG=DEBUG, journal=journal)
+
+    @meter()
+    def run_placement_and_connectivity(
+        self, p_strats=None, c_strats=None, DEBUG=True, pipelines=True, journal=None
+    ):
+        """
+        Run placement and connection strategies. The connection strategies that can
+        determine their regions of interest before placement (see
+        :attr:`~.connectivity.strategy.ConnectionStrategy.roi_before_placement`) run in
+        the same job pool as the placement. Each of their jobs starts as soon as the
+        chunks it connects are placed. Connection strategies of cell types that are
+        not placed chunk by chunk (see
+        :attr:`~.placement.strategy.PlacementStrategy.chunk_local`), and all other
+        connection strategies, run after the placement.
+
+        :param journal: Journal to record the completed jobs in, and to resume from.
+        :type journal: ~bsb.services.pool.JobJournal
+        """
+        if pipelines:
+            self.run_pipelines()
+        if p_strats is None:
+            p_strats = list(self.placement.values())
+        if c_strats is None:
+            c_strats = list(self.connectivity.values())
+        p_strats = PlacementStrategy.resolve_order(p_strats)
+        c_strats = ConnectionStrategy.resolve_order(c_strats)
+        # Strategies can only be queued with the placement if the queued placement jobs
+        # tell which chunks their cell types are placed in, and if the strategies they
+        # come after are queued with the placement as well.
+        early = []
+        for strategy in c_strats:
+            cell_types = strategy.get_cell_types()
+            if (
+                strategy.roi_before_placement
+                and all(
+                    p.chunk_local
+                    for p in p_strats
+                    if any(ct in cell_types for ct in p.cell_types)
+                )
+                and all(
+                    after in early or after not in c_strats
+                    for after in strategy.get_after()
+                )
+            ):
+                early.append(strategy)
+        late = [s for s in c_strats if s not in early]
+        report(
+            "Connecting during placement: " + ", ".join(s.name for s in early), level=2
+        )
+        self._run_jobs(
+            placement=p_strats, connectivity=early, DEBUG=DEBUG, journal=journal
+        )
+        if late:
+            self._run_jobs(connectivity=late, DEBUG=DEBUG, journal=journal)
+
+    def _run_jobs(self, placement=(), connectivity=(), DEBUG=True, journal=None):
+        pool = create_job_pool(self, journal=journal)
         if pool.is_master():
-            for strategy in strategies:
+            for strategy in placement:
+                strategy.queue(pool, self.network.chunk_size)
+            for strategy in connectivity:
                 strategy.queue(pool)
             loop = self._progress_terminal_loop(pool, debug=DEBUG)
             try:
@@ -337,23 +389,30 @@ class Scaffold:
         append=False,
         redo=False,
         force=False,
+        resume=False,
     ):
         """
         Run reconstruction steps in the scaffold sequence to obtain a full network.
+
+        With ``resume`` the completed jobs are recorded in a journal in the file store,
+        and resuming an interrupted compilation skips the jobs that were completed, and
+        clears the chunks of the placement jobs that weren't.
         """
         existed = self.storage.preexisted
         p_strats = self.get_placement(skip=skip, only=only)
         c_strats = self.get_connectivity(skip=skip, only=only)
         todo_list_str = ", ".join(s.name for s in itertools.chain(p_strats, c_strats))
         report(f"Compiling the following strategies: {todo_list_str}", level=2)
-        if sum((bool(clear), bool(redo), bool(append))) > 1:
-            raise InputError("`clear`, `redo` and `append` are mutually exclusive.")
+        if sum((bool(clear), bool(redo), bool(append), bool(resume))) > 1:
+            raise InputError(
+                "`clear`, `redo`, `append` and `resume` are mutually exclusive."
+            )
         if existed:
-            if not (clear or append or redo):
+            if not (clear or append or redo or resume):
                 raise FileExistsError(
                     f"The `{self.storage.format}` storage"
                     + f" at `{self.storage.root}` already exists."
-                    + " Use the `clear`, `append` or `redo` arguments"
+                    + " Use the `clear`, `append`, `redo` or `resume` arguments"
                     + " to pick what to do with stored data."
                 )
             if clear:
@@ -368,19 +427,32 @@ class Scaffold:
                 p_strats, c_strats = self._redo_chain(p_strats, c_strats, skip, force)
             # else:
             #   append mode is luckily simpler, just don't clear anything :)
+        # Only compilations that can be resumed keep a journal.
+        journal = JobJournal(self.files, resume=existed) if resume else None
 
         t = time.time()
         self.run_pipelines()
-        if not skip_placement:
+        # Overlap placement and connectivity, unless after placement hooks need to run
+        # in between.
+        overlap = not (skip_placement or skip_connectivity) and (
+            skip_after_placement or not self.after_placement
+        )
+        if overlap:
+            todo = ", ".join(s.name for s in itertools.chain(p_strats, c_strats))
+            report(f"Starting placement and connectivity strategies: {todo}", level=2)
+            self.run_placement_and_connectivity(
+                p_strats, c_strats, pipelines=False, journal=journal
+            )
+        if not skip_placement and not overlap:
             placement_todo = ", ".join(s.name for s in p_strats)
             report(f"Starting placement strategies: {placement_todo}", level=2)
-            self.run_placement(p_strats, pipelines=False)
+            self.run_placement(p_strats, pipelines=False, journal=journal)
         if not skip_after_placement:
             self.run_after_placement(pipelines=False)
-        if not skip_connectivity:
+        if not skip_connectivity and not overlap:
             connectivity_todo = ", ".join(s.name for s in c_strats)
             report(f"Starting connectivity strategies: {connectivity_todo}", level=2)
-            self.run_connectivity(c_strats, pipelines=False)
+            self.run_connectivity(c_strats, pipelines=False, journal=journal)
         if not skip_after_connectivity:
             self.run_after_connectivity(pipelines=False)
         report("Runtime: {}".format(time.time() - t), 2)
@@ -388,6 +460,29 @@ class Scaffold:
         # the `clear`, `redo` and `append` flags take effect on a second `compile` pass.
         self.storage._preexisted = True
 
+    def plan(self, skip_placement=False, skip_connectivity=False, only=None, skip=None):
+        """
+        Plan the compilation of the network, without running it. Each strategy queues
+        its jobs, and the amount of cells they place, connections they make, storage
+        they write and memory they use are estimated from the placement indicators and
+        the regions of interest of the jobs. The amount of connections is an upper bound,
+        the amount of cell pairs in the regions of interest.
+
+        :returns: The estimates per strategy, print it to obtain a report.
+        :rtype: ~bsb.planning.CompilationPlan
+        """
+        from .planning import plan_compilation
+
+        p_strats = [] if skip_placement else self.get_placement(skip=skip, only=only)
+        c_strats = (
+            [] if skip_connectivity else self.get_connectivity(skip=skip, only=only)
+        )
+        return plan_compilation(
+            self,
+            PlacementStrategy.resolve_order(p_strats),
+            ConnectionStrategy.resolve_order(c_strats),
+        )
+
     @meter()
     def run_pipelines(self, pipelines=None, DEBUG=True):
         if pipelines is None:
@@ -457,13 +552,15 @@ class Scaffold:
             chunk = Chunk([0, 0, 0], self.network.chunk_size)
         if hasattr(chunk, "dimensions") and np.any(np.isnan(chunk.dimensions)):
             chunk.dimensions = self.network.chunk_size
-        self.get_placement_set(cell_type).append_data(
+        self.storage.append_data(
+            self.get_placement_set(cell_type),
             chunk,
             positions=positions,
             morphologies=morphologies,
             rotations=rotations,
             additional=additional,
         )
+        count_rows(len(positions) if positions is not None else 0)
 
     def create_entities(self, cell_type, count):
         """
@@ -485,6 +582,7 @@ class Scaffold:
         # Append entity data to the default chunk 000
         chunk = Chunk([0, 0, 0], self.network.chunk_size)
         ps.append_entities(chunk, count)
+        count_rows(count)
 
     def get_placement(
         self, cell_types=None, skip=None, only=None
@@ -620,12 +718,15 @@ class Scaffold:
     def _progress_terminal_loop(self, pool, debug=False):
         import time
 
+        # The loops read the job counters of the pool, that are updated as the jobs
+        # complete, instead of inspecting each job.
         if debug:
 
             def loop(jobs):
-                print("Total jobs:", len(jobs))
-                print("Running jobs:", sum(1 for q in jobs if q._future.running()))
-                print("Finished:", sum(1 for q in jobs if q._future.done()))
+                progress = pool.progress
+                print("Total jobs:", progress.total)
+                print("Running jobs:", len(progress.running))
+                print("Finished:", progress.done)
                 time.sleep(1)
 
             return loop
@@ -638,16 +739,15 @@ class Scaffold:
         stdscr.keypad(True)
 
         def loop(jobs):
-            total = len(jobs)
-            running = list(q for q in jobs if q._future.running())
-            done = sum(1 for q in jobs if q._future.done())
+            progress = pool.progress
+            running = progress.running
 
             stdscr.clear()
             stdscr.addstr(0, 0, "-- Reconstruction progress --")
-            stdscr.addstr(1, 2, f"Total jobs: {total}")
-            stdscr.addstr(2, 2, f"Remaining jobs: {total - done}")
+            stdscr.addstr(1, 2, f"Total jobs: {progress.total}")
+            stdscr.addstr(2, 2, f"Remaining jobs: {progress.remaining}")
             stdscr.addstr(3, 2, f"Running jobs: {len(running)}")
-            stdscr.addstr(4, 2, f"Finished jobs: {done}")
+            stdscr.addstr(4, 2, f"Finished jobs: {progress.done}")
             for i, j in enumerate(running):
                 stdscr.addstr(
                     6 + i,
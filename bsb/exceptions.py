@@ -38,6 +38,7 @@ _t(
             RedoError=_e(),
         ),
         DependencyError=_e(),
+        JobPoolError=_e(),
         GatewayError=_e(
             AllenApiError=_e(),
         ),
@@ -1,6 +1,5 @@
 from .reporting import report
 from .storage import Chunk
-from . import _util as _gutil
 
 import itertools
 
@@ -16,24 +15,17 @@ def _queue_placement(self, pool, chunk_size):
     report(f"Queued serial job for {self.name}", level=2)
 
 
-def _all_chunks(iter_):
-    return _gutil.unique(
-        itertools.chain.from_iterable(
-            ct.get_placement_set().get_all_chunks() for ct in iter_
-        )
-    )
-
-
 def _queue_connectivity(self, pool):
     # Reset jobs that we own
     self._queued_jobs = []
+    self._queued_chunks = pool.get_queued_chunks(self.get_cell_types())
     # Get the queued jobs of all the strategies we depend on.
     deps = set(
         itertools.chain.from_iterable(strat._queued_jobs for strat in self.get_after())
     )
     # Schedule all chunks in 1 job
-    pre_chunks = _all_chunks(self.presynaptic.cell_types)
-    post_chunks = _all_chunks(self.postsynaptic.cell_types)
+    pre_chunks = self.get_all_chunks(self.presynaptic.cell_types)
+    post_chunks = self.get_all_chunks(self.postsynaptic.cell_types)
     job = pool.queue_connectivity(self, pre_chunks, post_chunks, deps=deps)
     self._queued_jobs.append(job)
     report(f"Queued serial job for {self.name}", level=2)
@@ -51,8 +43,12 @@ class NotParallel:
         super().__init_subclass__(**kwargs)
         if PlacementStrategy in cls.__mro__:
             cls.queue = _queue_placement
+            # The single job places cells in any chunk.
+            cls.chunk_local = False
         elif ConnectionStrategy in cls.__mro__:
             cls.queue = _queue_connectivity
+            # The single job connects all chunks, so it waits for all of their placement.
+            cls.roi_before_placement = True
             if "get_region_of_interest" not in cls.__dict__:
                 cls.get_region_of_interest = _raise_na
         else:
@@ -60,3 +56,13 @@ class NotParallel:
                 "NotParallel can only be applied to placement or "
                 "connectivity strategies"
             )
+
+
+class ThreadSafe:
+    """
+    Marks a placement or connectivity strategy as safe to execute concurrently on a shared
+    scaffold. Under the ``threads`` job pool backend the jobs of thread safe strategies
+    skip serialization and run in parallel, while all other jobs run one at a time.
+    """
+
+    _thread_safe = True
@@ -11,6 +11,8 @@ from ..config import refs, types
 from .._util import SortableByAfter, obj_str_insert
 from ..voxels import VoxelSet
 from ..storage import Chunk
+from ..mixins import ThreadSafe
+from ..services.policy import JobPolicy
 from .indicator import PlacementIndications, PlacementIndicator
 from .distributor import DistributorsNode
 import numpy as np
@@ -31,7 +33,12 @@ class PlacementStrategy(abc.ABC, SortableByAfter):
     overrides = config.dict(type=PlacementIndications)
     after = config.reflist(refs.placement_ref)
     distribute = config.attr(type=DistributorsNode, default=dict, call_default=True)
+    policy = config.attr(type=JobPolicy, default=dict, call_default=True)
     indicator_class = PlacementIndicator
+    #: Whether each placement job only places cells in the chunk that it was queued for.
+    #: Connection strategies can only be queued with the placement if the placement of
+    #: their cell types is chunk local.
+    chunk_local = True
 
     def __init_subclass__(cls, **kwargs):
         super(cls, cls).__init_subclass__(**kwargs)
@@ -149,7 +156,7 @@ class PlacementStrategy(abc.ABC, SortableByAfter):
 
 
 @config.node
-class FixedPositions(PlacementStrategy):
+class FixedPositions(ThreadSafe, PlacementStrategy):
     positions = config.attr(type=types.ndarray())
 
     def place(self, chunk, indicators):
@@ -173,8 +180,18 @@ class FixedPositions(PlacementStrategy):
         self._queued_jobs = []
         # Get the queued jobs of all the strategies we depend on.
         deps = set(itertools.chain(*(strat._queued_jobs for strat in self.get_after())))
+        # The cost of each job is the amount of positions in its chunk.
+        coords, counts = np.unique(
+            self.positions // chunk_size, axis=0, return_counts=True
+        )
+        costs = {tuple(c): n for c, n in zip(coords.astype(int), counts)}
         for chunk in VoxelSet.fill(self.positions, chunk_size):
-            job = pool.queue_placement(self, Chunk(chunk, chunk_size), deps=deps)
+            job = pool.queue_placement(
+                self,
+                Chunk(chunk, chunk_size),
+                deps=deps,
+                cost=costs.get(tuple(np.array(chunk, dtype=int))),
+            )
             self._queued_jobs.append(job)
         report(f"Queued {len(self._queued_jobs)} jobs for {self.name}", level=2)
 
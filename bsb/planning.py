@@ -0,0 +1,216 @@
+"""
+Dry-run planning of a compilation. The strategies queue their jobs into a job pool that is
+never executed, and the cell counts, connections, storage and memory of the jobs are
+estimated from the placement indicators and the regions of interest.
+"""
+
+from .exceptions import IndicatorError
+from .services.pool import JobPool, PlacementJob, ConnectivityJob
+from dataclasses import dataclass, field
+import numpy as np
+import typing
+
+# Bytes per stored cell: a position of 3 floats.
+_CELL_BYTES = 24
+# Additional bytes per stored cell with morphologies: a rotation of 3 floats and an index.
+_MORPHOLOGY_BYTES = 32
+# Bytes per stored connection: a pre- and postsynaptic location of 3 ints each, stored
+# once for the outgoing and once for the incoming direction.
+_CONNECTION_BYTES = 96
+
+
+@dataclass
+class StrategyPlan:
+    """
+    Estimates of the jobs of a single strategy.
+    """
+
+    name: str
+    type: str
+    jobs: int = 0
+    #: Amount of cells placed by placement strategies, or the amount of cell pairs in the
+    #: regions of interest of connectivity strategies, an upper bound of its connections.
+    count: float = 0
+    #: Estimated bytes of output written to the storage.
+    storage: float = 0
+    #: Estimated bytes of memory of the most expensive job.
+    memory: float = 0
+    #: Error raised while planning the strategy, if any.
+    error: typing.Optional[str] = None
+
+
+@dataclass
+class CompilationPlan:
+    """
+    Estimates of the jobs of a compilation, see :meth:`~bsb.core.Scaffold.plan`.
+    """
+
+    strategies: typing.List[StrategyPlan] = field(default_factory=list)
+
+    @property
+    def jobs(self):
+        return sum(s.jobs for s in self.strategies)
+
+    @property
+    def cells(self):
+        return sum(s.count for s in self.strategies if s.type == "placement")
+
+    @property
+    def connections(self):
+        return sum(s.count for s in self.strategies if s.type == "connectivity")
+
+    @property
+    def storage(self):
+        return sum(s.storage for s in self.strategies)
+
+    @property
+    def memory(self):
+        return max((s.memory for s in self.strategies), default=0)
+
+    def __getitem__(self, name):
+        try:
+            return next(s for s in self.strategies if s.name == name)
+        except StopIteration:
+            raise KeyError(name) from None
+
+    def __str__(self):
+        header = ("Strategy", "Jobs", "Cells/pairs", "Storage", "Memory/job")
+        rows = [
+            (
+                s.name,
+                str(s.jobs),
+                _fmt_count(s.count),
+                _fmt_bytes(s.storage),
+                _fmt_bytes(s.memory),
+            )
+            for s in self.strategies
+        ]
+        rows.append(
+            (
+                "Total",
+                str(self.jobs),
+                "",
+                _fmt_bytes(self.storage),
+                _fmt_bytes(self.memory),
+            )
+        )
+        widths = [max(len(r[i]) for r in (header, *rows)) for i in range(len(header))]
+        lines = ["  ".join(c.ljust(w) for c, w in zip(header, widths))]
+        lines.append("  ".join("-" * w for w in widths))
+        lines.extend("  ".join(c.ljust(w) for c, w in zip(r, widths)) for r in rows)
+        lines.append("")
+        lines.append(f"Cells: {_fmt_count(self.cells)}")
+        lines.append(f"Connections: at most {_fmt_count(self.connections)}")
+        lines.extend(
+            f"Could not plan '{s.name}': {s.error}" for s in self.strategies if s.error
+        )
+        return "\n".join(lines)
+
+
+def _fmt_count(n):
+    for unit, size in (("G", 1e9), ("M", 1e6), ("k", 1e3)):
+        if n >= size:
+            return f"{n / size:.1f}{unit}"
+    return str(int(round(n)))
+
+
+def _fmt_bytes(n):
+    for unit, size in (("TB", 1e12), ("GB", 1e9), ("MB", 1e6), ("kB", 1e3)):
+        if n >= size:
+            return f"{n / size:.1f}{unit}"
+    return f"{int(round(n))}B"
+
+
+def plan_compilation(scaffold, placement=(), connectivity=()):
+    """
+    Queue the given strategies into a job pool, without executing it, and estimate the
+    work of their jobs.
+
+    :param scaffold: Network to plan the compilation of.
+    :type scaffold: ~bsb.core.Scaffold
+    :param placement: Placement strategies to plan, in order.
+    :type placement: List[~bsb.placement.strategy.PlacementStrategy]
+    :param connectivity: Connectivity strategies to plan, in order.
+    :type connectivity: List[~bsb.connectivity.strategy.ConnectionStrategy]
+    :rtype: ~bsb.planning.CompilationPlan
+    """
+    pool = JobPool(scaffold, backend="serial")
+    plan = CompilationPlan()
+    # Estimated amount of cells per cell type per chunk id
+    counts = {}
+    for strategy in placement:
+        splan = StrategyPlan(strategy.name, "placement")
+        plan.strategies.append(splan)
+        try:
+            strategy.queue(pool, scaffold.network.chunk_size)
+            jobs = [j for j in pool._queue if _owned(j, strategy, PlacementJob)]
+            cell_bytes = _CELL_BYTES + _MORPHOLOGY_BYTES * _uses_morphologies(strategy)
+            for job in jobs:
+                job_counts = _guess_cells(job)
+                for ct_name, n in job_counts.items():
+                    ct_counts = counts.setdefault(ct_name, {})
+                    ct_counts[job._c.id] = ct_counts.get(job._c.id, 0) + n
+                cells = sum(job_counts.values())
+                splan.count += cells
+                splan.memory = max(splan.memory, cells * cell_bytes)
+            splan.jobs = len(jobs)
+            splan.storage = splan.count * cell_bytes
+        except Exception as e:
+            splan.error = f"{type(e).__name__}: {e}"
+    for strategy in connectivity:
+        splan = StrategyPlan(strategy.name, "connectivity")
+        plan.strategies.append(splan)
+        try:
+            strategy.queue(pool)
+            jobs = [j for j in pool._queue if _owned(j, strategy, ConnectivityJob)]
+            for job in jobs:
+                _, pre_roi, post_roi = job._args
+                pre = _count_roi(counts, strategy.presynaptic.cell_types, pre_roi)
+                post = _count_roi(counts, strategy.postsynaptic.cell_types, post_roi)
+                pairs = pre * post
+                splan.count += pairs
+                # The job loads the cells of both regions of interest, and produces the
+                # locations of its connections.
+                memory = (pre + post) * _CELL_BYTES + pairs * _CONNECTION_BYTES / 2
+                splan.memory = max(splan.memory, memory)
+            splan.jobs = len(jobs)
+            splan.storage = splan.count * _CONNECTION_BYTES
+        except Exception as e:
+            splan.error = f"{type(e).__name__}: {e}"
+    return plan
+
+
+def _owned(job, strategy, job_type):
+    return isinstance(job, job_type) and job._strategy is strategy
+
+
+def _uses_morphologies(strategy):
+    distr = strategy.distribute
+    return bool(distr._has_mdistr() or distr._has_rdistr()) or any(
+        ind.use_morphologies() for ind in strategy.get_indicators().values()
+    )
+
+
+def _guess_cells(job):
+    # Guess the amount of cells per cell type that a placement job places.
+    strategy = job._strategy
+    indicators = strategy.get_indicators()
+    if job._cost is not None:
+        # Strategies that know the amount of cells they place in a chunk, like fixed
+        # positions, pass it as the cost of their jobs.
+        return {name: float(job._cost) for name in indicators}
+    # Entities and unchunked jobs place the whole volume at once.
+    whole = strategy.is_entities() or np.any(np.isnan(job._c.dimensions))
+    counts = {}
+    for name, ind in indicators.items():
+        counts[name] = float(np.sum(ind.guess(None if whole else job._c)))
+        # Guesses for empty volumes may come out as NaN, cast to garbage integers.
+        if not counts[name] >= 0:
+            raise IndicatorError(f"Could not guess the amount of '{name}' cells.")
+    return counts
+
+
+def _count_roi(counts, cell_types, roi):
+    return sum(
+        counts.get(ct.name, {}).get(chunk.id, 0) for ct in cell_types for chunk in roi
+    )
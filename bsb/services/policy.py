@@ -0,0 +1,19 @@
+from .. import config
+from ..config import types
+
+
+@config.node
+class JobPolicy:
+    """
+    Configures how the job pool handles the failure of the jobs of a strategy.
+    """
+
+    retries = config.attr(type=types.int(min=0), default=0)
+    """Amount of times a failed job is resubmitted to the pool."""
+    timeout = config.attr(type=types.float(min=0))
+    """Seconds that a job may run before it is considered failed."""
+    on_failure = config.attr(type=types.in_(["abort", "skip"]), default="abort")
+    """
+    What to do when a job fails after all retries. ``abort`` stops the execution and
+    raises the error, ``skip`` reports the error and continues with the other jobs.
+    """
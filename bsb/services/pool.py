@@ -34,11 +34,44 @@ class name, ``_name`` for the job name and ``_c`` for the chunk. These are used
 to display what the workers are doing during parallel execution. This is an experimental
 API and subject to sudden change in the future.
 
+Without MPI, the jobs can also be spread over the cores of a single machine by selecting
+the ``processes`` backend, through the ``pool_backend`` option (``--pool processes`` on the
+CLI). The local worker processes are forked from the main process, so that they own a copy
+of the scaffold and can execute the serialized jobs with the same :func:`dispatcher`.
+
+Jobs that spend most of their time in code that releases the GIL can use the ``threads``
+backend instead. The threads share the scaffold and storage of the main process. Jobs of
+strategies marked with the :class:`~bsb.mixins.ThreadSafe` mixin skip serialization and
+run concurrently, while all other jobs are dispatched one at a time.
+
+The progress of an execution is counted by a :class:`.JobProgress`, from the completion
+callbacks of the jobs, and forwarded to the :class:`.ProgressSink` objects of the pool.
+
 """
 
 from ._util import MockModule, ErrorModule
 from . import MPI
+from ..exceptions import JobPoolError
 import concurrent.futures
+import contextlib
+import ctypes
+import hashlib
+import math
+import multiprocessing
+import signal
+import threading
+import numpy as np
+import json
+import pickle
+import time
+import sys
+import os
+
+try:
+    import resource as _resource
+except ImportError:  # pragma: nocover
+    # Not available on Windows
+    _resource = None
 
 
 class _MissingMPIPoolExecutor(ErrorModule):
@@ -56,13 +89,212 @@ class _MPIPoolModule(MockModule):
 _MPIPool = _MPIPoolModule("zwembad")
 
 
-def dispatcher(pool_id, job_args):
+def _init_process_worker(pool_id, lock):
+    # Local worker processes share the storage, but not the MPI lock that guards it, so
+    # we swap in a lock shared by all the processes of the pool.
+    engine = JobPool.get_owner(pool_id).storage._engine
+    engine._lock = _PoolLock(lock, getattr(engine, "_lock", None))
+    # Forked workers inherit the random state of the main process, reseed them so that
+    # they don't all draw the same random numbers.
+    np.random.seed()
+
+
+class _PoolLock:
+    """
+    Stand-in for the storage engine's lock inside of local workers. Reads and writes both
+    acquire the same reentrant lock, shared by all the workers of the pool.
+    """
+
+    def __init__(self, lock, sync=None):
+        self._lock = lock
+        self._sync = sync
+
+    def read(self):
+        return self._lock
+
+    def write(self):
+        return self._lock
+
+    def single_write(self, handle=None, rank=None):
+        return self._sync.single_write(handle=handle, rank=rank)
+
+
+class _ThreadPoolExecutor(concurrent.futures.ThreadPoolExecutor):
+    """
+    Executes thread safe jobs directly on the shared scaffold, and dispatches all other
+    jobs one at a time.
+    """
+
+    def __init__(self, max_workers):
+        super().__init__(max_workers=max_workers, thread_name_prefix="bsb_job")
+        self._unsafe_lock = threading.Lock()
+
+    def submit_job(self, job):
+        limits = (job.timeout, job._atomic)
+        if job._thread_safe:
+            owner = JobPool.get_owner(job.pool_id)
+            fn = _execute_measured
+            args = (job.execute, owner, job.f, job._args, job._kwargs, *limits)
+        else:
+            fn = self._dispatch_unsafe
+            args = (job.pool_id, job.serialize(), *limits)
+        thread = _AttemptThread()
+        attempt = self.submit(thread.run, fn, *args)
+        attempt._thread = thread
+        return attempt
+
+    def interrupt(self, attempt):
+        """
+        Interrupt the thread that runs an attempt.
+        """
+        thread = getattr(attempt, "_thread", None)
+        if thread is not None:
+            thread.interrupt()
+
+    def _dispatch_unsafe(self, pool_id, job_args, timeout=None, atomic=False):
+        with self._unsafe_lock:
+            return dispatcher(pool_id, job_args, timeout, atomic)
+
+
+class _AttemptTimeout(JobPoolError):
+    pass
+
+
+class _AttemptThread:
+    """
+    Tracks the thread that runs an attempt at a job, so that the master can interrupt
+    the attempt when it times out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ident = None
+
+    def run(self, fn, *args):
+        with self._lock:
+            self._ident = threading.get_ident()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._ident = None
+
+    def interrupt(self):
+        # Raise an error in the thread, once it executes its next Python instruction.
+        # Threads that are stuck outside of the interpreter can't be interrupted.
+        with self._lock:
+            if self._ident is not None and hasattr(ctypes, "pythonapi"):
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                    ctypes.c_ulong(self._ident), ctypes.py_object(_AttemptTimeout)
+                )
+
+
+_job_telemetry = threading.local()
+
+
+def count_rows(n):
+    """
+    Add ``n`` to the amount of rows (cells or connections) that the job running on this
+    thread has written.
+    """
+    _job_telemetry.rows = getattr(_job_telemetry, "rows", 0) + n
+
+
+def _peak_rss():
+    if _resource is None:
+        return None
+    # Linux reports the peak resident set size in kilobytes.
+    return _resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _execute_measured(handler, owner, f, args, kwargs, timeout=None, atomic=False):
+    # Execute a job handler and return the telemetry of the execution.
+    _job_telemetry.rows = 0
+    start = time.time()
+    # Buffer the data that the job writes, and write it in bulk at the end of the job.
+    # Atomic attempts keep all of their data in the buffer, so that an attempt that
+    # fails, or times out, writes nothing.
+    with owner.storage.buffered(math.inf if atomic else None), _deadline(timeout):
+        handler(owner, f, args, kwargs)
+    return {
+        "start": start,
+        "end": time.time(),
+        "rank": MPI.get_rank(),
+        "pid": os.getpid(),
+        "tid": threading.get_native_id(),
+        "peak_rss": _peak_rss(),
+        "rows": _job_telemetry.rows,
+    }
+
+
+@contextlib.contextmanager
+def _deadline(timeout):
+    # Fail an attempt that runs past its timeout. The main thread of a worker process is
+    # interrupted by an alarm, other threads are interrupted by the master. Attempts that
+    # finish late fail as well, so that they don't write the data of a timed out attempt.
+    if timeout is None:
+        yield
+        return
+    start = time.monotonic()
+    alarm = (
+        hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+    if alarm:
+
+        def interrupt(signum, frame):
+            raise _AttemptTimeout(f"Attempt timed out after {timeout} seconds.")
+
+        handler = signal.signal(signal.SIGALRM, interrupt)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, handler)
+    if time.monotonic() - start > timeout:
+        raise _AttemptTimeout(f"Attempt timed out after {timeout} seconds.")
+
+
+def dispatcher(pool_id, job_args, timeout=None, atomic=False):
     job_type, f, args, kwargs = job_args
     # Get the static job execution handler from this module
     handler = globals()[job_type].execute
     owner = JobPool.get_owner(pool_id)
-    # Execute it.
-    handler(owner, f, args, kwargs)
+    # Execute it, and hand the telemetry of the execution back to the master.
+    try:
+        return _execute_measured(handler, owner, f, args, kwargs, timeout, atomic)
+    except Exception as e:
+        # Hand errors back to the master as well, so that it can apply the failure
+        # policy of the job, instead of the worker bringing the pool down.
+        return {"error": _picklable_error(e)}
+
+
+def _picklable_error(e):
+    try:
+        pickle.dumps(e)
+    except Exception:
+        return JobPoolError(f"{type(e).__name__}: {e}")
+    else:
+        return e
+
+
+def _get_outcome(future):
+    # Return the error or the result of a finished attempt at a job.
+    if future.cancelled():
+        return concurrent.futures.CancelledError(), None
+    if (error := future.exception()) is not None:
+        return error, None
+    result = future.result()
+    if isinstance(result, dict) and "error" in result:
+        return result["error"], None
+    return None, result
+
+
+# Guards the transitions between the attempts at executing the jobs, which happen both on
+# the master thread (timeouts) and on the threads that complete the futures.
+_attempt_lock = threading.RLock()
 
 
 class FakeFuture(concurrent.futures.Future):
@@ -74,7 +306,7 @@ class Job:
     Dispatches the execution of a function through a JobPool
     """
 
-    def __init__(self, pool, f, args, kwargs, deps=None):
+    def __init__(self, pool, f, args, kwargs, deps=None, cost=None):
         self.pool_id = pool.id
         self.f = f
         self._cname = None
@@ -84,7 +316,21 @@ class Job:
         self._kwargs = kwargs
         self._deps = set(deps or [])
         self._completion_cbs = []
-        for j in self._deps:
+        self._pool = None
+        self._thread_safe = False
+        self._cost = cost
+        self._cost_estimated = False
+        self._telemetry = {}
+        self._policy = None
+        self._attempt = None
+        self._attempts = 0
+        self._attempt_started = None
+        self._timed_out = []
+        self._progress = None
+        self._completed = False
+        # Dependencies that already completed, for example in an earlier pool, are
+        # discarded right away.
+        for j in list(self._deps):
             j.on_completion(self._dep_completed)
         self._future = FakeFuture()
 
@@ -104,12 +350,115 @@ class Job:
         return f(job_owner, *args, **kwargs)
 
     def on_completion(self, cb):
-        self._completion_cbs.append(cb)
+        """
+        Call ``cb`` with the job once it has completed, or right away if it already has.
+        """
+        if self._completed:
+            cb(self)
+        else:
+            self._completion_cbs.append(cb)
+
+    def get_cost(self, pool):
+        """
+        Return the estimated cost of the job, used to dispatch the most expensive jobs
+        first. Returns the cost given at job creation, or otherwise the estimate of the
+        job type, or ``None`` if the cost can't be estimated.
+        """
+        if self._cost is None and not self._cost_estimated:
+            self._cost_estimated = True
+            try:
+                cost = self._estimate_cost(pool)
+            except Exception:
+                # Estimates are only used to schedule the jobs, if the configuration can't
+                # be estimated the job itself will report the problem.
+                cost = None
+            # Guesses for empty volumes may come out as NaN, cast to garbage integers.
+            self._cost = cost if cost is not None and cost >= 0 else None
+        return self._cost
+
+    def _estimate_cost(self, pool):
+        return None
+
+    def get_key(self):
+        """
+        Return a key that identifies the job across compilations, used to journal the
+        completed jobs. Returns ``None`` for jobs that can't be identified.
+        """
+        return None
+
+    @property
+    def telemetry(self):
+        """
+        Timings and resource usage of the job execution: the ``queued``, ``start`` and
+        ``end`` timestamps, the MPI ``rank``, ``pid`` and ``tid`` of the worker, the
+        ``peak_rss`` of the worker in bytes, and the amount of ``rows`` the job wrote.
+        """
+        return self._telemetry.copy()
 
-    def _completion(self, _):
+    def __str__(self):
+        name = self._name or getattr(self.f, "__name__", "")
+        chunk = f" in chunk {self._c}" if self._c is not None else ""
+        return f"{type(self).__name__} '{name}'{chunk}"
+
+    @property
+    def timeout(self):
+        """
+        Amount of seconds that an attempt at the job may run, set by the ``timeout`` of
+        the job policy.
+        """
+        return self._policy.timeout if self._policy is not None else None
+
+    @property
+    def _atomic(self):
+        # Attempts at jobs that may fail and be retried write all of their data at the
+        # end, so that a failed attempt leaves no partial data behind.
+        policy = self._policy
+        return policy is not None and (policy.retries > 0 or policy.timeout is not None)
+
+    def _completion(self, future):
+        if future is not None:
+            if future.exception() is not None:
+                # Failed jobs don't complete, the pool reraises their error.
+                return
+            if isinstance(result := future.result(), dict):
+                self._telemetry.update(result)
+        self._completed = True
         for cb in self._completion_cbs:
             cb(self)
 
+    def _failed(self, error):
+        """
+        Apply the failure policy of the job to an error. Returns ``True`` if the job
+        should be retried, ``False`` if the job should be skipped, and raises the error
+        if the execution should be aborted.
+        """
+        from ..reporting import warn
+
+        retries = self._policy.retries if self._policy is not None else 0
+        if self._attempts < retries:
+            self._attempts += 1
+            warn(f"Retrying {self} ({self._attempts}/{retries}), it failed with: {error}")
+            return True
+        elif self._policy is not None and self._policy.on_failure == "skip":
+            warn(f"Skipping {self}, it failed with: {error}")
+            self._telemetry["skipped"] = True
+            self._telemetry["error"] = str(error)
+            return False
+        raise error
+
+    def _run(self, owner):
+        # Execute the job on this process, retrying or skipping it according to its
+        # failure policy.
+        while True:
+            try:
+                args = (self.execute, owner, self.f, self._args, self._kwargs)
+                self._telemetry.update(_execute_measured(*args, atomic=self._atomic))
+            except Exception as e:
+                if not self._failed(e):
+                    break
+            else:
+                break
+
     def _dep_completed(self, dep):
         # Earlier we registered this callback on the completion of our dependencies.
         # When a dep completes we end up here and we discard it as a dependency as it has
@@ -117,29 +466,90 @@ class Job:
         self._deps.discard(dep)
         # When all our dependencies have been discarded we can queue ourselves. Unless the
         # pool is serial, then the pool itself just runs all jobs in order.
-        if not self._deps and MPI.get_size() > 1:
+        if not self._deps and self._pool is not None:
             self._enqueue(self._pool)
 
     def _enqueue(self, pool):
+        self._pool = pool
         if not self._deps:
-            # Notify anyone waiting on the spaceholder `FakeFuture` that we're
-            # now actually queueing ourselves
-            self._future.set_result("ENQUEUED")
-            # Go ahead and submit ourselves to the pool, no dependencies to wait for
-            # The dispatcher is run on the remote worker and unpacks the data required
-            # to execute the job contents.
-            self._future = pool.submit(dispatcher, self.pool_id, self.serialize())
-            # Invoke our completion callbacks when the future completes.
+            # Go ahead and submit ourselves to the pool, no dependencies to wait for.
+            # Our own future tracks the job over all of its attempts, and invokes our
+            # completion callbacks when the job is done.
+            self._future.set_running_or_notify_cancel()
             self._future.add_done_callback(self._completion)
+            if self._progress is not None:
+                self._progress._dispatch(self)
+            self._submit()
+        # Otherwise we have unfinished dependencies and should wait until we can enqueue
+        # ourselves when our dependencies haved all notified us of their completion.
+
+    def _submit(self):
+        pool = self._pool
+        self._telemetry["queued"] = time.time()
+        self._attempt_started = None
+        # The dispatcher is run on the remote worker and unpacks the data required
+        # to execute the job contents.
+        if isinstance(pool, _ThreadPoolExecutor):
+            # Thread pools decide themselves whether to serialize the job.
+            attempt = pool.submit_job(self)
+        else:
+            limits = (self.timeout, self._atomic)
+            attempt = pool.submit(dispatcher, self.pool_id, self.serialize(), *limits)
+        self._attempt = attempt
+        attempt.add_done_callback(self._attempt_done)
+
+    def _attempt_done(self, attempt):
+        with _attempt_lock:
+            if attempt is not self._attempt:
+                # Late result of an attempt that timed out, ignore it.
+                return
+            error, result = _get_outcome(attempt)
+            if error is None:
+                self._future.set_result(result)
+            else:
+                self._attempt_failed(error)
+
+    def _attempt_failed(self, error):
+        try:
+            retry = self._failed(error)
+        except Exception as e:
+            self._future.set_exception(e)
         else:
-            # We have unfinished dependencies and should wait until we can enqueue
-            # ourselves when our dependencies haved all notified us of their completion.
-            self._pool = pool
+            if retry:
+                self._submit()
+            else:
+                self._future.set_result(self._telemetry.copy())
+
+    def _check_timeout(self, now):
+        """
+        Fail the running attempt at the job if it exceeded its timeout. The timeout is
+        measured from when the master first sees the attempt running. Workers stop their
+        own attempts when they time out, but the master detaches from the attempt and
+        interrupts it as well, in case the worker didn't.
+        """
+        with _attempt_lock:
+            attempt = self._attempt
+            if self._future.done() or attempt is None or not attempt.running():
+                return False
+            if self._attempt_started is None:
+                self._attempt_started = now
+            elif now - self._attempt_started > self.timeout:
+                # Detach from the attempt, and ignore its result.
+                self._attempt = None
+                self._timed_out.append(attempt)
+                attempt.cancel()
+                if isinstance(self._pool, _ThreadPoolExecutor):
+                    self._pool.interrupt(attempt)
+                self._attempt_failed(
+                    JobPoolError(f"{self} timed out after {self.timeout} seconds.")
+                )
+                return True
+            return False
 
 
 class ChunkedJob(Job):
-    def __init__(self, pool, f, chunk, deps=None):
-        super().__init__(pool, f, (chunk,), {}, deps=deps)
+    def __init__(self, pool, f, chunk, deps=None, cost=None):
+        super().__init__(pool, f, (chunk,), {}, deps=deps, cost=cost)
 
 
 class PlacementJob(ChunkedJob):
@@ -147,12 +557,30 @@ class PlacementJob(ChunkedJob):
     Dispatches the execution of a chunk of a placement strategy through a JobPool.
     """
 
-    def __init__(self, pool, strategy, chunk, deps=None):
+    def __init__(self, pool, strategy, chunk, deps=None, cost=None):
         args = (strategy.name, chunk)
-        Job.__init__(self, pool, strategy.place.__func__, args, {}, deps=deps)
+        Job.__init__(self, pool, strategy.place.__func__, args, {}, deps=deps, cost=cost)
         self._cname = strategy.__class__.__name__
         self._name = strategy.name
         self._c = chunk
+        self._strategy = strategy
+        self._thread_safe = getattr(strategy, "_thread_safe", False)
+        self._policy = getattr(strategy, "policy", None)
+
+    def _estimate_cost(self, pool):
+        # The amount of cells that the strategy is expected to place in the chunk.
+        indicators = self._strategy.get_indicators().values()
+        return sum(int(np.sum(ind.guess(self._c))) for ind in indicators)
+
+    def _estimate_cells(self, pool, cell_type):
+        # The amount of cells of a cell type that the job is expected to place.
+        if len(self._strategy.cell_types) == 1:
+            return self.get_cost(pool) or 0
+        indicator = self._strategy.get_indicators()[cell_type.name]
+        return int(np.sum(indicator.guess(self._c)))
+
+    def get_key(self):
+        return f"placement/{self._name}/{self._c.id}"
 
     @staticmethod
     def execute(job_owner, f, args, kwargs):
@@ -162,16 +590,88 @@ class PlacementJob(ChunkedJob):
         return f(placement, *args[1:], indicators, **kwargs)
 
 
+class PlacementBatchJob(Job):
+    """
+    Dispatches the execution of several chunks of a placement strategy as a single job,
+    through a JobPool. Created by the pool out of the individual jobs of cheap chunks.
+    """
+
+    def __init__(self, pool, jobs):
+        strategy = jobs[0]._strategy
+        chunks = [job._c for job in jobs]
+        args = (strategy.name, chunks)
+        cost = sum(job._cost for job in jobs)
+        deps = set().union(*(job._deps for job in jobs))
+        Job.__init__(self, pool, strategy.place.__func__, args, {}, deps=deps, cost=cost)
+        self._cname = strategy.__class__.__name__
+        self._name = strategy.name
+        self._c = chunks
+        self._strategy = strategy
+        self._thread_safe = getattr(strategy, "_thread_safe", False)
+        self._policy = getattr(strategy, "policy", None)
+        self._jobs = jobs
+
+    @staticmethod
+    def execute(job_owner, f, args, kwargs):
+        name, chunks = args
+        placement = job_owner.placement[name]
+        indicators = placement.get_indicators()
+        # Place each chunk separately, so that each chunk's cells are stored in it.
+        for chunk in chunks:
+            f(placement, chunk, indicators, **kwargs)
+
+    def _completion(self, future):
+        # Complete the batched jobs as well, to notify their listeners and dependents.
+        super()._completion(future)
+        if future is not None and future.exception() is not None:
+            return
+        for job in self._jobs:
+            job._future = self._future
+            job._telemetry = self._telemetry.copy()
+            job._completion(None)
+
+
 class ConnectivityJob(ChunkedJob):
     """
     Dispatches the execution of a chunk of a placement strategy through a JobPool.
     """
 
-    def __init__(self, pool, strategy, pre_roi, post_roi, deps=None):
+    def __init__(self, pool, strategy, pre_roi, post_roi, deps=None, cost=None):
         args = (strategy.name, pre_roi, post_roi)
-        Job.__init__(self, pool, strategy.connect.__func__, args, {}, deps=deps)
+        Job.__init__(
+            self, pool, strategy.connect.__func__, args, {}, deps=deps, cost=cost
+        )
         self._cname = strategy.__class__.__name__
         self._name = strategy.name
+        self._strategy = strategy
+        self._thread_safe = getattr(strategy, "_thread_safe", False)
+        self._policy = getattr(strategy, "policy", None)
+
+    def _estimate_cost(self, pool):
+        # The amount of cell pairs between the pre and postsynaptic regions of interest.
+        _, pre_roi, post_roi = self._args
+        pre = pool._count_roi_cells(self._strategy.presynaptic.cell_types, pre_roi)
+        post = pool._count_roi_cells(self._strategy.postsynaptic.cell_types, post_roi)
+        return pre * post
+
+    def _get_roi_chunks(self):
+        # The cell type names and chunks of both regions of interest.
+        _, pre_roi, post_roi = self._args
+        return [
+            (ct.name, chunk)
+            for hemitype, roi in (
+                (self._strategy.presynaptic, pre_roi),
+                (self._strategy.postsynaptic, post_roi),
+            )
+            for ct in hemitype.cell_types
+            for chunk in roi
+        ]
+
+    def get_key(self):
+        # Jobs of a strategy may share their pre or postsynaptic region of interest, so
+        # identify them by both.
+        rois = ";".join(",".join(str(c.id) for c in roi) for roi in self._args[1:])
+        return f"connectivity/{self._name}/" + hashlib.sha1(rois.encode()).hexdigest()
 
     @staticmethod
     def execute(job_owner, f, args, kwargs):
@@ -181,20 +681,452 @@ class ConnectivityJob(ChunkedJob):
         return f(connectivity, *collections, **kwargs)
 
 
+class JobJournal:
+    """
+    Journal of the completed jobs of a compilation. The journal is kept in the file store
+    of the storage, so that an interrupted compilation can be resumed. Jobs are identified
+    by their :meth:`~.Job.get_key`.
+    """
+
+    file_id = "bsb_job_journal"
+
+    def __init__(self, files, resume=False, interval=10):
+        """
+        :param files: File store to keep the journal in.
+        :type files: ~bsb.storage.interfaces.FileStore
+        :param resume: Continue the stored journal, instead of starting a new one.
+        :type resume: bool
+        :param interval: Minimum amount of seconds between writes of the journal.
+        :type interval: float
+        """
+        self._files = files
+        self._interval = interval
+        self.resume = resume
+        self._keys = set(self._load()) if resume else set()
+        # The journal is written on the first record, a new journal then replaces the
+        # stored one.
+        self._last_flush = 0
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _load(self):
+        if self.file_id not in self._files.all():
+            return []
+        content, _ = self._files.load(self.file_id)
+        return json.loads(content)
+
+    def record(self, key):
+        """
+        Record the key of a completed job. The journal is written out at most every
+        ``interval`` seconds.
+        """
+        self._keys.add(key)
+        if time.time() - self._last_flush > self._interval:
+            self.flush()
+
+    def discard(self, key):
+        self._keys.discard(key)
+
+    def flush(self):
+        """
+        Write the journal to the file store.
+        """
+        if MPI.get_rank() == 0:
+            content = json.dumps(sorted(self._keys))
+            self._files.store(content, id=self.file_id, overwrite=True)
+        self._last_flush = time.time()
+
+
+class ProgressSink:
+    """
+    Receives the progress events of a job pool execution. Subclass it and pass it to the
+    ``progress`` of a :class:`.JobPool` to monitor executions.
+    """
+
+    def on_start(self, progress):
+        """
+        Called before the jobs are dispatched.
+
+        :param progress: Job counters of the execution.
+        :type progress: ~bsb.services.pool.JobProgress
+        """
+        pass
+
+    def on_event(self, progress, event, job):
+        """
+        Called when a job is ``"dispatched"`` to the workers, or when it is
+        ``"finished"``, ``"skipped"`` or ``"failed"``. May be called from the threads
+        that complete the jobs, but never concurrently.
+
+        :param progress: Job counters of the execution.
+        :type progress: ~bsb.services.pool.JobProgress
+        :param event: Name of the event.
+        :type event: str
+        :param job: The job that the event occurred to.
+        :type job: ~bsb.services.pool.Job
+        """
+        pass
+
+    def on_end(self, progress):
+        """
+        Called after the execution has stopped.
+
+        :param progress: Job counters of the execution.
+        :type progress: ~bsb.services.pool.JobProgress
+        """
+        pass
+
+
+class LogProgressSink(ProgressSink):
+    """
+    Reports a line with the job counters at most once every ``interval`` seconds.
+    """
+
+    def __init__(self, interval=10, level=2):
+        self._interval = interval
+        self._level = level
+        self._last = 0
+
+    def on_event(self, progress, event, job):
+        if (now := time.time()) - self._last >= self._interval:
+            self._last = now
+            self._report(progress)
+
+    def on_end(self, progress):
+        self._report(progress)
+
+    def _report(self, progress):
+        from ..reporting import report
+
+        report(str(progress), level=self._level)
+
+
+class JsonProgressSink(ProgressSink):
+    """
+    Writes each event as a line of JSON to a file, or to stdout, with the job counters
+    at the time of the event.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._file = None
+
+    def on_start(self, progress):
+        self._file = open(self._path, "a") if self._path else sys.stdout
+        self._write(progress, "start")
+
+    def on_event(self, progress, event, job):
+        self._write(progress, event, job)
+
+    def on_end(self, progress):
+        self._write(progress, "end")
+        if self._path:
+            self._file.close()
+        self._file = None
+
+    def _write(self, progress, event, job=None):
+        line = {"event": event, "time": time.time(), **progress.as_dict()}
+        if job is not None:
+            line["job"] = str(job)
+        self._file.write(json.dumps(line) + "\n")
+        self._file.flush()
+
+
+def create_progress_sinks(spec):
+    """
+    Create the progress sinks of a ``pool_progress`` option value: ``log`` reports
+    progress lines, ``json`` writes JSON lines to stdout, and ``json:<path>`` to a file.
+    Multiple sinks can be comma separated.
+
+    :rtype: list[~bsb.services.pool.ProgressSink]
+    """
+    sinks = []
+    for name in filter(None, (spec or "").split(",")):
+        kind, _, arg = name.strip().partition(":")
+        if kind == "log":
+            sinks.append(LogProgressSink())
+        elif kind == "json":
+            sinks.append(JsonProgressSink(arg or None))
+        else:
+            raise JobPoolError(
+                f"Unknown progress sink '{kind}', choose from: 'log', 'json'."
+            )
+    return sinks
+
+
+class JobProgress:
+    """
+    Counters of the jobs of a job pool execution. The counters are updated from the
+    completion of each job, so that monitoring costs a constant amount of work per job.
+    """
+
+    def __init__(self, jobs, sinks=()):
+        self.total = len(jobs)
+        self.dispatched = 0
+        self.finished = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = time.time()
+        self._running = {}
+        self._sinks = list(sinks)
+        self._cond = threading.Condition(threading.RLock())
+
+    @property
+    def done(self):
+        """
+        Amount of jobs that are done, because they finished, were skipped or failed.
+        """
+        return self.finished + self.skipped + self.failed
+
+    @property
+    def remaining(self):
+        return self.total - self.done
+
+    @property
+    def running(self):
+        """
+        The jobs that have been dispatched to the workers and aren't done yet.
+        """
+        with self._cond:
+            return list(self._running.values())
+
+    def is_done(self):
+        """
+        Whether all jobs are done, or a job failed and aborted the execution.
+        """
+        return self.failed > 0 or self.done >= self.total
+
+    def as_dict(self):
+        return {
+            "total": self.total,
+            "dispatched": self.dispatched,
+            "running": len(self._running),
+            "finished": self.finished,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed": time.time() - self.started,
+        }
+
+    def __str__(self):
+        counts = self.as_dict()
+        return (
+            f"Jobs: {counts['finished']}/{counts['total']} finished, "
+            f"{counts['running']} running, {counts['skipped']} skipped, "
+            f"{counts['failed']} failed ({counts['elapsed']:.1f}s)"
+        )
+
+    def _start(self):
+        for sink in self._sinks:
+            sink.on_start(self)
+
+    def _end(self):
+        for sink in self._sinks:
+            sink.on_end(self)
+
+    def _dispatch(self, job):
+        with self._cond:
+            self.dispatched += 1
+            self._running[id(job)] = job
+            self._notify("dispatched", job)
+
+    def _complete(self, job):
+        with self._cond:
+            self._running.pop(id(job), None)
+            future = job._future
+            if future.done() and future.exception() is not None:
+                self.failed += 1
+                event = "failed"
+            elif job._telemetry.get("skipped"):
+                self.skipped += 1
+                event = "skipped"
+            else:
+                self.finished += 1
+                event = "finished"
+            self._notify(event, job)
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        Wait until all jobs are done, a job fails, or the timeout passes.
+
+        :returns: Whether the execution is done.
+        :rtype: bool
+        """
+        with self._cond:
+            return self._cond.wait_for(self.is_done, timeout=timeout)
+
+    def _notify(self, event, job):
+        for sink in self._sinks:
+            sink.on_event(self, event, job)
+
+
 class JobPool:
     _next_pool_id = 0
     _pool_owners = {}
+    _backends = ("serial", "processes", "threads")
+    _traced_paths = set()
 
-    def __init__(self, scaffold, listeners=None):
+    def __init__(
+        self,
+        scaffold,
+        listeners=None,
+        backend=None,
+        workers=None,
+        batch_cost=None,
+        journal=None,
+        trace=None,
+        progress=None,
+    ):
+        """
+        :param scaffold: The scaffold that owns the jobs of this pool.
+        :type scaffold: ~bsb.core.Scaffold
+        :param listeners: Callables to call with each job once it has completed.
+        :type listeners: list[Callable]
+        :param backend: Executor to use when MPI is not available, either ``"serial"``,
+          ``"processes"`` or ``"threads"``. Defaults to the ``pool_backend`` option.
+        :type backend: str
+        :param workers: Amount of local workers. Defaults to the ``pool_workers`` option,
+          or to the amount of CPU cores.
+        :type workers: int
+        :param batch_cost: Cost up to which cheap placement jobs are batched together in
+          parallel execution. Defaults to a fraction of the cost per worker, ``0``
+          disables batching.
+        :type batch_cost: float
+        :param journal: Journal to record the completed jobs in. When the journal is
+          resumed, the jobs it contains are skipped.
+        :type journal: ~bsb.services.pool.JobJournal
+        :param trace: Path of the Chrome trace file to write the job telemetry to after
+          execution. Defaults to the ``pool_trace`` option.
+        :type trace: str
+        :param progress: Sinks to send the progress events of the execution to. Defaults
+          to the sinks of the ``pool_progress`` option.
+        :type progress: list[~bsb.services.pool.ProgressSink]
+        """
         self._queue = []
+        self._placement_jobs = {}
+        self._chunk_stats = {}
         self.id = JobPool._next_pool_id
         self._listeners = listeners or []
+        self._backend = backend
+        self._workers = workers
+        self._batch_cost = batch_cost
+        self._journal = journal
+        self._trace = trace
+        self._sinks = progress
+        self._progress = None
+        self._executed = []
         JobPool._next_pool_id += 1
         JobPool._pool_owners[self.id] = scaffold
 
+    @property
+    def backend(self):
+        """
+        The executor backend of the pool. MPI execution always takes precedence over the
+        local backends.
+        """
+        if MPI.get_size() > 1:
+            return "mpi"
+        from .. import options
+
+        backend = self._backend if self._backend is not None else options.pool_backend
+        if backend not in self._backends:
+            raise JobPoolError(
+                f"Unknown job pool backend '{backend}', choose from: "
+                + ", ".join(f"'{b}'" for b in self._backends)
+            )
+        return backend
+
+    @property
+    def workers(self):
+        """
+        The amount of local workers, used by the local parallel backends.
+        """
+        from .. import options
+
+        workers = self._workers if self._workers is not None else options.pool_workers
+        return workers or os.cpu_count() or 1
+
     @property
     def parallel(self):
-        return MPI.get_size() > 1
+        return self.backend != "serial"
+
+    @property
+    def trace(self):
+        """
+        Path of the Chrome trace file that the job telemetry is written to.
+        """
+        from .. import options
+
+        return self._trace if self._trace is not None else options.pool_trace
+
+    @property
+    def progress(self):
+        """
+        Job counters of the current or last execution, or ``None`` before execution.
+
+        :rtype: ~bsb.services.pool.JobProgress
+        """
+        return self._progress
+
+    def get_progress_sinks(self):
+        """
+        Return the progress sinks of the pool, or otherwise those of the
+        ``pool_progress`` option.
+        """
+        from .. import options
+
+        if self._sinks is not None:
+            return self._sinks
+        return create_progress_sinks(options.pool_progress)
+
+    def write_trace(self, path):
+        """
+        Write the telemetry of the last executed jobs to a Chrome trace file, that can
+        be opened in ``chrome://tracing`` or https://ui.perfetto.dev. Each job is an
+        event on the timeline of the worker that executed it. The first write in a
+        process overwrites the file, subsequent pools add their jobs to it.
+
+        :param path: Path of the trace file.
+        :type path: str
+        """
+        events = []
+        if path in JobPool._traced_paths and os.path.exists(path):
+            with open(path, "r") as f:
+                events = json.load(f)["traceEvents"]
+        events.extend(
+            self._get_trace_event(job)
+            for job in self._executed
+            if job._telemetry.get("end")
+        )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        JobPool._traced_paths.add(path)
+
+    def _get_trace_event(self, job):
+        t = job._telemetry
+        chunks = job._c if isinstance(job._c, list) else [job._c]
+        return {
+            "name": job._name or getattr(job.f, "__name__", type(job).__name__),
+            "cat": type(job).__name__,
+            "ph": "X",
+            # Timestamps are in microseconds
+            "ts": t["start"] * 1e6,
+            "dur": (t["end"] - t["start"]) * 1e6,
+            "pid": t["rank"] if MPI.get_size() > 1 else t["pid"],
+            "tid": t["tid"],
+            "args": {
+                "chunks": [c.tolist() for c in chunks if c is not None],
+                "queued": t.get("queued"),
+                "wait": t["start"] - t.get("queued", t["start"]),
+                "rank": t["rank"],
+                "peak_rss": t["peak_rss"],
+                "rows": t["rows"],
+            },
+        }
 
     @classmethod
     def get_owner(cls, id):
@@ -217,78 +1149,402 @@ class JobPool:
         # executed synchronously in serial execution.
         for listener in self._listeners:
             job.on_completion(listener)
+        if self._journal is not None:
+            job.on_completion(self._record_job)
         self._queue.append(job)
 
-    def queue(self, f, args=None, kwargs=None, deps=None):
-        job = Job(self, f, args or (), kwargs or {}, deps)
+    def queue(self, f, args=None, kwargs=None, deps=None, cost=None):
+        job = Job(self, f, args or (), kwargs or {}, deps, cost=cost)
         self._put(job)
         return job
 
-    def queue_chunk(self, f, chunk, deps=None):
-        job = ChunkedJob(self, f, chunk, deps)
+    def queue_chunk(self, f, chunk, deps=None, cost=None):
+        job = ChunkedJob(self, f, chunk, deps, cost=cost)
         self._put(job)
         return job
 
-    def queue_placement(self, strategy, chunk, deps=None):
-        job = PlacementJob(self, strategy, chunk, deps)
+    def queue_placement(self, strategy, chunk, deps=None, cost=None):
+        job = PlacementJob(self, strategy, chunk, deps, cost=cost)
         self._put(job)
+        # Index the job by the cell types and chunk it places, so that connectivity jobs
+        # can depend on it.
+        for ct in strategy.cell_types:
+            self._placement_jobs.setdefault(ct.name, {}).setdefault(chunk.id, [])
+            self._placement_jobs[ct.name][chunk.id].append(job)
         return job
 
-    def queue_connectivity(self, strategy, pre_roi, post_roi, deps=None):
-        job = ConnectivityJob(self, strategy, pre_roi, post_roi, deps)
+    def queue_connectivity(self, strategy, pre_roi, post_roi, deps=None, cost=None):
+        """
+        Queue a connectivity job. The job depends on the given ``deps``, and on the
+        placement jobs in this pool that place cells of its cell types in the chunks of
+        its regions of interest.
+        """
+        deps = set(deps or [])
+        deps.update(self._get_placement_deps(strategy.presynaptic.cell_types, pre_roi))
+        deps.update(self._get_placement_deps(strategy.postsynaptic.cell_types, post_roi))
+        job = ConnectivityJob(self, strategy, pre_roi, post_roi, deps, cost=cost)
         self._put(job)
         return job
 
+    def get_queued_chunks(self, cell_types):
+        """
+        Return the chunks that the queued placement jobs will place cells in.
+
+        :param cell_types: Cell types to look up.
+        :type cell_types: Iterable[~bsb.cell_types.CellType]
+        :returns: The chunks per cell type name.
+        :rtype: dict[str, list[~bsb.storage.Chunk]]
+        """
+        return {
+            ct.name: [
+                jobs[0]._c for jobs in self._placement_jobs.get(ct.name, {}).values()
+            ]
+            for ct in cell_types
+        }
+
+    def _get_placement_deps(self, cell_types, roi):
+        deps = set()
+        for ct in cell_types:
+            ct_jobs = self._placement_jobs.get(ct.name, {})
+            for chunk in roi:
+                deps.update(ct_jobs.get(chunk.id, ()))
+        return deps
+
     def execute(self, master_event_loop=None):
         """
         Execute the jobs in the queue
 
         In serial execution this runs all of the jobs in the queue in First In First Out
         order. In parallel execution this enqueues all jobs into the MPIPool unless they
-        have dependencies that need to complete first.
+        have dependencies that need to complete first. Parallel jobs are enqueued from
+        most to least expensive, see :meth:`.Job.get_cost`.
 
         :param master_event_loop: A function that is continuously called while waiting for
           the jobs to finish in parallel execution
         :type master_event_loop: Callable
         """
         if self.parallel:
-            # Create the MPI pool
-            pool = _MPIPool.MPIPoolExecutor()
+            backend = self.backend
+            if backend == "mpi":
+                # Create the MPI pool
+                pool = _MPIPool.MPIPoolExecutor()
 
-            if pool.is_worker():
-                # The workers will return out of the pool constructor when they receive
-                # the shutdown signal from the master, they return here skipping the
-                # master logic.
-                return
-            # Tell each job in our queue that they have to put themselves in the pool
-            # queue; each job will store their own future and will use the futures of
-            # their previously enqueued dependencies to determine when they can put
-            # themselves on the pool queue.
-            for job in self._queue:
-                job._enqueue(pool)
-
-            q = self._queue.copy()
-            # As long as any of the jobs aren't done yet we repeat the master_event_loop
-            while open_jobs := [j._future for j in self._queue if not j._future.done()]:
-                if master_event_loop:
-                    # If there is an event loop, run it and hand it a copy of the jobqueue
-                    master_event_loop(q)
+                if pool.is_worker():
+                    # The workers will return out of the pool constructor when they
+                    # receive the shutdown signal from the master, they return here
+                    # skipping the master logic.
+                    return
+            elif backend == "threads":
+                pool = self._create_thread_pool()
+            else:
+                pool = self._create_local_pool()
+            q = []
+            progress = None
+            try:
+                if self._journal is not None and self._journal.resume:
+                    self._skip_completed()
+                # Batch cheap jobs together to save on dispatch overhead, then dispatch
+                # the most expensive jobs first, so that no workers are left idling while
+                # the last few expensive jobs finish.
+                self._coalesce(backend)
+                self._sort_by_cost()
+                q = self._queue.copy()
+                progress = self._start_progress(q)
+                # Tell each job in our queue that they have to put themselves in the pool
+                # queue; each job will store their own future and will use the futures
+                # of their previously enqueued dependencies to determine when they can
+                # put themselves on the pool queue.
+                for job in self._queue:
+                    job._enqueue(pool)
+
+                # Jobs with a timeout require the master to poll them.
+                timed = [j for j in q if j.timeout is not None]
+                poll = 1 if timed else None
+                # The progress is counted as the jobs complete, repeat the event loop
+                # until all jobs are done, or one of them failed.
+                while not progress.is_done():
+                    if master_event_loop:
+                        # If there is an event loop, run it and hand it a copy of the
+                        # jobqueue
+                        master_event_loop(q)
+                    else:
+                        # If there is no event loop just let the master idle until
+                        # execution has completed, a job fails or a timeout is due.
+                        progress.wait(timeout=poll)
+                    now = time.time()
+                    for job in timed:
+                        job._check_timeout(now)
+            finally:
+                # Workers that are still running a timed out attempt are stuck.
+                hung = any(not a.done() for job in q for a in job._timed_out)
+                if backend == "mpi":
+                    if not hung:
+                        pool.shutdown()
                 else:
-                    # If there is no event loop just let the master idle until execution
-                    # has completed.
-                    concurrent.futures.wait(open_jobs)
-            pool.shutdown()
+                    # Stuck worker processes are terminated. Stuck threads can't be
+                    # stopped, they are left behind.
+                    workers = getattr(pool, "_processes", None) or {}
+                    stuck = list(workers.values()) if hung else []
+                    # Don't wait for hung or remaining jobs after a failure.
+                    pool.shutdown(wait=not hung, cancel_futures=True)
+                    for worker in stuck:
+                        worker.terminate()
+                    self._release_engine_lock()
+                if self._journal is not None:
+                    self._journal.flush()
+                self._executed = q
+                if progress is not None:
+                    progress._end()
+                if self.trace:
+                    self.write_trace(self.trace)
+                if backend == "mpi" and hung:
+                    # The MPI pool can't be shut down while a worker is stuck.
+                    from ..reporting import warn
+
+                    warn("An MPI worker is stuck in a timed out job, aborting.")
+                    MPI.abort(1)
+            # Local pools hand us the worker errors, reraise the first one, as serial
+            # execution would have.
+            for job in q:
+                if job._future.done() and (e := job._future.exception()) is not None:
+                    raise e
+            self._queue = []
         else:
-            # Just run each job serially
-            for job in self._queue:
-                # Execute the static handler
-                job.execute(self.owner, job.f, job._args, job._kwargs)
-                # Trigger job completion manually as there is no async future object
-                # like in parallel execution.
-                job._completion(None)
+            if self._journal is not None and self._journal.resume:
+                self._skip_completed()
+            progress = self._start_progress(self._queue)
+            try:
+                # Just run each job serially
+                for job in self._queue:
+                    progress._dispatch(job)
+                    job._telemetry["queued"] = time.time()
+                    # Execute the static handler
+                    job._run(self.owner)
+                    # Trigger job completion manually as there is no async future object
+                    # like in parallel execution.
+                    job._completion(None)
+                    progress._complete(job)
+            finally:
+                if self._journal is not None:
+                    self._journal.flush()
+                self._executed = self._queue
+                progress._end()
+                if self.trace:
+                    self.write_trace(self.trace)
             # Clear the queue after all jobs have been done
             self._queue = []
+        self._placement_jobs = {}
+
+    def _start_progress(self, jobs):
+        self._progress = progress = JobProgress(jobs, self.get_progress_sinks())
+        for job in jobs:
+            job._progress = progress
+            job._future.add_done_callback(lambda _, job=job: progress._complete(job))
+        progress._start()
+        return progress
+
+    def _record_job(self, job):
+        # Skipped jobs have to be redone when resuming, don't record those.
+        if job._telemetry.get("skipped"):
+            return
+        if (key := job.get_key()) is not None:
+            self._journal.record(key)
+
+    def _skip_completed(self):
+        """
+        Remove the jobs that the journal recorded as completed from the queue, and clear
+        the chunks that the other placement jobs may have partially written before the
+        compilation was interrupted. The chunks of the other connectivity jobs are
+        cleared as well, as they may have written connections that weren't journaled
+        yet. Completed connectivity jobs that connected cells in the cleared chunks are
+        redone.
+        """
+        from ..exceptions import DatasetNotFoundError
+        from ..reporting import report, warn
+
+        journal = self._journal
+        done = [job for job in self._queue if job.get_key() in journal]
+        todo = [job for job in self._queue if job.get_key() not in journal]
+        # Clearing a chunk removes the cells of all the strategies that placed cells of
+        # the same type in it, so their jobs for that chunk have to be redone too.
+        while True:
+            dirty = {
+                (ct.name, job._c.id)
+                for job in todo
+                if isinstance(job, PlacementJob)
+                for ct in job._strategy.cell_types
+            }
+            redo = [
+                job
+                for job in done
+                if isinstance(job, PlacementJob)
+                and any((ct.name, job._c.id) in dirty for ct in job._strategy.cell_types)
+            ]
+            if not redo:
+                break
+            for job in redo:
+                journal.discard(job.get_key())
+                done.remove(job)
+                todo.append(job)
+        # The connections of the cleared cells, and of the unjournaled connectivity jobs,
+        # have to be removed. Connections are cleared per chunk, so the chunks of the
+        # regions of interest of the redone connectivity jobs are cleared, and the jobs
+        # that connected those chunks are redone as well.
+        conn_dirty = {}
+        for job in todo:
+            if isinstance(job, ConnectivityJob):
+                chunks = conn_dirty.setdefault(job._name, {})
+                chunks.update((chunk.id, chunk) for _, chunk in job._get_roi_chunks())
+        while True:
+            redo = [
+                job
+                for job in done
+                if isinstance(job, ConnectivityJob)
+                and any(
+                    (name, chunk.id) in dirty or chunk.id in conn_dirty.get(job._name, ())
+                    for name, chunk in job._get_roi_chunks()
+                )
+            ]
+            if not redo:
+                break
+            for job in redo:
+                journal.discard(job.get_key())
+                done.remove(job)
+                todo.append(job)
+                chunks = conn_dirty.setdefault(job._name, {})
+                chunks.update((chunk.id, chunk) for _, chunk in job._get_roi_chunks())
+        for name, chunks in conn_dirty.items():
+            try:
+                cs = self.owner.get_connectivity_set(name)
+            except DatasetNotFoundError:
+                continue
+            report(f"Clearing {len(chunks)} chunks of the {name} connections", level=2)
+            try:
+                cs.clear(chunks=list(chunks.values()))
+            except (NotImplementedError, TypeError):
+                warn(
+                    f"The '{name}' connectivity set can't clear chunks, the connections"
+                    " of the redone jobs may be duplicated."
+                )
+        cell_types = {
+            ct.name: ct
+            for job in todo
+            if isinstance(job, PlacementJob)
+            for ct in job._strategy.cell_types
+        }
+        for name, ct in cell_types.items():
+            ps = ct.get_placement_set()
+            chunks = [c for c in ps.get_all_chunks() if (name, c.id) in dirty]
+            if chunks:
+                report(f"Clearing {len(chunks)} unfinished chunks of {name}", level=2)
+                ps.clear(chunks=chunks)
+        report(f"Resuming {len(todo)} jobs, skipping {len(done)} completed jobs", level=2)
+        # Complete the skipped jobs, so that their listeners and dependents are notified.
+        skipped = set(map(id, done))
+        self._queue = [job for job in self._queue if id(job) not in skipped]
+        for job in done:
+            job._completion(None)
+
+    def _sort_by_cost(self):
+        # The sort is stable, so jobs of equal cost keep their queue order.
+        self._queue.sort(key=lambda job: job.get_cost(self) or 0, reverse=True)
+
+    def _get_batch_cost(self, backend):
+        if self._batch_cost is not None:
+            return self._batch_cost
+        # Aim for a couple of batches per worker, so that the load can still be balanced.
+        workers = MPI.get_size() - 1 if backend == "mpi" else self.workers
+        total = sum(job.get_cost(self) or 0 for job in self._queue)
+        return total / (4 * max(workers, 1))
+
+    def _coalesce(self, backend):
+        """
+        Replace groups of neighbouring placement jobs of the same strategy with a single
+        :class:`.PlacementBatchJob`, each group up to the target batch cost.
+        """
+        target = self._get_batch_cost(backend)
+        if not target:
+            return
+        groups = {}
+        for job in self._queue:
+            cost = job.get_cost(self)
+            if type(job) is PlacementJob and cost is not None and cost < target:
+                groups.setdefault((job._name, frozenset(job._deps)), []).append(job)
+        replace = {}
+        for jobs in groups.values():
+            # Neighbouring chunks have adjacent chunk ids.
+            jobs.sort(key=lambda job: job._c.id)
+            batches = [[]]
+            batch_cost = 0
+            for job in jobs:
+                if batches[-1] and batch_cost + job._cost > target:
+                    batches.append([])
+                    batch_cost = 0
+                batches[-1].append(job)
+                batch_cost += job._cost
+            for batch in batches:
+                if len(batch) > 1:
+                    batch_job = PlacementBatchJob(self, batch)
+                    replace.update((id(job), batch_job) for job in batch)
+        # Put each batch in the queue where its first job was.
+        queue = {}
+        for job in self._queue:
+            new = replace.get(id(job), job)
+            queue.setdefault(id(new), new)
+        self._queue = list(queue.values())
+
+    def _count_roi_cells(self, cell_types, roi):
+        # Count the placed cells of the cell types in the chunks of the ROI. Chunks that
+        # queued placement jobs will place cells in are counted from their estimates.
+        count = 0
+        for ct in cell_types:
+            queued = self._placement_jobs.get(ct.name, {})
+            placed = []
+            for chunk in roi:
+                if chunk.id in queued:
+                    count += sum(j._estimate_cells(self, ct) for j in queued[chunk.id])
+                else:
+                    placed.append(chunk)
+            if placed:
+                if ct.name not in self._chunk_stats:
+                    ps = ct.get_placement_set()
+                    self._chunk_stats[ct.name] = ps.get_chunk_stats()
+                stats = self._chunk_stats[ct.name]
+                count += sum(stats.get(str(chunk.id), 0) for chunk in placed)
+        return count
+
+    def _create_thread_pool(self):
+        # The threads share our storage engine, so guard it with a thread lock for the
+        # duration of the execution.
+        engine = self.owner.storage._engine
+        self._engine_lock = getattr(engine, "_lock", None)
+        engine._lock = _PoolLock(threading.RLock(), self._engine_lock)
+        return _ThreadPoolExecutor(max_workers=self.workers)
+
+    def _release_engine_lock(self):
+        self.owner.storage._engine._lock = self._engine_lock
+
+    def _create_local_pool(self):
+        engine = self.owner.storage._engine
+        if getattr(engine, "_process_local", False):
+            raise JobPoolError(
+                f"The '{engine.format}' storage engine keeps its data in the memory of "
+                "the main process, and can't be used with the 'processes' backend."
+            )
+        # Fork the workers, so that they inherit the scaffold that owns this pool.
+        ctx = multiprocessing.get_context("fork")
+        lock = ctx.RLock()
+        # The main process shares the lock of the workers, so that it can safely keep
+        # the journal in the storage during the execution.
+        self._engine_lock = getattr(engine, "_lock", None)
+        engine._lock = _PoolLock(lock, self._engine_lock)
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_process_worker,
+            initargs=(self.id, lock),
+        )
 
 
-def create_job_pool(scaffold):
-    return JobPool(scaffold)
+def create_job_pool(scaffold, **kwargs):
+    return JobPool(scaffold, **kwargs)
@@ -12,10 +12,13 @@
     end goal of this module.
 """
 
+import contextlib
+import threading
 from inspect import isclass
 from ..exceptions import UnknownStorageEngineError
 from .. import plugins
 from ..services import MPI
+from ._buffer import WriteBuffer
 from ._chunks import Chunk, chunklist
 from ._files import (
     FileDependency,
@@ -160,6 +163,8 @@ class Storage:
         ]
         self._engine._format = engine
         self._main = main
+        # Each thread collects its own buffered writes.
+        self._buffers = threading.local()
 
         # Load the engine's interface onto the object, this allows the end user to create
         # features, but it is not advised. Usually the Storage object
@@ -227,11 +232,13 @@ class Storage:
         """
         return self._engine.create()
 
-    def copy(self, new_root):
+    def copy(self, new_root, **kwargs):
         """
-        Move the storage to a new root.
+        Copy the storage to a new root. Additional keyword arguments are passed to the
+        engine, such as the ``engine`` argument of the ``memory`` engine to persist the
+        copy to another engine.
         """
-        self._engine.copy(new_root)
+        return self._engine.copy(new_root, **kwargs)
 
     def move(self, new_root):
         """
@@ -343,6 +350,63 @@ class Storage:
             for tag in self._ConnectivitySet.get_tags(self._engine)
         ]
 
+    @contextlib.contextmanager
+    def buffered(self, budget=None):
+        """
+        Context manager that buffers the placement and connectivity data that is
+        appended through :meth:`append_data` and :meth:`connect` on this thread, and
+        writes it to the storage in bulk when the context exits, or when the buffer
+        exceeds its byte budget. If an error occurs in the context, the data that is still
+        in the buffer is discarded. Nested contexts share the buffer of the outermost
+        context.
+
+        :param budget: Amount of bytes to buffer before the buffer is flushed. Defaults to
+          the ``write_buffer`` option. A budget of 0 disables buffering.
+        :type budget: int
+        """
+        if getattr(self._buffers, "active", None) is not None:
+            yield self._buffers.active
+            return
+        if budget is None:
+            from .. import options
+
+            budget = options.write_buffer
+        if not budget:
+            yield None
+            return
+        buffer = self._buffers.active = WriteBuffer(budget)
+        try:
+            yield buffer
+        except BaseException:
+            buffer.discard()
+            raise
+        else:
+            buffer.flush()
+        finally:
+            self._buffers.active = None
+
+    def append_data(self, ps, chunk, positions, morphologies=None, **kwargs):
+        """
+        Append cells to a placement set, through the write buffer of the current thread,
+        if there is one. See :meth:`~.storage.interfaces.PlacementSet.append_data`.
+        """
+        buffer = getattr(self._buffers, "active", None)
+        if buffer is not None:
+            buffer.append_data(ps, chunk, positions, morphologies, **kwargs)
+        else:
+            ps.append_data(chunk, positions, morphologies, **kwargs)
+
+    def connect(self, cs, pre_set, post_set, src_locs, dest_locs):
+        """
+        Connect cells of 2 placement sets, through the write buffer of the current
+        thread, if there is one. See :meth:`~.storage.interfaces.ConnectivitySet.connect`.
+        """
+        buffer = getattr(self._buffers, "active", None)
+        if buffer is not None:
+            buffer.connect(cs, pre_set, post_set, src_locs, dest_locs)
+        else:
+            cs.connect(pre_set, post_set, src_locs, dest_locs)
+
     def init(self, scaffold):
         """
         Initialize the storage to be ready for use by the specified scaffold.
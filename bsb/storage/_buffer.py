@@ -0,0 +1,182 @@
+"""
+Write-behind buffering of placement and connectivity appends. The buffer collects the
+appends to each placement set chunk and each connectivity set in memory, and writes
+them to the storage in bulk, so that strategies that append many small blocks of data
+cost a single write, and a single lock round-trip, per set and chunk.
+"""
+
+import functools
+
+import numpy as np
+
+from ._chunks import Chunk
+
+
+class WriteBuffer:
+    """
+    Collects the appends to placement and connectivity sets, until the buffer is flushed
+    or exceeds its byte budget.
+
+    Connections are flushed before cells, so that the cell indices of the buffered
+    connections refer to the placement data that was stored when they were made.
+
+    :param budget: Amount of bytes to buffer before everything is flushed.
+    :type budget: int
+    """
+
+    def __init__(self, budget):
+        self._budget = budget
+        self._size = 0
+        self._placement = {}
+        self._connections = {}
+
+    def __len__(self):
+        """
+        Amount of bytes of data in the buffer.
+        """
+        return self._size
+
+    def append_data(
+        self, ps, chunk, positions, morphologies=None, rotations=None, additional=None
+    ):
+        """
+        Buffer an append to the given chunk of a placement set. See
+        :meth:`~bsb.storage.interfaces.PlacementSet.append_data`.
+        """
+        if not isinstance(chunk, Chunk):
+            chunk = Chunk(chunk, None)
+        # Copy the data, the caller is free to change its arrays after the call.
+        data = {"positions": np.array(positions, dtype=float)}
+        if morphologies is not None:
+            data["morphologies"] = morphologies
+        if rotations is not None:
+            data["rotations"] = np.array(rotations, dtype=float)
+        if additional:
+            data["additional"] = {k: np.array(v) for k, v in additional.items()}
+        # Appends can only be merged if they contain the same datasets.
+        signature = (
+            data["positions"].ndim,
+            morphologies is not None,
+            rotations is not None,
+            tuple(sorted(additional or ())),
+        )
+        key = (ps.tag, chunk.id)
+        if key in self._placement and self._placement[key]["signature"] != signature:
+            self._flush_placement(key)
+        entry = self._placement.setdefault(
+            key, {"ps": ps, "chunk": chunk, "signature": signature, "data": []}
+        )
+        entry["data"].append(data)
+        self._grow(_nbytes(data))
+
+    def connect(self, cs, pre_set, post_set, src_locs, dest_locs):
+        """
+        Buffer connections between 2 placement sets. See
+        :meth:`~bsb.storage.interfaces.ConnectivitySet.connect`.
+        """
+        src_locs = np.array(src_locs, dtype=int)
+        dest_locs = np.array(dest_locs, dtype=int)
+        if not len(src_locs):
+            return
+        # The locations refer to the chunks that are loaded at the time of the call.
+        pre_chunks = pre_set.get_loaded_chunks()
+        post_chunks = post_set.get_loaded_chunks()
+        key = (
+            cs.tag,
+            id(pre_set),
+            id(post_set),
+            tuple(c.id for c in pre_chunks),
+            tuple(c.id for c in post_chunks),
+        )
+        if key in self._connections and (
+            self._connections[key]["src"][0].ndim != src_locs.ndim
+            or self._connections[key]["dest"][0].ndim != dest_locs.ndim
+        ):
+            self._flush_connections(key)
+        entry = self._connections.setdefault(
+            key,
+            {
+                "cs": cs,
+                "pre": (pre_set, pre_chunks),
+                "post": (post_set, post_chunks),
+                "src": [],
+                "dest": [],
+            },
+        )
+        entry["src"].append(src_locs)
+        entry["dest"].append(dest_locs)
+        self._grow(src_locs.nbytes + dest_locs.nbytes)
+
+    def flush(self):
+        """
+        Write all of the buffered data to the storage.
+        """
+        for key in list(self._connections.keys()):
+            self._flush_connections(key)
+        for key in list(self._placement.keys()):
+            self._flush_placement(key)
+        self._size = 0
+
+    def discard(self):
+        """
+        Drop all of the buffered data, without writing it.
+        """
+        self._placement.clear()
+        self._connections.clear()
+        self._size = 0
+
+    def _grow(self, nbytes):
+        self._size += nbytes
+        if self._size > self._budget:
+            self.flush()
+
+    def _flush_placement(self, key):
+        entry = self._placement.pop(key)
+        data = entry["data"]
+        morphologies = None
+        if "morphologies" in data[0]:
+            morphologies = functools.reduce(
+                lambda a, b: a.merge(b), (d["morphologies"] for d in data)
+            )
+        rotations = None
+        if "rotations" in data[0]:
+            rotations = np.concatenate([d["rotations"] for d in data])
+        additional = None
+        if "additional" in data[0]:
+            additional = {
+                k: np.concatenate([d["additional"][k] for d in data])
+                for k in data[0]["additional"]
+            }
+        entry["ps"].append_data(
+            entry["chunk"],
+            np.concatenate([d["positions"] for d in data]),
+            morphologies=morphologies,
+            rotations=rotations,
+            additional=additional,
+        )
+        self._size -= sum(map(_nbytes, data))
+
+    def _flush_connections(self, key):
+        entry = self._connections.pop(key)
+        pre_set, pre_chunks = entry["pre"]
+        post_set, post_chunks = entry["post"]
+        src_locs = np.concatenate(entry["src"])
+        dest_locs = np.concatenate(entry["dest"])
+        with pre_set.chunk_context(pre_chunks):
+            if post_set is pre_set:
+                entry["cs"].connect(pre_set, post_set, src_locs, dest_locs)
+            else:
+                with post_set.chunk_context(post_chunks):
+                    entry["cs"].connect(pre_set, post_set, src_locs, dest_locs)
+        self._size -= src_locs.nbytes + dest_locs.nbytes
+
+
+def _nbytes(data):
+    nbytes = data["positions"].nbytes
+    if "morphologies" in data:
+        nbytes += data["morphologies"].get_indices(copy=False).nbytes
+    if "rotations" in data:
+        nbytes += data["rotations"].nbytes
+    for v in data.get("additional", {}).values():
+        nbytes += v.nbytes
+    return nbytes
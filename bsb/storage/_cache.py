@@ -0,0 +1,140 @@
+"""
+Process-wide cache of the datasets that are loaded from the storage. Each chunk of a
+dataset is cached under its engine, set, chunk and dataset name, together with a token
+that changes whenever the stored data changes, so that stale entries are never returned,
+not even when another process changed the data. The cache is bounded by the
+``dataset_cache`` option, and evicts the least recently used datasets first.
+"""
+
+import collections
+import os
+import threading
+
+from .. import options
+
+
+class DatasetCache:
+    """
+    Byte-bounded least recently used cache of the loaded chunk datasets. The cached
+    arrays are read-only, callers must copy them before changing them. Memory maps are
+    cached as they are, without reading their data into memory, but their size still
+    counts towards the budget.
+
+    :param budget: Amount of bytes to cache. Defaults to the ``dataset_cache`` option.
+    :type budget: int
+    """
+
+    def __init__(self, budget=None):
+        self._budget = budget
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Amount of bytes of data in the cache.
+        """
+        return self._size
+
+    @property
+    def budget(self):
+        """
+        Amount of bytes the cache can hold. A budget of 0 disables the cache.
+        """
+        if self._budget is None:
+            self._budget = options.dataset_cache
+        return self._budget
+
+    def resize(self, budget):
+        """
+        Change the budget of the cache, evicting datasets until it fits.
+        """
+        with self._lock:
+            self._budget = budget
+            self._evict()
+
+    def get(self, engine, tag, chunk, dataset, token, loader):
+        """
+        Return the cached dataset of the chunk of a set, or load and cache it.
+
+        :param engine: The engine the set is stored in.
+        :type engine: ~bsb.storage.interfaces.Engine
+        :param tag: Tag of the set.
+        :type tag: str
+        :param chunk: The chunk of the dataset.
+        :type chunk: ~bsb.storage.Chunk
+        :param dataset: Name of the dataset.
+        :type dataset: str
+        :param token: Hashable value that changes when the stored dataset changes. Cached
+          datasets with a different token are loaded again.
+        :param loader: Function that loads the dataset from the storage.
+        :type loader: Callable[[], numpy.ndarray]
+        :returns: The read-only dataset, or the result of the loader if the cache is
+          disabled.
+        :rtype: numpy.ndarray
+        """
+        budget = self.budget
+        if budget <= 0:
+            return loader()
+        key = (_engine_key(engine), tag, chunk.id, dataset)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(key)
+                return entry[1]
+        data = loader().view()
+        data.flags.writeable = False
+        with self._lock:
+            self._pop(key)
+            if data.nbytes <= budget:
+                self._entries[key] = (token, data)
+                self._size += data.nbytes
+                self._evict()
+        return data
+
+    def invalidate(self, engine, tag=None, chunks=None):
+        """
+        Drop the cached datasets of an engine, or of a set of the engine, optionally
+        limited to the given chunks.
+        """
+        engine_key = _engine_key(engine)
+        ids = None if chunks is None else {chunk.id for chunk in chunks}
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if (
+                    key[0] == engine_key
+                    and (tag is None or key[1] == tag)
+                    and (ids is None or key[2] in ids)
+                ):
+                    self._pop(key)
+
+    def clear(self):
+        """
+        Drop all cached datasets.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1].nbytes
+
+    def _evict(self):
+        while self._size > self._budget:
+            _, (_, data) = self._entries.popitem(last=False)
+            self._size -= data.nbytes
+
+    def _after_fork(self):
+        # A forked worker may have copied the lock while another thread held it.
+        self._lock = threading.Lock()
+
+
+def _engine_key(engine):
+    return (engine.format, engine.root)
+
+
+dataset_cache = DatasetCache()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=dataset_cache._after_fork)
@@ -110,3 +110,102 @@ def _safe_ids(self, other):
         np.array(self, copy=False).view(Chunk)._safe_id(),
         np.array(other, copy=False).view(Chunk)._safe_id(),
     )
+
+
+class ChunkIndex:
+    """
+    Index of the cell counts of the chunks of a placement set, sorted by chunk id, and
+    their prefix sums: the offset of the first cell of each chunk in the placement set.
+
+    :param stats: The cell count of each chunk id, as returned by
+      :meth:`~bsb.storage.interfaces.PlacementSet.get_chunk_stats`.
+    :type stats: Dict[str, int]
+    """
+
+    def __init__(self, stats):
+        ids = np.fromiter(map(int, stats.keys()), dtype=np.int64, count=len(stats))
+        counts = np.fromiter(stats.values(), dtype=np.int64, count=len(stats))
+        order = np.argsort(ids)
+        self._ids = ids[order]
+        self._counts = counts[order]
+        self._offsets = np.cumsum(self._counts) - self._counts
+
+    def __len__(self):
+        """
+        Number of cells in the indexed chunks.
+        """
+        return int(np.sum(self._counts))
+
+    @property
+    def ids(self):
+        return self._ids
+
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def offsets(self):
+        return self._offsets
+
+    def offset(self, chunk):
+        """
+        Return the offset of the first cell of a chunk.
+
+        :param chunk: Chunk or chunk id.
+        :type chunk: Union[~bsb.storage.Chunk, int]
+        :raises KeyError: The chunk is not in the index.
+        """
+        id = _chunk_id(chunk)
+        idx = np.searchsorted(self._ids, id)
+        if idx == len(self._ids) or self._ids[idx] != id:
+            raise KeyError(f"Chunk {id} is not in the index.")
+        return int(self._offsets[idx])
+
+    def offsets_of(self, ids):
+        """
+        Return the offsets of the first cell of each of the given chunk ids.
+
+        :param ids: Chunk ids.
+        :type ids: numpy.ndarray
+        :raises KeyError: Some of the chunks are not in the index.
+        """
+        ids = np.asarray(ids, dtype=self._ids.dtype)
+        idx = np.searchsorted(self._ids, ids)
+        found = idx < len(self._ids)
+        found[found] = self._ids[idx[found]] == ids[found]
+        if not np.all(found):
+            raise KeyError(f"Chunks {np.unique(ids[~found])} are not in the index.")
+        return self._offsets[idx]
+
+    def count(self, chunk):
+        """
+        Return the amount of cells in a chunk, 0 if the chunk is not in the index.
+
+        :param chunk: Chunk or chunk id.
+        :type chunk: Union[~bsb.storage.Chunk, int]
+        """
+        id = _chunk_id(chunk)
+        idx = np.searchsorted(self._ids, id)
+        if idx == len(self._ids) or self._ids[idx] != id:
+            return 0
+        return int(self._counts[idx])
+
+    def scoped(self, chunks):
+        """
+        Return an index of only the given chunks.
+
+        :param chunks: The chunks to keep.
+        :type chunks: List[~bsb.storage.Chunk]
+        """
+        mask = np.isin(self._ids, [_chunk_id(c) for c in chunks])
+        return ChunkIndex(dict(zip(self._ids[mask], self._counts[mask])))
+
+
+def _chunk_id(chunk):
+    if isinstance(chunk, Chunk):
+        return chunk.id
+    elif np.ndim(chunk) == 0:
+        return int(chunk)
+    else:
+        return Chunk(chunk, None).id
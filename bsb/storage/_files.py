@@ -8,6 +8,7 @@ import time as _t
 import urllib.parse as _up
 import urllib.request as _ur
 import pathlib as _pl
+import shutil as _sh
 import os as _os
 import functools as _ft
 import typing as _tp
@@ -102,15 +103,37 @@ class FileDependency:
         except (TypeError, FileNotFoundError):
             if self.file_store is None:
                 raise FileNotFoundError(f"Can't find {self}")
-            content = self.get_content()
+            stored = self.get_stored_file()
+            if stored is None or self._scheme.should_update(self, stored):
+                stored = None
+                if self.cache:
+                    id_ = self.store_content(
+                        self._get_content(), meta=self._scheme.get_meta(self)
+                    )
+                    stored = self.file_store.get(id_)
+            if stored is not None:
+                encoding = self.file_store.get_encoding(stored.id)
+                path = self.file_store.get_local_path(stored.id)
+                if path is not None and (
+                    not self.extension or path.endswith(f".{self.extension}")
+                ):
+                    # File based engines can provide the stored file itself.
+                    yield (path, encoding)
+                    return
             with _tf.TemporaryDirectory() as dirpath:
                 name = "file"
                 if self.extension:
                     name = f"{name}.{self.extension}"
                 filepath = _os.path.join(dirpath, name)
                 with open(filepath, "wb") as f:
-                    f.write(content[0])
-                yield (filepath, content[1])
+                    if stored is None:
+                        content, encoding = self._get_content()
+                        f.write(content)
+                    else:
+                        # Stream the stored content, instead of loading it into memory.
+                        with stored.open() as stream:
+                            _sh.copyfileobj(stream, f)
+                yield (filepath, encoding)
 
     def provide_stream(self):
         return self._scheme.provide_stream(self)
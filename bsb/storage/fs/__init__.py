@@ -1,3 +1,4 @@
+import json
 import shutil
 from datetime import datetime
 
@@ -5,8 +6,13 @@ import shortuuid
 
 from ... import config
 from ...services import MPILock
+from .._cache import dataset_cache
 from ..interfaces import Engine, NoopLock, StorageNode as IStorageNode
+from . import _npy
+from .connectivity_set import ConnectivitySet
 from .file_store import FileStore
+from .morphology_repository import MorphologyRepository
+from .placement_set import PlacementSet
 import os
 
 
@@ -15,6 +21,10 @@ class FileSystemEngine(Engine):
         super().__init__(root, comm)
         self._lock = MPILock.sync()
         self._readonly = False
+        # Cached chunk indices of the placement sets, by tag.
+        self._chunk_indices = {}
+        # Cached statistics of the connectivity sets, by tag.
+        self._connectivity_stats = {}
 
     @property
     def root_slug(self):
@@ -50,29 +60,88 @@ class FileSystemEngine(Engine):
 
     def create(self):
         os.makedirs(os.path.join(self._root, "files"), exist_ok=True)
-        os.makedirs(os.path.join(self._root, "file_meta"), exist_ok=True)
+        os.makedirs(os.path.join(self._root, "placement"), exist_ok=True)
+        os.makedirs(os.path.join(self._root, "connectivity"), exist_ok=True)
+        os.makedirs(os.path.join(self._root, "morphologies"), exist_ok=True)
 
     def move(self, new_root):
         shutil.move(self._root, new_root)
         self._root = new_root
 
     def copy(self, new_root):
-        shutil.copytree(self._root, new_root)
+        # The blobs of the file store are never modified, so they can be shared between
+        # copies. Other files are appended to, so they are copied.
+        files = os.path.join(self._root, "files")
+
+        def copy_function(src, dst):
+            if os.path.dirname(src) == files:
+                try:
+                    return os.link(src, dst)
+                except OSError:
+                    pass
+            return shutil.copy2(src, dst)
+
+        shutil.copytree(self._root, new_root, copy_function=copy_function)
 
     def remove(self):
-        os.remove(self._root)
+        shutil.rmtree(self._root)
 
     def require_placement_set(self, ct):
-        raise NotImplementedError("No PS")
+        return PlacementSet.require(self, ct)
 
     def clear_placement(self):
-        pass
+        with self._master_write() as fence:
+            fence.guard()
+            shutil.rmtree(os.path.join(self._root, "placement"), ignore_errors=True)
+            os.makedirs(os.path.join(self._root, "placement"))
+            dataset_cache.invalidate(self)
+            stats = self._read_chunk_stats()
+            for chunk_stats in stats.values():
+                chunk_stats["placed"] = 0
+            self._write_chunk_stats(stats)
 
     def clear_connectivity(self):
-        pass
+        with self._master_write() as fence:
+            fence.guard()
+            shutil.rmtree(os.path.join(self._root, "connectivity"), ignore_errors=True)
+            os.makedirs(os.path.join(self._root, "connectivity"))
+            self._connectivity_stats.clear()
 
     def get_chunk_stats(self):
-        return {}
+        with self._read():
+            stats = self._read_chunk_stats()
+        # The connectivity sets keep their own connection counts, so they are counted
+        # from the connectivity sets, instead of being tracked in the chunk stats.
+        for tag in ConnectivitySet.get_tags(self):
+            cs_stats = ConnectivitySet(self, tag).get_chunk_stats()
+            for chunk_id, counts in cs_stats.items():
+                chunk_stats = stats.setdefault(
+                    chunk_id, {"placed": 0, "connections": {"inc": 0, "out": 0}}
+                )
+                for direction, count in counts.items():
+                    chunk_stats["connections"][direction] += count
+        return stats
+
+    def _track_placed(self, counts):
+        # Track the amount of cells added to (or removed from) each chunk in the global
+        # chunk stats. Should be called while holding the write lock.
+        stats = self._read_chunk_stats()
+        for chunk_id, count in counts.items():
+            chunk_stats = stats.setdefault(
+                chunk_id, {"placed": 0, "connections": {"inc": 0, "out": 0}}
+            )
+            chunk_stats["placed"] += count
+        self._write_chunk_stats(stats)
+
+    def _read_chunk_stats(self):
+        try:
+            with open(os.path.join(self._root, "chunks.json"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_chunk_stats(self, stats):
+        _npy.save_json(os.path.join(self._root, "chunks.json"), stats)
 
 
 def _get_default_root():
@@ -0,0 +1,170 @@
+"""
+Helpers to store the datasets of the ``fs`` engine as raw ``.npy`` files, or as
+headerless block files of fixed width rows. The files are loaded as copy-on-write memory
+maps: no data is read until it is accessed, and changes to the loaded arrays are never
+written back. ``.npy`` files grow by writing rows after the rows in the header, and only
+then updating the shape in the header, so that an interrupted append leaves a valid file.
+Block files grow by appending rows only.
+"""
+
+import io
+import json
+import os
+import numpy as np
+from numpy.lib import format as _fmt
+
+try:
+    import fcntl
+except ImportError:  # pragma: nocover
+    # Not available on Windows
+    fcntl = None
+
+_header_writers = {
+    (1, 0): _fmt.write_array_header_1_0,
+    (2, 0): _fmt.write_array_header_2_0,
+}
+_header_readers = {
+    (1, 0): _fmt.read_array_header_1_0,
+    (2, 0): _fmt.read_array_header_2_0,
+}
+
+
+def load(path, shape=(0,), dtype=float):
+    """
+    Load an ``.npy`` file as a copy-on-write memory map. Missing files load as an empty
+    array of the given shape and dtype.
+    """
+    if not os.path.exists(path):
+        return np.empty(shape, dtype=dtype)
+    data = np.load(path, mmap_mode="c")
+    if not data.size:
+        # Empty memory maps hold on to a file handle for nothing.
+        return np.empty(data.shape, dtype=data.dtype)
+    return data
+
+
+def length(path):
+    """
+    Read the amount of rows in an ``.npy`` file from its header, without loading it.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        version = _fmt.read_magic(f)
+        shape, _, _ = _header_readers[version](f)
+    return shape[0] if shape else 0
+
+
+def save(path, data):
+    """
+    Write an array to an ``.npy`` file. The file is replaced atomically, so that memory
+    maps of the previous content remain valid.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.asarray(data))
+    os.replace(tmp, path)
+
+
+def save_json(path, obj):
+    """
+    Write an object to a JSON file, atomically replacing the previous content. NumPy
+    arrays, NumPy scalars and sets are converted to their JSON equivalent.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(obj, f, default=_json_default)
+    except Exception:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+
+
+def _json_default(obj):
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    elif isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def append(path, data):
+    """
+    Append rows to an ``.npy`` file, creating it if it doesn't exist. The rows are cast
+    to the dtype of the file. The rows are written and flushed before the header is
+    updated, so readers never see a shape that includes rows that aren't written yet.
+    """
+    data = np.asarray(data)
+    if not os.path.exists(path):
+        return save(path, data)
+    with open(path, "r+b") as f:
+        version = _fmt.read_magic(f)
+        shape, fortran_order, dtype = _header_readers[version](f)
+        if fortran_order or tuple(shape[1:]) != data.shape[1:]:
+            raise ValueError(
+                f"Can't append data of shape {data.shape} to '{path}' of shape {shape}."
+            )
+        header_size = f.tell()
+        header = io.BytesIO()
+        _header_writers[version](
+            header,
+            {
+                "descr": _fmt.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": (shape[0] + len(data), *shape[1:]),
+            },
+        )
+        if header.tell() == header_size:
+            # Write over any rows that an interrupted append left beyond the header shape.
+            f.seek(header_size + int(np.prod(shape)) * dtype.itemsize)
+            f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+            f.truncate()
+            f.flush()
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+    # The new shape doesn't fit in the old header, rewrite the whole file.
+    save(path, np.concatenate((np.load(path), data.astype(dtype, copy=False))))
+
+
+def load_rows(path, cols, dtype):
+    """
+    Load a block file of rows with ``cols`` columns as a copy-on-write memory map.
+    Missing files load as an empty array.
+    """
+    rows = count_rows(path, cols, dtype)
+    if not rows:
+        return np.empty((0, cols), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="c", shape=(rows, cols))
+
+
+def count_rows(path, cols, dtype):
+    """
+    Count the rows in a block file from its size, without opening it. Rows that are still
+    being written are not counted.
+    """
+    try:
+        return os.path.getsize(path) // (cols * np.dtype(dtype).itemsize)
+    except FileNotFoundError:
+        return 0
+
+
+def append_rows(path, data, dtype):
+    """
+    Append rows to a block file, creating it if it doesn't exist. Large blocks may take
+    several writes, so the file is locked while the rows are written, so that the rows of
+    concurrent writers of the same file don't interleave. Writers of other files don't
+    wait on the lock. On Windows, the file is not locked.
+    """
+    data = np.ascontiguousarray(data, dtype=dtype).tobytes()
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            # Closing the file releases the lock.
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        view = memoryview(data)
+        while len(view):
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
@@ -0,0 +1,525 @@
+import errr
+import json
+import os
+import shutil
+
+import numpy as np
+
+from ...exceptions import DatasetExistsError, DatasetNotFoundError
+from .._chunks import Chunk, chunklist
+from ..interfaces import ConnectivitySet as IConnectivitySet, ConnectivityStats
+from . import _npy
+
+# Each row of a block holds a local and a global location of 3 ints.
+_cols = 6
+_dtype = "<i8"
+_ext = ".blk"
+# Each row of the stats log of a chunk holds a direction and a connection count.
+_stats_cols = 2
+_directions = ("inc", "out")
+
+
+class LocationOutOfBoundsError(Exception):
+    pass
+
+
+class ConnectivitySet(IConnectivitySet):
+    """
+    Fetches connectivity data from storage. Each direction of a connectivity set stores
+    one append-only block file per pair of local and global chunk, under
+    ``connectivity/<tag>/<direction>/<local chunk id>/<global chunk id>.blk``. The block
+    files are the index of the set: the chunks are listed from the directories, and the
+    amount of connections of each block from the size of its file. Writers lock the file
+    that they append rows to, so that the writers of different blocks don't wait on each
+    other, and a block is loaded with a single memory map.
+
+    The connection counts of each local chunk are kept in
+    ``connectivity/<tag>/stats/<local chunk id>.blk``, a log to which every append adds
+    its count, and every clear the negative count of the removed blocks, so that the
+    statistics of the set are read without listing the blocks.
+
+    .. note::
+
+        Use :meth:`Scaffold.get_connectivity_set <bsb.core.Scaffold.get_connectivity_set>`
+        to correctly obtain a :class:`~bsb.storage.interfaces.ConnectivitySet`.
+    """
+
+    def __init__(self, engine, tag):
+        self._engine = engine
+        self.tag = tag
+        self.pre_type = None
+        self.post_type = None
+        if not self.exists(engine, tag):
+            raise DatasetNotFoundError(
+                f"ConnectivitySet '{tag}' does not exist. Choose from: "
+                + errr.quotejoin(self.get_tags(self._engine))
+            )
+        with open(_meta_path(self._path), "r") as f:
+            meta = json.load(f)
+        self._pre_name = meta["pre"]
+        self._post_name = meta["post"]
+
+    def __eq__(self, other):
+        return self._engine == getattr(other, "_engine", None) and self.tag == getattr(
+            other, "tag", None
+        )
+
+    def __len__(self):
+        return sum(stats["out"] for stats in self.get_chunk_stats().values())
+
+    @property
+    def _path(self):
+        return _cs_path(self._engine, self.tag)
+
+    @classmethod
+    def get_tags(cls, engine):
+        """
+        Returns all the connectivity tags in the network.
+        """
+        root = os.path.join(engine.root, "connectivity")
+        try:
+            tags = os.listdir(root)
+        except FileNotFoundError:
+            return []
+        return [tag for tag in tags if os.path.exists(_meta_path(root, tag))]
+
+    @classmethod
+    def create(cls, engine, pre_type, post_type, tag=None):
+        """
+        Create the structure for this connectivity set in the storage folder.
+        Connectivity sets are stored under ``connectivity/<tag>``.
+        """
+        if tag is None:
+            tag = f"{pre_type.name}_to_{post_type.name}"
+        with engine._write():
+            path = _cs_path(engine, tag)
+            if os.path.exists(_meta_path(path)):
+                raise DatasetExistsError(f"ConnectivitySet '{tag}' already exists.")
+            _create(path, pre_type, post_type)
+        cs = cls(engine, tag)
+        cs.pre_type = pre_type
+        cs.post_type = post_type
+        return cs
+
+    @staticmethod
+    def exists(engine, tag):
+        """
+        Checks whether a :class:`~.connectivity_set.ConnectivitySet` with the given tag
+        exists.
+
+        :param engine: Engine to use for the lookup.
+        :type engine: :class:`.FileSystemEngine`
+        :param tag: Tag of the set to look for.
+        :type tag: str
+        :returns: Whether the tag exists.
+        :rtype: bool
+        """
+        return os.path.exists(_meta_path(_cs_path(engine, tag)))
+
+    @classmethod
+    def require(cls, engine, pre_type, post_type, tag=None):
+        """
+        Get or create a :class:`~.connectivity_set.ConnectivitySet`.
+
+        :param engine: Engine to fetch/write the data.
+        :type engine: :class:`.FileSystemEngine`
+        :param pre_type: Presynaptic cell type.
+        :type pre_type: :class:`~bsb.cell_types.CellType`
+        :param post_type: Postsynaptic cell type.
+        :type post_type: :class:`~bsb.cell_types.CellType`
+        :param tag: Tag to store the set under. Defaults to
+          ``{pre_type.name}_to_{post_type.name}``.
+        :type tag: str
+        :returns: Existing or new connectivity set.
+        :rtype: :class:`~.connectivity_set.ConnectivitySet`
+        """
+        if tag is None:
+            tag = f"{pre_type.name}_to_{post_type.name}"
+        if not cls.exists(engine, tag):
+            with engine._write():
+                if not cls.exists(engine, tag):
+                    _create(_cs_path(engine, tag), pre_type, post_type)
+        cs = cls(engine, tag)
+        for given, stored in ((pre_type, cs._pre_name), (post_type, cs._post_name)):
+            if given.name != stored:
+                raise ValueError(
+                    f"Given and stored type mismatch: {given.name} vs {stored}"
+                )
+        cs.pre_type = pre_type
+        cs.post_type = post_type
+        return cs
+
+    def remove(self):
+        """
+        Remove the connectivity set and all of its data.
+        """
+        shutil.rmtree(self._path)
+
+    def clear(self, chunks=None):
+        """
+        Clear the connections from and to the given chunks, or all connections.
+
+        :param chunks: If given, the specific chunks to clear.
+        :type chunks: List[bsb.storage.Chunk]
+        """
+        with self._engine._write():
+            self._clear(chunks)
+        self._engine._connectivity_stats.pop(self.tag, None)
+
+    def _clear(self, chunks):
+        if chunks is None:
+            for name in (*_directions, "stats"):
+                shutil.rmtree(os.path.join(self._path, name), ignore_errors=True)
+                os.makedirs(os.path.join(self._path, name))
+            return
+        chunks = chunklist(chunks)
+        for chunk in chunks:
+            try:
+                os.remove(_stats_path(self._path, chunk))
+            except FileNotFoundError:
+                pass
+        for code, direction in enumerate(_directions):
+            for lchunk in self.get_local_chunks(direction):
+                if lchunk in chunks:
+                    shutil.rmtree(self._block_path(direction, lchunk))
+                    continue
+                count = 0
+                for gchunk in self.get_global_chunks(direction, lchunk):
+                    if gchunk in chunks:
+                        count += self._count_rows(direction, lchunk, gchunk)
+                        os.remove(self._block_path(direction, lchunk, gchunk))
+                if count:
+                    _npy.append_rows(
+                        _stats_path(self._path, lchunk), [(code, -count)], _dtype
+                    )
+
+    def connect(self, pre_set, post_set, src_locs, dest_locs):
+        src_locs = _point_to_2d(src_locs)
+        dest_locs = _point_to_2d(dest_locs)
+        if not len(src_locs):
+            return
+        if len(src_locs) != len(dest_locs):
+            raise ValueError("Location matrices must be of same length.")
+        if pre_set._requires_morpho_mapping():
+            src_locs = pre_set._morpho_backmap(src_locs)
+        if post_set._requires_morpho_mapping():
+            dest_locs = post_set._morpho_backmap(dest_locs)
+        for data in self._demux(pre_set, post_set, src_locs, dest_locs):
+            if not len(data[-1]):
+                # Don't write empty data
+                continue
+            self.chunk_connect(*data)
+
+    def _demux(self, pre, post, src_locs, dst_locs):
+        src_chunks = pre.get_loaded_chunks()
+        lns = []
+        for src in src_chunks:
+            with pre.chunk_context([src]):
+                lns.append(len(pre))
+        # Iterate over each destination chunk
+        for dst in post.get_loaded_chunks():
+            # Count the number of cells
+            with post.chunk_context([dst]):
+                ln = len(post)
+            dst_idx = dst_locs[:, 0] < ln
+            dst_block = dst_locs[dst_idx]
+            src_block = src_locs[dst_idx]
+            for src, sln in zip(src_chunks, lns):
+                block_idx = (src_block[:, 0] >= 0) & (src_block[:, 0] < sln)
+                yield src, dst, src_block[block_idx], dst_block[block_idx]
+                src_block[:, 0] -= sln
+            dst_locs = dst_locs[~dst_idx]
+            src_locs = src_locs[~dst_idx]
+            # We sifted `ln` cells out of the dataset, so reduce the ids.
+            dst_locs[:, 0] -= ln
+        if len(dst_locs) > 0:
+            raise LocationOutOfBoundsError(
+                f"Received {len(dst_locs)} out of bounds locations:"
+                f"\n- Source locations:\n{src_locs}"
+                f"\n- Destinations:\n{dst_locs}"
+            )
+
+    def chunk_connect(self, src_chunk, dst_chunk, src_locs, dst_locs):
+        if len(src_locs) != len(dst_locs):
+            raise ValueError("Location matrices must be of same length.")
+        self._append("inc", dst_chunk, src_chunk, dst_locs, src_locs)
+        self._append("out", src_chunk, dst_chunk, src_locs, dst_locs)
+
+    def _append(self, direction, local_, global_, lloc, gloc):
+        os.makedirs(self._block_path(direction, local_), exist_ok=True)
+        data = np.hstack((_point_to_2d(lloc), _point_to_2d(gloc)))
+        _npy.append_rows(self._block_path(direction, local_, global_), data, _dtype)
+        _npy.append_rows(
+            _stats_path(self._path, local_),
+            [(_directions.index(direction), len(data))],
+            _dtype,
+        )
+        self._engine._connectivity_stats.pop(self.tag, None)
+
+    def get_chunk_stats(self):
+        """
+        Count the incoming and outgoing connections of each chunk.
+
+        :returns: The incoming and outgoing connections per chunk id.
+        :rtype: Dict[str, Dict[str, int]]
+        """
+        stats = {}
+        for chunk in _list_chunks(_stats_path(self._path)):
+            log = _npy.load_rows(_stats_path(self._path, chunk), _stats_cols, _dtype)
+            # Sum the counts of each direction in the log.
+            counts = np.bincount(log[:, 0], weights=log[:, 1], minlength=2).astype(int)
+            if np.any(counts):
+                stats[str(chunk.id)] = dict(zip(_directions, map(int, counts)))
+        return stats
+
+    def stats(self):
+        """
+        Compute the statistics of the connections. The statistics are cached on the
+        engine, until the stats logs of the set or the placement of its cell types change.
+
+        :rtype: ~bsb.storage.interfaces.ConnectivityStats
+        """
+        token = _stats_token(_stats_path(self._path))
+        indices = (
+            self.pre_type.get_placement_set().get_chunk_index(),
+            self.post_type.get_placement_set().get_chunk_index(),
+        )
+        cached = self._engine._connectivity_stats.get(self.tag)
+        if cached is None or cached[0] != token or cached[1]._indices != indices:
+            cached = (token, ConnectivityStats(self))
+            self._engine._connectivity_stats[self.tag] = cached
+        return cached[1]
+
+    def get_local_chunks(self, direction):
+        return _list_chunks(os.path.join(self._path, direction))
+
+    def get_global_chunks(self, direction, local_):
+        return _list_chunks(self._block_path(direction, local_))
+
+    def nested_iter_connections(self, direction=None, local_=None, global_=None):
+        """
+        Iterates over the connectivity data, leaving room for the end-user to set up
+        nested for loops:
+
+        .. code-block:: python
+
+          for dir, local_itr in self.nested_iter_connections():
+              for lchunk, global_itr in local_itr:
+                  print("I can do something at the start of a new local chunk")
+                  for gchunk, data in global_itr:
+                      print(f"Nested {dir} block between {lchunk} and {gchunk}")
+                  print("Or right before we move to the next local chunk")
+
+        If a keyword argument is given, that axis is not iterated over, and the amount of
+        nested loops is reduced.
+
+        :param direction: When omitted, iterates ``inc`` and ``out``, otherwise when
+          given, pins it to the given value
+        :type direction: str
+        :param local_: When omitted, iterates over all local chunks in the set. When
+          given, it restricts the iteration to the given value(s).
+        :type local_: Union[~bsb.storage.Chunk, list[~bsb.storage.Chunk]]
+        :param global_: When omitted, iterates over all global chunks in the set. When
+          given, it restricts the iteration to the given value(s).
+        :type global_: Union[~bsb.storage.Chunk, list[~bsb.storage.Chunk]]
+        :returns: An iterator that produces the next unrestricted iteration values, or
+          the connection dataset that matches the iteration combination.
+        """
+        return CSIterator(self, direction, local_, global_)
+
+    def flat_iter_connections(self, direction=None, local_=None, global_=None):
+        """
+        Iterates over the connectivity data.
+
+        .. code-block:: python
+
+          for dir, lchunk, gchunk, data in self.flat_iter_connections():
+              print(f"Flat {dir} block between {lchunk} and {gchunk}")
+
+        If a keyword argument is given, that axis is not iterated over, and the value is
+        fixed in each iteration.
+
+        :param direction: When omitted, iterates ``inc`` and ``out``. When given, it
+          restricts the iteration to the given value.
+        :type direction: str
+        :param local_: When omitted, iterates over all local chunks in the set. When
+          given, it restricts the iteration to the given value(s).
+        :type local_: Union[~bsb.storage.Chunk, list[~bsb.storage.Chunk]]
+        :param global_: When omitted, iterates over all global chunks in the set. When
+          given, it restricts the iteration to the given value(s).
+        :type global_: Union[~bsb.storage.Chunk, list[~bsb.storage.Chunk]]
+        :returns: Yields the direction, local chunk, global chunk, and data. The data is a
+          tuple of the local and global connection locations.
+        :rtype: Tuple[str, ~bsb.storage.Chunk, ~bsb.storage.Chunk,
+          Tuple[numpy.ndarray, numpy.ndarray]]
+        """
+        itr = CSIterator(self, direction, local_, global_)
+        for direction in get_dir_iter(direction):
+            for lchunk in itr.get_local_iter(direction, local_):
+                for gchunk in itr.get_global_iter(direction, lchunk, global_):
+                    conns = self.load_block_connections(direction, lchunk, gchunk)
+                    yield direction, lchunk, gchunk, conns
+
+    def load_block_connections(self, direction, local_, global_):
+        """
+        Load the connection block with given direction between the given local and global
+        chunk. The block is a copy-on-write memory map of its block file.
+
+        :param direction: Either ``inc`` to load the connections from the incoming
+          perspective or ``out`` for the outgoing perspective.
+        :type direction: str
+        :param local_: Local chunk
+        :type local_: ~bsb.storage.Chunk
+        :param global_: Global chunk
+        :type global_: ~bsb.storage.Chunk
+        :returns: The local and global connections locations
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+        """
+        block = _npy.load_rows(
+            self._block_path(direction, local_, global_), _cols, _dtype
+        )
+        return block[:, :3], block[:, 3:]
+
+    def load_local_connections(self, direction, local_):
+        """
+        Load all the connections of the given local chunk.
+
+        :param direction: Either ``inc`` to load the connections from the incoming
+          perspective or ``out`` for the outgoing perspective.
+        :type direction: str
+        :param local_: Local chunk
+        :type local_: ~bsb.storage.Chunk
+        :returns: The local connection locations, a vector of the global connection chunks
+          (1 chunk id per connection) and the global connections locations. To identify a
+          cell in the global connections, use the corresponding chunk id from the second
+          return value.
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+        """
+        gchunks = self.get_global_chunks(direction, local_)
+        blocks = [
+            _npy.load_rows(self._block_path(direction, local_, g), _cols, _dtype)
+            for g in gchunks
+        ]
+        data = np.concatenate([np.empty((0, _cols), dtype=_dtype), *blocks])
+        col = np.repeat([g.id for g in gchunks], [len(b) for b in blocks])
+        return data[:, :3], col, data[:, 3:]
+
+    def _count_rows(self, direction, local_, global_):
+        return _npy.count_rows(
+            self._block_path(direction, local_, global_), _cols, _dtype
+        )
+
+    def _block_path(self, direction, local_, global_=None):
+        path = os.path.join(self._path, direction, str(local_.id))
+        if global_ is not None:
+            path = os.path.join(path, f"{global_.id}{_ext}")
+        return path
+
+
+def _cs_path(engine, tag):
+    return os.path.join(engine.root, "connectivity", tag)
+
+
+def _meta_path(*paths):
+    return os.path.join(*paths, "meta.json")
+
+
+def _stats_path(path, chunk=None):
+    path = os.path.join(path, "stats")
+    if chunk is not None:
+        path = os.path.join(path, f"{chunk.id}{_ext}")
+    return path
+
+
+def _stats_token(path):
+    # A value that changes whenever one of the stats logs in the directory changes.
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return None
+    return frozenset(
+        (entry.name, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        for entry in entries
+        for stat in (entry.stat(),)
+    )
+
+
+def _create(path, pre_type, post_type):
+    os.makedirs(os.path.join(path, "inc"), exist_ok=True)
+    os.makedirs(os.path.join(path, "out"), exist_ok=True)
+    os.makedirs(os.path.join(path, "stats"), exist_ok=True)
+    _npy.save_json(_meta_path(path), {"pre": pre_type.name, "post": post_type.name})
+
+
+def _list_chunks(path):
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return []
+    ids = (os.path.splitext(name)[0] for name in names)
+    return chunklist(Chunk.from_id(int(id), None) for id in ids if id.isdigit())
+
+
+def get_dir_iter(direction):
+    return ("inc", "out") if direction is None else (direction,)
+
+
+class CSIterator:
+    def __init__(self, cs, direction=None, local_=None, global_=None):
+        self._cs = cs
+        self._dir = direction
+        self._lchunks = local_
+        self._gchunks = global_
+
+    def __iter__(self):
+        if self._dir is None:
+            yield from (
+                (
+                    direction,
+                    CSIterator(self._cs, direction, self._lchunks, self._gchunks),
+                )
+                for direction in get_dir_iter(self._dir)
+            )
+        elif not isinstance(self._lchunks, Chunk):
+            yield from (
+                (lchunk, CSIterator(self._cs, self._dir, lchunk, self._gchunks))
+                for lchunk in self.get_local_iter(self._dir, self._lchunks)
+            )
+        elif not isinstance(self._gchunks, Chunk):
+            yield from (
+                (
+                    gchunk,
+                    self._cs.load_block_connections(self._dir, self._lchunks, gchunk),
+                )
+                for gchunk in self.get_global_iter(
+                    self._dir, self._lchunks, self._gchunks
+                )
+            )
+        else:
+            yield self._cs.load_block_connections(self._dir, self._lchunks, self._gchunks)
+
+    def get_local_iter(self, direction, local_):
+        if local_ is None:
+            return self._cs.get_local_chunks(direction)
+        elif isinstance(local_, Chunk):
+            return (local_,)
+        else:
+            return iter(chunklist(local_))
+
+    def get_global_iter(self, direction, local_, global_):
+        if global_ is None:
+            return self._cs.get_global_chunks(direction, local_)
+        elif isinstance(global_, Chunk):
+            return (global_,)
+        else:
+            return iter(chunklist(global_))
+
+
+def _point_to_2d(arr):
+    arr = np.array(arr, copy=False, dtype=int)
+    if arr.ndim == 1:
+        ret = np.full((len(arr), 3), -1)
+        ret[:, 0] = arr
+        return ret
+    else:
+        return arr
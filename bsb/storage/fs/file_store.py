@@ -1,11 +1,19 @@
 import json
 import os
+import shutil
+import threading
 import time
 import typing
 from uuid import uuid4
 import base64
+import contextlib
+import hashlib
 
-from ..interfaces import FileStore as IFileStore
+from ..interfaces import FileStore as IFileStore, StoredFile
+
+
+# Amount of superseded records in the metadata log before it is compacted.
+_compact_threshold = 1000
 
 
 def _id_to_path(url):
@@ -16,25 +24,55 @@ def _path_to_id(f):
     return base64.urlsafe_b64decode(f).decode("UTF-8")
 
 
+def _blob_name(record):
+    # Files stored before content addressing are stored under their encoded id.
+    return record.get("blob") or _id_to_path(record["id"])
+
+
+def _hash_file(path):
+    hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(2**20):
+            hash.update(chunk)
+    return hash.hexdigest()
+
+
+def _meta_key(value):
+    # Metadata values may be unhashable, so they are indexed by their JSON encoding.
+    return json.dumps(value, sort_keys=True)
+
+
 class FileStore(IFileStore):
+    """
+    Stores the files under ``files/`` and their metadata in ``file_meta.log``, a log of
+    JSON records to which every store and removal is appended. The log is read into an
+    index of the records by id and by metadata key and value, and on later lookups only
+    the records appended since are read. When the log holds many superseded records it is
+    compacted.
+
+    The files are stored as blobs named after the SHA-256 hash of their content, and the
+    records point to their blob, so that identical content is stored once. A blob is
+    removed when no record points to it anymore. Blobs are never modified, so the paths
+    given by :meth:`get_local_path` should only be read from.
+    """
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        self._index_lock = threading.Lock()
+        self._reset_index(None)
+
     def file_path(self, *paths):
         return os.path.join(self._engine.root, "files", *paths)
 
     def id_to_file_path(self, id):
-        path = _id_to_path(id)
-        return self.file_path(path)
-
-    def meta_path(self, *paths):
-        return os.path.join(self._engine.root, "file_meta", *paths)
+        return self.file_path(_blob_name(self._get_record(id)))
 
-    def id_to_meta_path(self, id):
-        path = _id_to_path(id)
-        return self.meta_path(path)
+    def log_path(self):
+        return os.path.join(self._engine.root, "file_meta.log")
 
     def all(self):
-        return {
-            id: self.get_meta(id) for id in map(_path_to_id, os.listdir(self.file_path()))
-        }
+        records = dict(self._get_index())
+        return {id: record["meta"] for id, record in records.items()}
 
     def store(self, content, id=None, meta=None, encoding=None, overwrite=False):
         if isinstance(content, str):
@@ -43,14 +81,8 @@ class FileStore(IFileStore):
             content = content.encode(encoding)
         if id is None:
             id = str(uuid4())
-        if meta is None:
-            meta = {}
-        if not overwrite and self.has(id):
-            raise FileExistsError(f"Store already contains a file with id {id}")
-        with open(self.id_to_file_path(id), "wb") as f:
+        with self.open_write(id, meta, encoding, overwrite) as f:
             f.write(content)
-        with open(self.id_to_meta_path(id), "w") as f:
-            json.dump({"meta": meta, "mtime": time.time(), "encoding": encoding}, f)
         return id
 
     def load(self, id):
@@ -63,13 +95,57 @@ class FileStore(IFileStore):
         :rtype: str
         :raises FileNotFoundError: The given id doesn't exist in the file store.
         """
+        our_meta = self._get_meta(id)
         with open(self.id_to_file_path(id), "rb") as f:
             content = f.read()
-        our_meta = self._get_meta(id)
         meta = our_meta["meta"]
         encoding = our_meta["encoding"]
         return (content.decode(encoding) if encoding else content), meta
 
+    def open_read(self, id):
+        """
+        Open the stored file to read its content.
+
+        :param id: id of the file to read.
+        :type id: str
+        :returns: A readable binary file object.
+        :rtype: BinaryIO
+        :raises FileNotFoundError: The given id doesn't exist in the file store.
+        """
+        self._get_meta(id)
+        return open(self.id_to_file_path(id), "rb")
+
+    @contextlib.contextmanager
+    def open_write(self, id, meta=None, encoding=None, overwrite=False):
+        """
+        Open a file to write the content of a file to. The content is written to a
+        temporary file, that is stored as a blob when the context exits without errors,
+        unless a blob with the same content already exists.
+        """
+        if meta is None:
+            meta = {}
+        if not overwrite and self.has(id):
+            raise FileExistsError(f"Store already contains a file with id {id}")
+        tmp = self.file_path(f"{uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                yield f
+            record = {"id": id, "meta": meta, "mtime": time.time(), "encoding": encoding}
+            record["blob"] = _hash_file(tmp)
+            self._append(record, tmp)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def get_local_path(self, id):
+        """
+        Return the path of the stored file.
+
+        :raises FileNotFoundError: The given id doesn't exist in the file store.
+        """
+        self._get_meta(id)
+        return self.id_to_file_path(id)
+
     def remove(self, id):
         """
         Remove the content of an object in the file store.
@@ -78,8 +154,20 @@ class FileStore(IFileStore):
         :type id: str
         :raises FileNotFoundError: The given id doesn't exist in the file store.
         """
-        os.unlink(self.id_to_file_path(id))
-        os.unlink(self.id_to_meta_path(id))
+        self._get_record(id)
+        self._append({"id": id, "removed": True})
+
+    def find_id(self, id):
+        return self.get(id) if self.has(id) else None
+
+    def find_meta(self, key, value):
+        """
+        Find a file whose metadata has the given value for the given key, using the index
+        of the metadata log.
+        """
+        self._get_index()
+        ids = list(self._by_meta.get(key, {}).get(_meta_key(value), ()))
+        return StoredFile(self, ids[0]) if ids else None
 
     def store_active_config(self, config):
         """
@@ -91,6 +179,8 @@ class FileStore(IFileStore):
         :returns: The id the config was stored under
         :rtype: str
         """
+        for stored in self.find_files(lambda _, meta: meta.get("active_config", False)):
+            self.remove(stored.id)
         return self.store(json.dumps(config.__tree__()), meta={"active_config": True})
 
     def load_active_config(self):
@@ -119,7 +209,7 @@ class FileStore(IFileStore):
         """
         Must return whether the file store has a file with the given id.
         """
-        return os.path.exists(self.id_to_file_path(id))
+        return id in self._get_index()
 
     def get_mtime(self, id):
         """
@@ -138,11 +228,126 @@ class FileStore(IFileStore):
         """
         Must return the metadata of the given id.
         """
-        with open(self.id_to_meta_path(id), "r") as f:
-            return json.load(f)
+        # Return a copy, callers may modify the metadata.
+        return json.loads(json.dumps(self._get_record(id)))
+
+    def _get_record(self, id):
+        record = self._get_index().get(id)
+        if record is None:
+            raise FileNotFoundError(f"File with id '{id}' not found.")
+        return record
 
     def get_meta(self, id) -> typing.Mapping[str, typing.Any]:
         """
         Must return the metadata of the given id.
         """
         return self._get_meta(id)["meta"]
+
+    def _append(self, record, blob=None):
+        # Append a record to the log, after moving its blob into place. The blobs of the
+        # replaced record are removed if no other record points to them.
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        self._get_index()
+        with self._engine._write():
+            old = self._get_index().get(record["id"])
+            if blob is not None:
+                if os.path.exists(self.file_path(record["blob"])):
+                    os.remove(blob)
+                else:
+                    os.replace(blob, self.file_path(record["blob"]))
+            # A single write to a file opened in append mode is never interleaved with
+            # the writes of other processes.
+            fd = os.open(self.log_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+            self._get_index()
+            if old is not None and not self._by_blob.get(_blob_name(old)):
+                try:
+                    os.remove(self.file_path(_blob_name(old)))
+                except FileNotFoundError:
+                    pass
+            if self._superseded > max(_compact_threshold, len(self._records)):
+                self._compact()
+
+    def _compact(self):
+        # Rewrite the log with only the current records. Must hold the write lock.
+        self._get_index()
+        tmp = f"{self.log_path()}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            for record in self._records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp, self.log_path())
+
+    def _get_index(self):
+        # Read the records that were appended to the log since the last lookup.
+        with self._index_lock:
+            return self._read_log()
+
+    def _read_log(self):
+        path = self.log_path()
+        if not os.path.exists(path):
+            self._migrate()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._reset_index(None)
+            return self._records
+        if self._log != (path, stat.st_ino) or stat.st_size < self._offset:
+            # The log was compacted, or the engine moved.
+            self._reset_index((path, stat.st_ino))
+        if stat.st_size > self._offset:
+            with open(path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+            # Skip an incomplete last line that is still being written.
+            data = data[: data.rfind(b"\n") + 1]
+            self._offset += len(data)
+            for line in data.splitlines():
+                self._index(json.loads(line))
+        return self._records
+
+    def _reset_index(self, log):
+        self._log = log
+        self._offset = 0
+        self._records = {}
+        self._by_meta = {}
+        self._by_blob = {}
+        self._superseded = 0
+
+    def _index(self, record):
+        id = record["id"]
+        old = self._records.pop(id, None)
+        if old is not None:
+            self._superseded += 1
+            for key, value in old["meta"].items():
+                ids = self._by_meta[key][_meta_key(value)]
+                ids.pop(id, None)
+            self._by_blob[_blob_name(old)].pop(id, None)
+        if record.get("removed"):
+            self._superseded += 1
+            return
+        self._records[id] = record
+        self._by_blob.setdefault(_blob_name(record), {})[id] = None
+        for key, value in record["meta"].items():
+            self._by_meta.setdefault(key, {}).setdefault(_meta_key(value), {})[id] = None
+
+    def _migrate(self):
+        # Build the log from the metadata files of stores that kept one per file.
+        legacy = os.path.join(self._engine.root, "file_meta")
+        if not os.path.isdir(legacy):
+            return
+        with self._engine._write():
+            if os.path.exists(self.log_path()):
+                return
+            records = []
+            for name in os.listdir(legacy):
+                with open(os.path.join(legacy, name), "r") as f:
+                    records.append({"id": _path_to_id(name), **json.load(f)})
+            tmp = f"{self.log_path()}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+            os.replace(tmp, self.log_path())
+            shutil.rmtree(legacy)
@@ -0,0 +1,200 @@
+import base64
+import itertools
+import json
+import os
+import shutil
+
+import numpy as np
+
+from ..._encoding import EncodedLabels
+from ...exceptions import MissingMorphologyError, MorphologyRepositoryError
+from ...morphologies import Branch, Morphology
+from ..interfaces import (
+    MorphologyRepository as IMorphologyRepository,
+    StoredMorphology,
+)
+from . import _npy
+
+
+class MorphologyRepository(IMorphologyRepository):
+    """
+    Stores morphologies as the raw ``.npy`` files of their shared buffers, and their
+    branch topology as an array of branch end pointers and parent branch indices. The
+    metadata, labelsets and property names of all morphologies are kept in a single
+    ``index.json``, so that the repository can be listed and queried without touching
+    point data. Morphologies are loaded from copy-on-write memory maps.
+    """
+
+    def _path(self, *paths):
+        return os.path.join(self._engine.root, "morphologies", *paths)
+
+    def _read_index(self):
+        try:
+            with open(self._path("index.json"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_index(self, index):
+        os.makedirs(self._path(), exist_ok=True)
+        _npy.save_json(self._path("index.json"), index)
+
+    def _get_entry(self, name, index=None):
+        if index is None:
+            index = self._read_index()
+        try:
+            return index[name]
+        except KeyError:
+            raise MissingMorphologyError(
+                f"`{self._engine.root}` contains no morphology named `{name}`."
+            ) from None
+
+    def select(self, *selectors):
+        all_loaders = self.all()
+        selected = []
+        for selector in selectors:
+            selector.validate(all_loaders)
+            selected.extend(filter(selector.pick, all_loaders))
+        return selected
+
+    def preload(self, name):
+        return self._preload(name, self._get_entry(name))
+
+    def _preload(self, name, entry):
+        return StoredMorphology(name, self._make_loader(name), _meta(name, entry))
+
+    def _make_loader(self, name):
+        def loader():
+            return self.load(name)
+
+        return loader
+
+    def get_meta(self, name):
+        return _meta(name, self._get_entry(name))
+
+    def all(self):
+        with self._engine._read():
+            index = self._read_index()
+        return [self._preload(name, entry) for name, entry in index.items()]
+
+    def has(self, name):
+        with self._engine._read():
+            return name in self._read_index()
+
+    def load(self, name):
+        with self._engine._read():
+            entry = self._get_entry(name)
+            path = self._path(entry["dir"])
+            # Plain array views of the memory maps, so that the branch buffers are
+            # recognized as slices of the shared buffers.
+            points = _npy.load(os.path.join(path, "points.npy"), (0, 3)).view(np.ndarray)
+            radii = _npy.load(os.path.join(path, "radii.npy")).view(np.ndarray)
+            labels = EncodedLabels(
+                len(points),
+                buffer=_npy.load(os.path.join(path, "labels.npy"), dtype=int),
+                labels={int(k): v for k, v in entry["labels"].items()},
+            )
+            props = {
+                k: _npy.load(os.path.join(path, f"property_{i}.npy")).view(np.ndarray)
+                for i, k in enumerate(entry["properties"])
+            }
+            graph = _npy.load(os.path.join(path, "graph.npy"), (0, 2), dtype=int)
+        parents = {-1: None}
+        branch_id = itertools.count()
+        roots = []
+        ptr = 0
+        for nptr, p in graph:
+            branch = Branch(
+                points[ptr:nptr],
+                radii[ptr:nptr],
+                labels[ptr:nptr],
+                {k: v[ptr:nptr] for k, v in props.items()},
+            )
+            parent = parents.get(p, None)
+            parents[next(branch_id)] = branch
+            if parent:
+                parent.attach_child(branch)
+            else:
+                roots.append(branch)
+            ptr = nptr
+        morpho = Morphology(
+            roots, _meta(name, entry), shared_buffers=(points, radii, labels, props)
+        )
+        assert morpho._check_shared(), "Morpho read with unshareable buffers"
+        return morpho
+
+    def save(self, name, morphology, overwrite=False):
+        with self._engine._write():
+            index = self._read_index()
+            if name in index:
+                if overwrite:
+                    self._remove(name, index)
+                else:
+                    root = self._engine.root
+                    raise MorphologyRepositoryError(
+                        f"A morphology called '{name}' already exists in `{root}`."
+                    )
+            # Optimizing a morphology goes through the same steps as what is required
+            # to save it to disk; plus, now the user's object is optimized :)
+            morphology.optimize()
+            shared = morphology._shared
+            dir = _name_to_dir(name)
+            path = self._path(dir)
+            os.makedirs(path, exist_ok=True)
+            _npy.save(os.path.join(path, "points.npy"), shared._points)
+            _npy.save(os.path.join(path, "radii.npy"), shared._radii)
+            _npy.save(os.path.join(path, "labels.npy"), shared._labels.raw)
+            for i, prop in enumerate(shared._prop.values()):
+                _npy.save(os.path.join(path, f"property_{i}.npy"), prop)
+            graph = np.empty((len(morphology.branches), 2), dtype=int)
+            parents = {None: -1}
+            ptr = 0
+            for i, branch in enumerate(morphology.branches):
+                ptr += len(branch)
+                graph[i, 0] = ptr
+                graph[i, 1] = parents[branch.parent]
+                parents[branch] = i
+            _npy.save(os.path.join(path, "graph.npy"), graph)
+            meta = dict(morphology.meta)
+            if len(shared._points):
+                meta["ldc"] = np.min(shared._points, axis=0)
+                meta["mdc"] = np.max(shared._points, axis=0)
+            else:
+                meta["ldc"] = meta["mdc"] = np.full(3, np.nan)
+            index[name] = entry = {
+                "dir": dir,
+                "meta": meta,
+                "labels": {k: list(v) for k, v in shared._labels.labels.items()},
+                "properties": [*shared._prop.keys()],
+            }
+            try:
+                self._write_index(index)
+            except TypeError:
+                shutil.rmtree(path)
+                raise MorphologyRepositoryError(
+                    f"Trying to store invalid metadata on `{name}`."
+                ) from None
+        return StoredMorphology(name, lambda: morphology, _meta(name, entry))
+
+    def remove(self, name):
+        with self._engine._write():
+            index = self._read_index()
+            if name not in index:
+                raise MorphologyRepositoryError(f"'{name}' doesn't exist.")
+            self._remove(name, index)
+            self._write_index(index)
+
+    def _remove(self, name, index):
+        shutil.rmtree(self._path(index.pop(name)["dir"]), ignore_errors=True)
+
+
+def _name_to_dir(name):
+    return base64.urlsafe_b64encode(name.encode("UTF-8")).decode("UTF-8")
+
+
+def _meta(name, entry):
+    meta = entry["meta"].copy()
+    for key in ("ldc", "mdc"):
+        meta[key] = np.array(meta[key], dtype=float)
+    meta["name"] = name
+    return meta
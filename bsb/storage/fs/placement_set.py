@@ -0,0 +1,557 @@
+import contextlib
+import itertools
+import json
+import os
+import shutil
+
+import numpy as np
+
+from ... import config
+from ..._encoding import EncodedLabels
+from ...exceptions import (
+    ChunkError,
+    DatasetExistsError,
+    DatasetNotFoundError,
+    MissingMorphologyError,
+)
+from ...morphologies import MorphologySet, RotationSet
+from ...morphologies.selector import MorphologySelector
+from .._cache import dataset_cache
+from .._chunks import Chunk, ChunkIndex, chunklist
+from ..interfaces import PlacementSet as IPlacementSet
+from . import _npy
+
+# Shape of a single cell's data in each of the per-chunk datasets
+_datasets = {
+    "position": ((3,), float),
+    "rotation": ((3,), float),
+    "morphology": ((), int),
+    "labels": ((), int),
+}
+
+
+@config.node
+class _MapSelector(MorphologySelector):
+    ps = config.attr(type=lambda x: x)
+    names = config.attr(type=lambda x: x)
+
+    def __init__(self, *, ps=None, names=None):
+        self._ps = ps
+        self._names = set(names)
+
+    def validate(self, loaders):
+        missing = set(self._names) - {m.get_meta()["name"] for m in loaders}
+        if missing:
+            raise MissingMorphologyError(
+                "Morphology repository misses the following morphologies required by"
+                + f" {self._ps.tag}: {', '.join(missing)}"
+            )
+
+    def pick(self, stored_morphology):
+        name = stored_morphology.get_meta()["name"]
+        return name in self._names
+
+
+class PlacementSet(IPlacementSet):
+    """
+    Fetches placement data from storage. Each chunk of the placement set is a directory
+    under ``placement/<tag>/`` that contains a raw ``.npy`` file per dataset. The chunk
+    stats, chunk size, labelsets and morphology maps are kept in ``meta.json``. Datasets
+    are loaded as memory maps, so that reading a single chunk copies no data. When the
+    ``dataset_cache`` option is enabled the memory maps are kept in the process-wide
+    :class:`~bsb.storage._cache.DatasetCache`, so that repeated loads of the same chunks
+    reuse them. The loaded datasets are always read-only, whether they are cached, and
+    however many chunks they span.
+
+    .. note::
+
+        Use :meth:`Scaffold.get_placement_set <bsb.core.Scaffold.get_placement_set>` to
+        correctly obtain a PlacementSet.
+    """
+
+    def __init__(self, engine, cell_type):
+        super().__init__(engine, cell_type)
+        self._chunks = []
+        self._labels = None
+        self._morphology_labels = None
+        if not self.exists(engine, cell_type):
+            raise DatasetNotFoundError(f"PlacementSet '{self.tag}' does not exist")
+
+    def __eq__(self, other):
+        return self._engine == getattr(other, "_engine", None) and self.tag == getattr(
+            other, "tag", None
+        )
+
+    @property
+    def _path(self):
+        return _ps_path(self._engine, self.tag)
+
+    @classmethod
+    def create(cls, engine, cell_type):
+        """
+        Create the structure for this placement set in the storage folder. Placement sets
+        are stored under ``placement/<tag>``.
+        """
+        with engine._write():
+            path = _ps_path(engine, cell_type.name)
+            if os.path.exists(_meta_path(path)):
+                raise DatasetExistsError(
+                    f"PlacementSet '{cell_type.name}' already exists."
+                )
+            _create(path)
+        return cls(engine, cell_type)
+
+    @staticmethod
+    def exists(engine, cell_type):
+        with engine._read():
+            return os.path.exists(_meta_path(_ps_path(engine, cell_type.name)))
+
+    @classmethod
+    def require(cls, engine, cell_type):
+        with engine._write():
+            path = _ps_path(engine, cell_type.name)
+            if not os.path.exists(_meta_path(path)):
+                _create(path)
+        return cls(engine, cell_type)
+
+    def remove(self):
+        """
+        Remove the placement set and all of its data.
+        """
+        with self._engine._write():
+            self._clear(self.get_all_chunks())
+            shutil.rmtree(self._path)
+
+    def clear(self, chunks=None):
+        with self._engine._write():
+            self._clear(self.get_loaded_chunks() if chunks is None else chunks)
+
+    def _clear(self, chunks):
+        meta = self._read_meta()
+        removed = {}
+        for chunk in chunklist(chunks):
+            key = str(chunk.id)
+            if key in meta["chunks"]:
+                removed[key] = meta["chunks"].pop(key)
+                meta["morphology_loaders"].pop(key, None)
+                shutil.rmtree(self._chunk_path(chunk), ignore_errors=True)
+        dataset_cache.invalidate(self._engine, self.tag, chunklist(chunks))
+        meta["len"] -= sum(removed.values())
+        self._write_meta(meta)
+        self._engine._track_placed({k: -n for k, n in removed.items()})
+
+    def get_all_chunks(self):
+        meta = self._read_meta()
+        size = meta["chunk_size"]
+        return chunklist(Chunk.from_id(int(c), size) for c in meta["chunks"])
+
+    def get_loaded_chunks(self):
+        if not self._chunks:
+            return self.get_all_chunks()
+        else:
+            return self._chunks.copy()
+
+    @contextlib.contextmanager
+    def chunk_context(self, chunks):
+        old_chunks = self._chunks
+        self._chunks = chunklist(chunks)
+        try:
+            yield
+        finally:
+            self._chunks = old_chunks
+
+    def set_chunk_filter(self, chunks):
+        self._chunks = chunklist(chunks) if chunks is not None else []
+
+    def clear_chunk_filter(self):
+        self._chunks = []
+
+    def include_chunk(self, chunk):
+        """
+        Include a chunk in the data when loading datasets.
+        """
+        self._chunks = chunklist([*self._chunks, chunk])
+
+    def exclude_chunk(self, chunk):
+        """
+        Exclude a chunk from the data when loading datasets.
+        """
+        self._chunks.remove(chunk if isinstance(chunk, Chunk) else Chunk(chunk, None))
+
+    def get_chunk_stats(self):
+        return self._read_meta()["chunks"].copy()
+
+    def get_chunk_index(self):
+        """
+        Return the index of the cell counts and offsets of the chunks. The index is
+        cached on the engine, until the ``meta.json`` of the placement set changes.
+        """
+        stat = os.stat(_meta_path(self._path))
+        token = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._engine._chunk_indices.get(self.tag)
+        if cached is None or cached[0] != token:
+            cached = (token, ChunkIndex(self.get_chunk_stats()))
+            self._engine._chunk_indices[self.tag] = cached
+        return cached[1]
+
+    def load_ids(self):
+        return _load_ids(self.get_chunk_index(), self._chunks)
+
+    def load_positions(self):
+        """
+        Load the cell positions. When the placement set is limited to a single chunk and
+        no labels, the positions are a read-only memory map of the stored data.
+        """
+        with self._engine._read():
+            return self._filter(self._load_dataset("position"))
+
+    def load_rotations(self):
+        """
+        Load the cell rotations.
+
+        :raises: DatasetNotFoundError when there is no rotation information for this
+           cell type.
+        """
+        with self._engine._read():
+            data = self._load_dataset("rotation")
+            if len(data) == 0 and self._unfiltered_len() != 0:
+                raise DatasetNotFoundError("No rotation data available.")
+            return RotationSet(self._filter(data))
+
+    def load_morphologies(self, allow_empty=False):
+        """
+        Load the cell morphologies.
+
+        :raises: DatasetNotFoundError when the morphology data is not found.
+        """
+        with self._engine._read():
+            meta = self._read_meta()
+            chunk_maps = [
+                (chunk, meta["morphology_loaders"][str(chunk.id)])
+                for chunk in self.get_loaded_chunks()
+                if str(chunk.id) in meta["morphology_loaders"]
+            ]
+            if not chunk_maps:
+                if not allow_empty:
+                    raise DatasetNotFoundError("No morphology data available.")
+                return MorphologySet([], np.empty(0, dtype=int))
+            names = list(dict.fromkeys(itertools.chain(*(m for _, m in chunk_maps))))
+            loaders = self._get_morphology_loaders(names)
+            data = np.concatenate(
+                [np.empty(0, dtype=int)]
+                + [
+                    np.array([names.index(n) for n in _map], dtype=int)[
+                        self._load_chunk(chunk, "morphology", dtype=int)
+                    ]
+                    for chunk, _map in chunk_maps
+                ]
+            )
+            return MorphologySet(
+                [loaders[name] for name in names],
+                self._filter(data),
+                labels=self._morphology_labels,
+            )
+
+    def _get_morphology_loaders(self, names):
+        return {
+            m.name: m
+            for m in self._engine.morphologies.select(_MapSelector(ps=self, names=names))
+        }
+
+    def load_additional(self, key=None):
+        with self._engine._read():
+            if key is None:
+                return {
+                    key: self._filter(self._load_dataset(key, "additional"))
+                    for key in self._read_meta()["additional"]
+                }
+            elif key not in self._read_meta()["additional"]:
+                raise DatasetNotFoundError(
+                    f"No additional data '{key}' in the '{self.tag}' placement set."
+                )
+            else:
+                return self._filter(self._load_dataset(key, "additional"))
+
+    def __iter__(self):
+        return itertools.zip_longest(
+            self.load_positions(),
+            self.load_morphologies(),
+        )
+
+    def __len__(self):
+        if self._labels:
+            return int(np.sum(self.get_label_mask(self._labels)))
+        else:
+            return self._unfiltered_len()
+
+    def _unfiltered_len(self):
+        stats = self.get_chunk_stats()
+        return sum(stats.get(str(c.id), 0) for c in self.get_loaded_chunks())
+
+    def append_data(
+        self,
+        chunk,
+        positions=None,
+        morphologies=None,
+        rotations=None,
+        additional=None,
+        count=None,
+    ):
+        """
+        Append data to the placement set.
+
+        :param chunk: The chunk to store data in.
+        :param positions: Cell positions
+        :type positions: :class:`numpy.ndarray`
+        :param rotations: Cell rotations
+        :type rotations: ~bsb.morphologies.RotationSet
+        :param morphologies: Cell morphologies
+        :type morphologies: ~bsb.morphologies.MorphologySet
+        :param count: Amount of entities to place. Excludes the use of any positional,
+          rotational or morphological data.
+        :type count: int
+        """
+        if not isinstance(chunk, Chunk):
+            chunk = Chunk(chunk, None)
+        if count is not None:
+            if not (positions is None and morphologies is None):
+                raise ValueError(
+                    "The `count` keyword is reserved for creating entities,"
+                    + " without any positional, or morphological data."
+                )
+        else:
+            positions = np.array(positions, dtype=float)
+            if positions.ndim < 2:
+                # Broadcast each value over all coordinates, like `[0]` for 1 cell at 0.
+                positions = np.repeat(positions.reshape(-1, 1), 3, axis=1)
+            count = len(positions)
+        with self._engine._write():
+            meta = self._require_chunk(chunk)
+            if count:
+                if positions is not None:
+                    self._append_dataset(chunk, "position", positions)
+                if morphologies is not None:
+                    self._append_morphologies(meta, chunk, morphologies)
+                    if rotations is None:
+                        rotations = np.zeros((len(morphologies), 3))
+                if rotations is not None:
+                    self._append_dataset(chunk, "rotation", np.asarray(rotations))
+                for key, ds in (additional or {}).items():
+                    self._append_additional(meta, key, chunk, ds)
+            self._track_add(meta, chunk, count)
+            dataset_cache.invalidate(self._engine, self.tag, [chunk])
+
+    def append_entities(self, chunk, count, additional=None):
+        self.append_data(chunk, count=count, additional=additional)
+
+    def append_additional(self, name, chunk, data):
+        if not isinstance(chunk, Chunk):
+            chunk = Chunk(chunk, None)
+        with self._engine._write():
+            meta = self._require_chunk(chunk)
+            self._append_additional(meta, name, chunk, data)
+            self._write_meta(meta)
+            dataset_cache.invalidate(self._engine, self.tag, [chunk])
+
+    def _append_additional(self, meta, name, chunk, data):
+        if name not in meta["additional"]:
+            meta["additional"].append(name)
+        os.makedirs(self._chunk_path(chunk, "additional"), exist_ok=True)
+        _npy.append(self._dataset_path(chunk, name, "additional"), data)
+
+    def _append_morphologies(self, meta, chunk, morphologies):
+        # Each chunk maps its morphology indices to the names of its own loaders, so
+        # new morphologies are appended to the map instead of remapping the chunk.
+        _map = meta["morphology_loaders"].setdefault(str(chunk.id), [])
+        for name in morphologies._serialize_loaders():
+            if name not in _map:
+                _map.append(name)
+        lookup = np.array(
+            [_map.index(name) for name in morphologies._serialize_loaders()], dtype=int
+        )
+        indices = lookup[morphologies.get_indices(copy=False)]
+        self._append_dataset(chunk, "morphology", indices)
+
+    def label(self, labels, cells):
+        cells = np.array(cells, copy=False, dtype=int)
+        with self._engine._write():
+            stats = self.get_chunk_stats()
+            len_ = sum(stats.values())
+            oob = cells[(cells < 0) | (cells >= len_)]
+            if len(oob):
+                raise LabellingException(
+                    f"Cell labels {oob} out of range for placement set with size {len_}."
+                )
+            meta = self._read_meta()
+            # Keep 1 shared labelset lookup for all chunks, and store it after labelling.
+            labelsets = EncodedLabels(0, labels=meta["labelsets"]).labels
+            ctr = 0
+            for chunk in self.get_all_chunks():
+                len_ = stats[str(chunk.id)]
+                block = cells[(cells >= ctr) & (cells < ctr + len_)] - ctr
+                ctr += len_
+                if not len(block):
+                    continue
+                enc_labels = self._read_labels(chunk, len_, labelsets)
+                enc_labels.labels = labelsets
+                enc_labels.label(labels, block)
+                _npy.save(self._dataset_path(chunk, "labels"), enc_labels.raw)
+                dataset_cache.invalidate(self._engine, self.tag, [chunk])
+            meta["labelsets"] = labelsets
+            self._write_meta(meta)
+
+    def set_label_filter(self, labels):
+        self._labels = labels
+
+    def set_morphology_label_filter(self, morphology_labels):
+        """
+        Sets the labels by which any morphology loaded from this set will be filtered.
+
+        :param morphology_labels: List of labels to filter the morphologies by.
+        :type morphology_labels: List[str]
+        """
+        self._morphology_labels = morphology_labels
+
+    def get_labelled(self, labels):
+        mask = self.get_label_mask(labels)
+        return np.nonzero(mask)[0]
+
+    def get_label_mask(self, labels):
+        with self._engine._read():
+            stats = self.get_chunk_stats()
+            labelsets = self._read_meta()["labelsets"]
+            return EncodedLabels.concatenate(
+                *(
+                    self._read_labels(chunk, stats[str(chunk.id)], labelsets)
+                    for chunk in self.get_loaded_chunks()
+                    if str(chunk.id) in stats
+                )
+            ).get_mask(labels)
+
+    def _read_labels(self, chunk, len_, labelsets):
+        data = np.zeros(len_, dtype=int)
+        stored = self._load_chunk(chunk, "labels", dtype=int)
+        data[: len(stored)] = stored
+        return EncodedLabels(len_, buffer=data, labels=labelsets)
+
+    def _filter(self, data):
+        if self._labels:
+            return _readonly(data[self.get_label_mask(self._labels)])
+        return data
+
+    def _load_dataset(self, name, collection=None):
+        shape, dtype = _datasets.get(name, ((), float))
+        chunked_data = [
+            data
+            for chunk in self.get_loaded_chunks()
+            if len(data := self._load_chunk(chunk, name, collection))
+        ]
+        if not chunked_data:
+            return _readonly(np.empty((0, *shape), dtype=dtype))
+        elif len(chunked_data) == 1:
+            return _readonly(chunked_data[0])
+        else:
+            return _readonly(np.concatenate(chunked_data))
+
+    def _load_chunk(self, chunk, name, collection=None, dtype=float):
+        path = self._dataset_path(chunk, name, collection)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=dtype)
+        return dataset_cache.get(
+            self._engine,
+            self.tag,
+            chunk,
+            name if collection is None else f"{collection}/{name}",
+            (stat.st_ino, stat.st_mtime_ns, stat.st_size),
+            lambda: _npy.load(path, dtype=dtype),
+        )
+
+    def _append_dataset(self, chunk, name, data):
+        shape, dtype = _datasets[name]
+        data = np.asarray(data, dtype=dtype).reshape(-1, *shape)
+        _npy.append(self._dataset_path(chunk, name), data)
+
+    def _require_chunk(self, chunk):
+        meta = self._read_meta()
+        fsize = np.array(meta["chunk_size"], dtype=float)
+        size = chunk.dimensions
+        if np.all(np.isnan(fsize)):
+            if not np.all(np.isnan(size)):
+                meta["chunk_size"] = size.tolist()
+        elif not np.all(np.isnan(size)) and not np.allclose(fsize, size):
+            raise ChunkError(f"Chunk size mismatch. Stored: {fsize}. Given: {size}")
+        meta["chunks"].setdefault(str(chunk.id), 0)
+        os.makedirs(self._chunk_path(chunk), exist_ok=True)
+        return meta
+
+    def _track_add(self, meta, chunk, count):
+        meta["chunks"][str(chunk.id)] += count
+        meta["len"] += count
+        self._write_meta(meta)
+        self._engine._track_placed({str(chunk.id): count})
+
+    def _chunk_path(self, chunk, collection=None):
+        path = os.path.join(self._path, str(chunk.id))
+        if collection is not None:
+            path = os.path.join(path, collection)
+        return path
+
+    def _dataset_path(self, chunk, name, collection=None):
+        return os.path.join(self._chunk_path(chunk, collection), f"{name}.npy")
+
+    def _read_meta(self):
+        with open(_meta_path(self._path), "r") as f:
+            return json.load(f)
+
+    def _write_meta(self, meta):
+        _npy.save_json(_meta_path(self._path), meta)
+
+
+def _load_ids(index, chunks):
+    # Return the ids of the cells in the given chunks, or all cells if no chunks given.
+    if not chunks:
+        return np.arange(len(index))
+    mask = np.isin(index.ids, [c.id for c in chunks])
+    return np.concatenate(
+        [np.empty(0, dtype=int)]
+        + [
+            np.arange(offset, offset + count)
+            for offset, count in zip(index.offsets[mask], index.counts[mask])
+        ]
+    )
+
+
+def _ps_path(engine, tag):
+    return os.path.join(engine.root, "placement", tag)
+
+
+def _meta_path(path):
+    return os.path.join(path, "meta.json")
+
+
+def _create(path):
+    os.makedirs(path, exist_ok=True)
+    _npy.save_json(
+        _meta_path(path),
+        {
+            "len": 0,
+            "chunks": {},
+            "chunk_size": None,
+            "labelsets": EncodedLabels.none(0).labels,
+            "morphology_loaders": {},
+            "additional": [],
+        },
+    )
+
+
+def _readonly(data):
+    # A view, so that the flag doesn't change arrays shared with the cache or the caller.
+    data = data.view()
+    data.flags.writeable = False
+    return data
+
+
+class LabellingException(Exception):
+    pass
@@ -1,10 +1,17 @@
 import abc
+import contextlib
+import io
+import queue
+import tempfile
+import threading
 import typing
 from pathlib import Path
 import functools
 import numpy as np
+import scipy.sparse
+from scipy.spatial.transform import Rotation
 
-from ._chunks import Chunk
+from ._chunks import Chunk, ChunkIndex, chunklist
 from .. import config, plugins
 from ..morphologies import Morphology
 from ..trees import BoxTree
@@ -313,6 +320,57 @@ class FileStore(Interface, engine_key="files"):
         """
         pass
 
+    def open_read(self, id):
+        """
+        Open a binary stream to read the content of a file. Engines should override this
+        method if they can stream the content, by default it is loaded into memory.
+
+        :param id: id of the file to read.
+        :type id: str
+        :returns: A readable binary file object.
+        :rtype: BinaryIO
+        :raises FileNotFoundError: The given id doesn't exist in the file store.
+        """
+        content, _ = self.load(id)
+        encoding = self.get_encoding(id)
+        return io.BytesIO(content.encode(encoding) if encoding else content)
+
+    @contextlib.contextmanager
+    def open_write(self, id, meta=None, encoding=None, overwrite=False):
+        """
+        Open a binary stream to write the content of a file. The file is stored when the
+        context exits without errors. Engines should override this method if they can
+        stream the content, by default it is buffered in a temporary file.
+
+        .. code-block:: python
+
+          with store.open_write("atlas", meta={"source": "atlas.nrrd"}) as f:
+              shutil.copyfileobj(source, f)
+
+        :param id: id to store the content under.
+        :type id: str
+        :param meta: Metadata for the content
+        :type meta: dict
+        :param encoding: Encoding of the content, if it is text.
+        :type encoding: str
+        :param overwrite: Overwrite existing file
+        :type overwrite: bool
+        :raises FileExistsError: The id exists and ``overwrite`` is not set.
+        """
+        if not overwrite and self.has(id):
+            raise FileExistsError(f"Store already contains a file with id {id}")
+        with tempfile.SpooledTemporaryFile() as f:
+            yield f
+            f.seek(0)
+            self.store(f.read(), id=id, meta=meta, encoding=encoding, overwrite=True)
+
+    def get_local_path(self, id):
+        """
+        Return the path of the stored file on the local filesystem, or ``None`` if the
+        engine doesn't store files as local files.
+        """
+        return None
+
     def get(self, id) -> "StoredFile":
         """
         Return a StoredFile wrapper
@@ -352,10 +410,15 @@ class StoredFile:
     def load(self):
         return self.store.load(self.id)
 
+    def open(self):
+        return self.store.open_read(self.id)
+
 
 class PlacementSet(Interface):
     """
-    Interface for the storage of placement data of a cell type.
+    Interface for the storage of placement data of a cell type. The arrays returned by
+    the ``load_*`` methods may be read-only views of the stored data, copy them before
+    changing them.
     """
 
     @abc.abstractmethod
@@ -471,12 +534,22 @@ class PlacementSet(Interface):
     def load_ids(self):
         pass
 
+    def get_chunk_index(self):
+        """
+        Return the index of the cell counts and offsets of all the chunks in the
+        placement set. Engines should cache the index, and keep it up to date as data is
+        appended and cleared.
+
+        :rtype: ~bsb.storage._chunks.ChunkIndex
+        """
+        return ChunkIndex(self.get_chunk_stats())
+
     @abc.abstractmethod
     def load_positions(self):
         """
         Return a dataset of cell positions.
 
-        :returns: An (Nx3) dataset of positions.
+        :returns: An (Nx3) dataset of positions, which may be read-only.
         :rtype: numpy.ndarray
         """
         pass
@@ -641,6 +714,123 @@ class PlacementSet(Interface):
         """
         pass
 
+    def query_box(self, ldc, mdc):
+        """
+        Find the cells positioned inside of a box, boundaries included. Only the chunks
+        that overlap with the box are loaded.
+
+        :param ldc: Least dominant corner of the box.
+        :type ldc: numpy.ndarray
+        :param mdc: Most dominant corner of the box.
+        :type mdc: numpy.ndarray
+        :returns: The ids and the positions of the cells in the box.
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+        """
+        ldc = np.asarray(ldc, dtype=float)
+        mdc = np.asarray(mdc, dtype=float)
+        chunks, cldc, cmdc = self._get_chunk_boxes()
+        overlap = np.all((cldc <= mdc) & (cmdc >= ldc), axis=1)
+        ids, positions = self._load_cells(chunks, overlap)
+        inside = np.all((positions >= ldc) & (positions <= mdc), axis=1)
+        return ids[inside], positions[inside]
+
+    def query_sphere(self, center, radius):
+        """
+        Find the cells positioned inside of a sphere, boundary included. Only the chunks
+        that overlap with the sphere are loaded.
+
+        :param center: Center of the sphere.
+        :type center: numpy.ndarray
+        :param radius: Radius of the sphere.
+        :type radius: float
+        :returns: The ids and the positions of the cells in the sphere.
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+        """
+        center = np.asarray(center, dtype=float)
+        chunks, cldc, cmdc = self._get_chunk_boxes()
+        overlap = _box_distance(center, cldc, cmdc) <= radius
+        ids, positions = self._load_cells(chunks, overlap)
+        inside = np.sum((positions - center) ** 2, axis=1) <= radius**2
+        return ids[inside], positions[inside]
+
+    def nearest(self, points, k=1):
+        """
+        Find the ``k`` nearest cells to each of the given points. The chunks are visited
+        from near to far, until no chunk can hold a nearer cell than the ``k`` nearest
+        found so far.
+
+        :param points: An (Mx3) array of points.
+        :type points: numpy.ndarray
+        :param k: Amount of cells to find per point. If the set has less cells, all the
+          cells are returned.
+        :type k: int
+        :returns: An (Mxk) array of the ids and an (Mxkx3) array of the positions of the
+          nearest cells to each point, sorted from near to far.
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        chunks, cldc, cmdc = self._get_chunk_boxes()
+        k = min(k, len(self))
+        ids = np.empty((len(points), k), dtype=int)
+        positions = np.empty((len(points), k, 3))
+        if not k:
+            return ids, positions
+        loaded = {}
+        for i, point in enumerate(points):
+            dist = _box_distance(point, cldc, cmdc)
+            best_ids, best_pos = np.empty(0, dtype=int), np.empty((0, 3))
+            best_dist = np.empty(0)
+            for c in np.argsort(dist, kind="stable"):
+                if len(best_dist) == k and dist[c] > best_dist[-1]:
+                    break
+                if c not in loaded:
+                    loaded[c] = self._load_cells([chunks[c]])
+                cids, cpos = loaded[c]
+                best_ids = np.concatenate((best_ids, cids))
+                best_pos = np.concatenate((best_pos, cpos))
+                best_dist = np.concatenate(
+                    (best_dist, np.linalg.norm(cpos - point, axis=1))
+                )
+                order = np.argsort(best_dist, kind="stable")[:k]
+                best_ids, best_pos = best_ids[order], best_pos[order]
+                best_dist = best_dist[order]
+            ids[i], positions[i] = best_ids, best_pos
+        return ids, positions
+
+    def _get_chunk_boxes(self):
+        # Return the loaded chunks and their boxes. Chunks of unknown size span all of
+        # space, so that they are never pruned.
+        chunks = self.get_loaded_chunks()
+        ldc = np.array([c.ldc for c in chunks]).reshape(-1, 3)
+        mdc = np.array([c.mdc for c in chunks]).reshape(-1, 3)
+        unknown = np.any(np.isnan(ldc) | np.isnan(mdc), axis=1)
+        ldc[unknown] = -np.inf
+        mdc[unknown] = np.inf
+        return chunks, ldc, mdc
+
+    def _load_cells(self, chunks, mask=None):
+        # Load the ids and the positions of the cells in the (masked) chunks.
+        if mask is not None:
+            chunks = [chunk for chunk, keep in zip(chunks, mask) if keep]
+        chunks = chunklist(chunks)
+        if not chunks:
+            return np.empty(0, dtype=int), np.empty((0, 3))
+        # Engines may number the ids of a chunk context from 0, so take the ids of each
+        # chunk from the index of the whole set.
+        index = self.get_chunk_index()
+        ids = np.concatenate(
+            [np.empty(0, dtype=int)]
+            + [
+                index.offset(chunk) + np.arange(count)
+                for chunk in chunks
+                if (count := index.count(chunk))
+            ]
+        )
+        with self.chunk_context(chunks):
+            if self._labels:
+                ids = ids[self.get_label_mask(self._labels)]
+            return ids, np.asarray(self.load_positions(), dtype=float)
+
     def load_boxes(self, morpho_cache=None):
         """
         Load the cells as axis aligned bounding box rhomboids matching the extension,
@@ -652,30 +842,31 @@ class PlacementSet(Interface):
           afterwards you need the morphology set, you best call :meth:`.load_morphologies`
           first and reuse it here.
         :type morpho_cache: ~bsb.morphologies.MorphologySet
-        :returns: An iterator with 6 coordinates per cell: 3 min and 3 max coords, the
+        :returns: An (Nx6) array with 6 coordinates per cell: 3 min and 3 max coords, the
           bounding box of that cell's translated and rotated morphology.
-        :rtype: Iterator[Tuple[float, float, float, float, float, float]]
+        :rtype: numpy.ndarray
         :raises: DatasetNotFoundError if no morphologies are found.
         """
         if morpho_cache is None:
             mset = self.load_morphologies()
         else:
             mset = morpho_cache
-        expansion = [*zip([0] * 4 + [1] * 4, ([0] * 2 + [1] * 2) * 2, [0, 1] * 4)]
-
-        def _box_of(m, o, r):
-            oo = (m["ldc"], m["mdc"])
-            # Make the 8 corners of the box
-            corners = np.array([[oo[x][0], oo[y][1], oo[z][2]] for x, y, z in expansion])
-            # Rotate them
-            rotbox = r.apply(corners)
-            # Find outer box, by rotating and translating the starting box
-            return np.concatenate(
-                (np.min(rotbox, axis=0) + o, np.max(rotbox, axis=0) + o)
-            )
-
-        iters = (mset.iter_meta(), self.load_positions(), self.load_rotations())
-        return map(_box_of, *iters)
+        metas = list(mset.iter_meta(unique=True))
+        indices = mset.get_indices(copy=False)
+        ldc = np.array([m["ldc"] for m in metas], dtype=float).reshape(-1, 3)[indices]
+        mdc = np.array([m["mdc"] for m in metas], dtype=float).reshape(-1, 3)[indices]
+        # Make the 8 corners of each box, and rotate them all at once.
+        corners = np.where(_box_corners, mdc[:, np.newaxis], ldc[:, np.newaxis])
+        angles = np.asarray(self.load_rotations(), dtype=float).reshape(-1, 3)
+        if len(angles):
+            matrices = Rotation.from_euler("xyz", angles).as_matrix()
+            corners = np.einsum("nij,nkj->nki", matrices, corners)
+        # Find outer box, by rotating and translating the starting box
+        positions = np.asarray(self.load_positions(), dtype=float).reshape(-1, 1, 3)
+        return np.concatenate(
+            (np.min(corners + positions, axis=1), np.max(corners + positions, axis=1)),
+            axis=1,
+        )
 
     def load_box_tree(self, morpho_cache=None):
         """
@@ -686,7 +877,7 @@ class PlacementSet(Interface):
         :returns: A boxtree
         :rtype: bsb.trees.BoxTree
         """
-        return BoxTree(list(self.load_boxes(morpho_cache=morpho_cache)))
+        return BoxTree(self.load_boxes(morpho_cache=morpho_cache))
 
     def _requires_morpho_mapping(self):
         return self._morphology_labels is not None and self.count_morphologies()
@@ -712,6 +903,17 @@ class PlacementSet(Interface):
         return locs
 
 
+# Whether each coordinate of the 8 corners of a box is taken from its mdc, or its ldc.
+_box_corners = np.array(
+    [[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=bool
+)
+
+
+def _box_distance(point, ldc, mdc):
+    # Distance from a point to the nearest point of each box.
+    return np.linalg.norm(point - np.clip(point, ldc, mdc), axis=1)
+
+
 class MorphologyRepository(Interface, engine_key="morphologies"):
     @abc.abstractmethod
     def all(self):
@@ -1031,6 +1233,196 @@ class ConnectivitySet(Interface):
         """
         return ConnectivityIterator(self, "out")
 
+    def as_sparse(self, format="csr", granularity="cell"):
+        """
+        Return the connections as a sparse matrix from the presynaptic to the
+        postsynaptic cells, with the amount of connections between each pair as values.
+        The blocks of each presynaptic chunk are written straight into the preallocated
+        CSR arrays, using the chunk statistics to find the rows of each chunk.
+
+        :param format: Any of the :mod:`scipy.sparse` formats, such as ``csr``, ``csc``
+          or ``coo``.
+        :type format: str
+        :param granularity: ``cell`` to have a row or column per cell, ``branch`` to have
+          a row or column per branch of each cell's morphology, in the order of the cells.
+          Cells without morphology have 1 row or column.
+        :type granularity: str
+        :rtype: scipy.sparse.spmatrix
+        """
+        pre = _SparseAxis(self.pre_type, granularity)
+        post = _SparseAxis(self.post_type, granularity)
+        nnz = sum(stats["out"] for stats in self.get_chunk_stats().values())
+        indptr = np.zeros(len(pre) + 1, dtype=np.int64)
+        indices = np.empty(nnz, dtype=np.int64)
+        ptr = 0
+        for lchunk in sorted(self.get_local_chunks("out")):
+            llocs, gchunks, glocs = self.load_local_connections("out", lchunk)
+            start, stop = pre.chunk_range(lchunk)
+            rows = pre.rows(llocs, pre.index.offset(lchunk)) - start
+            cols = post.rows(glocs, post.index.offsets_of(gchunks))
+            # Connections are sorted by row within the rows of the chunk, and the rows of
+            # the chunks follow each other in the order of the local chunks.
+            indices[ptr : ptr + len(cols)] = cols[np.argsort(rows, kind="stable")]
+            indptr[start + 1 : stop + 1] = np.bincount(rows, minlength=stop - start)
+            ptr += len(cols)
+        np.cumsum(indptr, out=indptr)
+        matrix = scipy.sparse.csr_matrix(
+            (np.ones(nnz, dtype=np.int64), indices, indptr), shape=(len(pre), len(post))
+        )
+        # Multapses are summed into the amount of connections.
+        matrix.sum_duplicates()
+        return matrix.asformat(format)
+
+    def as_sparse_blocks(self, format="csr", granularity="cell"):
+        """
+        Iterate over the blocks of connections between each pair of presynaptic and
+        postsynaptic chunk as sparse matrices. The rows and columns are numbered from the
+        first cell of the presynaptic and postsynaptic chunk. See :meth:`as_sparse`.
+
+        :returns: Yields the presynaptic chunk, the postsynaptic chunk and the matrix.
+        :rtype: Iterator[Tuple[~bsb.storage.Chunk, ~bsb.storage.Chunk,
+          scipy.sparse.spmatrix]]
+        """
+        pre = _SparseAxis(self.pre_type, granularity)
+        post = _SparseAxis(self.post_type, granularity)
+        for _, lchunk, gchunk, (llocs, glocs) in self.flat_iter_connections("out"):
+            start, stop = pre.chunk_range(lchunk)
+            gstart, gstop = post.chunk_range(gchunk)
+            rows = pre.rows(llocs, pre.index.offset(lchunk)) - start
+            cols = post.rows(glocs, post.index.offset(gchunk)) - gstart
+            matrix = scipy.sparse.coo_matrix(
+                (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+                shape=(stop - start, gstop - gstart),
+            )
+            yield lchunk, gchunk, matrix.asformat(format)
+
+    def stats(self):
+        """
+        Compute the degrees, chunk counts and multapses of the connections. The blocks of
+        connections are processed one at a time, so that the connections are never all
+        loaded at once. Engines may cache the statistics until the set changes.
+
+        :rtype: ~bsb.storage.interfaces.ConnectivityStats
+        """
+        return ConnectivityStats(self)
+
+
+class ConnectivityStats:
+    """
+    Statistics of the connections of a connectivity set, summed over the outgoing blocks
+    of the set.
+
+    :param cs: The connectivity set to compute the statistics of.
+    :type cs: ~bsb.storage.interfaces.ConnectivitySet
+    """
+
+    def __init__(self, cs):
+        pre = cs.pre_type.get_placement_set().get_chunk_index()
+        post = cs.post_type.get_placement_set().get_chunk_index()
+        self._indices = (pre, post)
+        self.out_degree = np.zeros(len(pre), dtype=np.int64)
+        """
+        Amount of outgoing connections of each presynaptic cell.
+        """
+        self.in_degree = np.zeros(len(post), dtype=np.int64)
+        """
+        Amount of incoming connections of each postsynaptic cell.
+        """
+        self.chunk_counts = {}
+        """
+        Amount of incoming and outgoing connections per chunk id.
+        """
+        self.multapses = np.zeros(1, dtype=np.int64)
+        """
+        Amount of pairs of cells that are connected by each amount of connections.
+        """
+        for _, lchunk, gchunk, (llocs, glocs) in cs.flat_iter_connections("out"):
+            start, count = pre.offset(lchunk), pre.count(lchunk)
+            gstart, gcount = post.offset(gchunk), post.count(gchunk)
+            self.out_degree[start : start + count] += np.bincount(
+                llocs[:, 0], minlength=count
+            )
+            self.in_degree[gstart : gstart + gcount] += np.bincount(
+                glocs[:, 0], minlength=gcount
+            )
+            for direction, chunk in (("out", lchunk), ("inc", gchunk)):
+                counts = self.chunk_counts.setdefault(str(chunk.id), {"inc": 0, "out": 0})
+                counts[direction] += len(llocs)
+            # All connections between a pair of cells are in the same block.
+            _, pairs = np.unique(llocs[:, 0] * gcount + glocs[:, 0], return_counts=True)
+            multapses = np.bincount(pairs)
+            if len(multapses) > len(self.multapses):
+                self.multapses.resize(len(multapses))
+            self.multapses[: len(multapses)] += multapses
+
+    def __len__(self):
+        """
+        Amount of connections.
+        """
+        return int(np.sum(self.out_degree))
+
+    @property
+    def pairs(self):
+        """
+        Amount of connected pairs of cells.
+        """
+        return int(np.sum(self.multapses))
+
+    @property
+    def out_degree_histogram(self):
+        """
+        Amount of presynaptic cells with each amount of outgoing connections.
+        """
+        return np.bincount(self.out_degree)
+
+    @property
+    def in_degree_histogram(self):
+        """
+        Amount of postsynaptic cells with each amount of incoming connections.
+        """
+        return np.bincount(self.in_degree)
+
+
+class _SparseAxis:
+    # Maps the cell or branch locations of a cell type to the rows of a sparse matrix.
+    def __init__(self, cell_type, granularity):
+        ps = cell_type.get_placement_set()
+        self.index = ps.get_chunk_index()
+        if granularity == "cell":
+            self._cell_rows = None
+        elif granularity == "branch":
+            ms = ps.load_morphologies(allow_empty=True)
+            counts = np.ones(len(self.index), dtype=np.int64)
+            if len(ms):
+                if len(ms) != len(self.index):
+                    raise ValueError(
+                        f"Not all '{cell_type.name}' cells have a morphology."
+                    )
+                branches = [len(m.branches) for m in ms.iter_morphologies(unique=True)]
+                counts = np.maximum(np.array(branches)[ms.get_indices(copy=False)], 1)
+            self._cell_rows = np.concatenate(([0], np.cumsum(counts)))
+        else:
+            raise ValueError(f"Unknown granularity '{granularity}'.")
+
+    def __len__(self):
+        if self._cell_rows is None:
+            return len(self.index)
+        return int(self._cell_rows[-1])
+
+    def rows(self, locs, offsets):
+        cells = locs[:, 0] + offsets
+        if self._cell_rows is None:
+            return cells
+        # Connections without branch information are on the first branch.
+        return self._cell_rows[cells] + np.maximum(locs[:, 1], 0)
+
+    def chunk_range(self, chunk):
+        start = self.index.offset(chunk)
+        stop = start + self.index.count(chunk)
+        if self._cell_rows is None:
+            return start, stop
+        return int(self._cell_rows[start]), int(self._cell_rows[stop])
+
 
 class ConnectivityIterator:
     def __init__(
@@ -1041,19 +1433,29 @@ class ConnectivityIterator:
         self._lchunks = lchunks
         self._scoped = scoped
         self._gchunks = gchunks
+        self._prefetch = 0
 
     def __copy__(self):
         lchunks = self._lchunks.copy() if self._lchunks is not None else None
         gchunks = self._gchunks.copy() if self._gchunks is not None else None
-        return ConnectivityIterator(self._cs, self._dir, lchunks, gchunks)
+        copy = ConnectivityIterator(self._cs, self._dir, lchunks, gchunks, self._scoped)
+        copy._prefetch = self._prefetch
+        return copy
 
     def __iter__(self):
-        yield from (
-            self._offset_block(*data)
+        # Load the offsets up front, so that they aren't loaded on the prefetch thread.
+        loff = self._local_chunk_offsets()
+        goff = self._global_chunk_offsets()
+        blocks = (
+            self._offset_block(loff, goff, *data)
             for data in self._cs.flat_iter_connections(
                 self._dir, self._lchunks, self._gchunks
             )
         )
+        if self._prefetch > 0:
+            yield from _prefetch(blocks, self._prefetch)
+        else:
+            yield from blocks
 
     def chunk_iter(self):
         yield from (
@@ -1065,6 +1467,17 @@ class ConnectivityIterator:
             )
         )
 
+    @immutable()
+    def prefetch(self, n):
+        """
+        Load the next ``n`` blocks of connections on a background thread during the
+        iteration, so that the storage is read while the previous blocks are processed.
+
+        :param n: Amount of blocks to load ahead. 0 loads the blocks as they are needed.
+        :type n: int
+        """
+        self._prefetch = int(n)
+
     @immutable()
     def as_globals(self):
         self._scoped = False
@@ -1118,12 +1531,10 @@ class ConnectivityIterator:
             ptr += len_
         return pre_locs, post_locs
 
-    def _offset_block(self, direction: str, lchunk, gchunk, data):
-        loff = self._local_chunk_offsets()
-        goff = self._global_chunk_offsets()
+    def _offset_block(self, loff, goff, direction: str, lchunk, gchunk, data):
         llocs, glocs = data
-        llocs[:, 0] += loff[lchunk]
-        glocs[:, 0] += goff[gchunk]
+        llocs[:, 0] += loff.offset(lchunk)
+        glocs[:, 0] += goff.offset(gchunk)
         if direction == "out":
             return llocs, glocs
         else:
@@ -1140,17 +1551,50 @@ class ConnectivityIterator:
         return self._chunk_offsets(source, self._gchunks)
 
     def _chunk_offsets(self, source, chunks):
-        stats = source.get_placement_set().get_chunk_stats()
+        index = source.get_placement_set().get_chunk_index()
         if self._scoped and chunks is not None:
-            stats = {chunk: item for chunk, item in stats.items() if int(chunk) in chunks}
-        offsets = {}
-        ctr = 0
-        for chunk, len_ in sorted(
-            stats.items(), key=lambda k: Chunk.from_id(int(k[0]), None).id
-        ):
-            offsets[Chunk.from_id(int(chunk), None)] = ctr
-            ctr += len_
-        return offsets
+            index = index.scoped(chunks)
+        return index
+
+
+def _prefetch(iterable, n):
+    # Produce the items of the iterable on a background thread, into a queue of `n` items.
+    items = queue.Queue(maxsize=n)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        # Stop the producer when the consumer stops early.
+        stop.set()
+        thread.join()
 
 
 class StoredMorphology:
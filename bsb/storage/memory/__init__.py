@@ -0,0 +1,203 @@
+"""
+The ``memory`` storage engine keeps all of the data of a network in NumPy arrays in the
+memory of the current process. It is meant for networks that are thrown away after use,
+such as the many small networks of a parameter scan, where writing to disk would take up
+most of the runtime. Use :meth:`Storage.copy <bsb.storage.Storage.copy>` with the
+``engine`` argument to persist a network to a disk engine::
+
+  network.storage.copy("keep_this_network", engine="fs")
+
+.. warning::
+
+  The data is only available to the process that created it. The engine can't be used
+  with MPI, or with the ``processes`` job pool backend.
+
+"""
+
+from datetime import datetime
+
+import shortuuid
+
+from ... import config
+from ...exceptions import StorageError
+from ...services import MPILock
+from ..interfaces import Engine, NoopLock, StorageNode as IStorageNode
+from .connectivity_set import ConnectivitySet
+from .file_store import FileStore
+from .morphology_repository import MorphologyRepository
+from .placement_set import PlacementSet
+
+# The data of all the memory storages of this process, by root.
+_roots = {}
+
+
+def _new_root():
+    return {
+        "files": {},
+        "morphologies": {},
+        "placement": {},
+        "connectivity": {},
+        "chunks": {},
+    }
+
+
+class MemoryEngine(Engine):
+    # The data can't be shared with forked worker processes.
+    _process_local = True
+
+    def __init__(self, root, comm):
+        super().__init__(root, comm)
+        if comm.get_size() > 1:
+            raise StorageError("The memory storage engine can't be used with MPI.")
+        self._lock = MPILock.sync()
+        self._readonly = False
+
+    @property
+    def root_slug(self):
+        return str(self._root)
+
+    @property
+    def _data(self):
+        try:
+            return _roots[self._root]
+        except KeyError:
+            raise StorageError(f"Memory storage '{self._root}' does not exist.") from None
+
+    @classmethod
+    def peek_exists(cls, root):
+        try:
+            return root in _roots
+        except TypeError:
+            return False
+
+    @classmethod
+    def recognizes(cls, root):
+        return cls.peek_exists(root)
+
+    def _read(self):
+        if self._readonly:
+            return NoopLock()
+        else:
+            return self._lock.read()
+
+    def _write(self):
+        if self._readonly:
+            raise IOError("Can't perform write operations in readonly mode.")
+        else:
+            return self._lock.write()
+
+    def _master_write(self):
+        if self._readonly:
+            raise IOError("Can't perform write operations in readonly mode.")
+        else:
+            return self._lock.single_write()
+
+    def exists(self):
+        return self._root in _roots
+
+    def create(self):
+        _roots.setdefault(self._root, _new_root())
+
+    def move(self, new_root):
+        if new_root in _roots:
+            raise FileExistsError(f"Memory storage '{new_root}' already exists.")
+        _roots[new_root] = _roots.pop(self._root)
+        self._root = new_root
+
+    def copy(self, new_root, engine=None):
+        """
+        Copy the network to a new storage.
+
+        :param new_root: Root of the new storage.
+        :param engine: Name of the storage engine of the new storage, such as ``"fs"``
+          to persist the network to disk. Defaults to another memory storage.
+        :type engine: str
+        """
+        from .. import Storage
+
+        storage = Storage(engine or self._format, new_root)
+        if storage.preexisted:
+            raise FileExistsError(f"Storage '{new_root}' already exists.")
+        _transfer(self, storage)
+        return storage
+
+    def remove(self):
+        _roots.pop(self._root, None)
+
+    def require_placement_set(self, ct):
+        return PlacementSet.require(self, ct)
+
+    def clear_placement(self):
+        with self._master_write() as fence:
+            fence.guard()
+            self._data["placement"].clear()
+            for chunk_stats in self._data["chunks"].values():
+                chunk_stats["placed"] = 0
+
+    def clear_connectivity(self):
+        with self._master_write() as fence:
+            fence.guard()
+            self._data["connectivity"].clear()
+
+    def get_chunk_stats(self):
+        with self._read():
+            stats = {
+                chunk_id: {
+                    "placed": chunk_stats["placed"],
+                    "connections": chunk_stats["connections"].copy(),
+                }
+                for chunk_id, chunk_stats in self._data["chunks"].items()
+            }
+        for tag in ConnectivitySet.get_tags(self):
+            cs_stats = ConnectivitySet(self, tag).get_chunk_stats()
+            for chunk_id, counts in cs_stats.items():
+                chunk_stats = stats.setdefault(
+                    chunk_id, {"placed": 0, "connections": {"inc": 0, "out": 0}}
+                )
+                for direction, count in counts.items():
+                    chunk_stats["connections"][direction] += count
+        return stats
+
+    def _track_placed(self, counts):
+        # Track the amount of cells added to (or removed from) each chunk in the global
+        # chunk stats. Should be called while holding the write lock.
+        stats = self._data["chunks"]
+        for chunk_id, count in counts.items():
+            chunk_stats = stats.setdefault(
+                chunk_id, {"placed": 0, "connections": {"inc": 0, "out": 0}}
+            )
+            chunk_stats["placed"] += count
+
+
+def _transfer(engine, storage):
+    # Copy all the data of the memory engine to the given storage, through the storage
+    # interfaces, so that any engine can be the target.
+    files = engine.files
+    for id, meta in files.all().items():
+        content, _ = files.load(id)
+        storage.files.store(
+            content, id=id, meta=meta, encoding=files.get_encoding(id), overwrite=True
+        )
+    for name in engine.morphologies.list():
+        storage.morphologies.save(name, engine.morphologies.load(name), overwrite=True)
+    for ps in PlacementSet.all(engine):
+        ps.transfer(storage.require_placement_set(ps.cell_type))
+    for tag in ConnectivitySet.get_tags(engine):
+        cs = ConnectivitySet(engine, tag)
+        target = storage.require_connectivity_set(cs.pre_type, cs.post_type, tag)
+        for _, lchunk, gchunk, (lloc, gloc) in cs.flat_iter_connections("out"):
+            target.chunk_connect(lchunk, gchunk, lloc, gloc)
+
+
+def _get_default_root():
+    return (
+        "memory_network_" + datetime.now().strftime("%Y_%m_%d") + "_" + shortuuid.uuid()
+    )
+
+
+@config.node
+class StorageNode(IStorageNode):
+    root = config.attr(type=str, default=_get_default_root, call_default=True)
+    """
+    Name of the memory storage.
+    """
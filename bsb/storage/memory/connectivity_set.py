@@ -0,0 +1,332 @@
+import errr
+import numpy as np
+
+from ...exceptions import DatasetExistsError, DatasetNotFoundError
+from .._chunks import Chunk, chunklist
+from ..fs.connectivity_set import (
+    CSIterator,
+    LocationOutOfBoundsError,
+    _point_to_2d,
+    get_dir_iter,
+)
+from ..interfaces import ConnectivitySet as IConnectivitySet, ConnectivityStats
+
+
+class ConnectivitySet(IConnectivitySet):
+    """
+    Keeps the connectivity data of a connection type in memory. Each direction of the
+    set holds a block of local and global locations per pair of local and global chunk.
+    Loaded blocks are copies of the stored blocks.
+
+    .. note::
+
+        Use :meth:`Scaffold.get_connectivity_set <bsb.core.Scaffold.get_connectivity_set>`
+        to correctly obtain a :class:`~bsb.storage.interfaces.ConnectivitySet`.
+    """
+
+    def __init__(self, engine, tag):
+        self._engine = engine
+        self.tag = tag
+        if not self.exists(engine, tag):
+            raise DatasetNotFoundError(
+                f"ConnectivitySet '{tag}' does not exist. Choose from: "
+                + errr.quotejoin(self.get_tags(self._engine))
+            )
+        self.pre_type = self._data["pre"]
+        self.post_type = self._data["post"]
+        self._pre_name = self.pre_type.name
+        self._post_name = self.post_type.name
+
+    def __eq__(self, other):
+        return self._engine == getattr(other, "_engine", None) and self.tag == getattr(
+            other, "tag", None
+        )
+
+    def __len__(self):
+        return sum(stats["out"] for stats in self._data["stats"].values())
+
+    @property
+    def _data(self):
+        return self._engine._data["connectivity"][self.tag]
+
+    @classmethod
+    def get_tags(cls, engine):
+        """
+        Returns all the connectivity tags in the network.
+        """
+        return list(engine._data["connectivity"].keys())
+
+    @classmethod
+    def create(cls, engine, pre_type, post_type, tag=None):
+        """
+        Create the structure for this connectivity set in the storage.
+        """
+        if tag is None:
+            tag = f"{pre_type.name}_to_{post_type.name}"
+        with engine._write():
+            if cls.exists(engine, tag):
+                raise DatasetExistsError(f"ConnectivitySet '{tag}' already exists.")
+            _create(engine, tag, pre_type, post_type)
+        return cls(engine, tag)
+
+    @staticmethod
+    def exists(engine, tag):
+        """
+        Checks whether a :class:`~.connectivity_set.ConnectivitySet` with the given tag
+        exists.
+
+        :param engine: Engine to use for the lookup.
+        :type engine: :class:`.MemoryEngine`
+        :param tag: Tag of the set to look for.
+        :type tag: str
+        :returns: Whether the tag exists.
+        :rtype: bool
+        """
+        return tag in engine._data["connectivity"]
+
+    @classmethod
+    def require(cls, engine, pre_type, post_type, tag=None):
+        """
+        Get or create a :class:`~.connectivity_set.ConnectivitySet`.
+
+        :param engine: Engine to fetch/write the data.
+        :type engine: :class:`.MemoryEngine`
+        :param pre_type: Presynaptic cell type.
+        :type pre_type: :class:`~bsb.cell_types.CellType`
+        :param post_type: Postsynaptic cell type.
+        :type post_type: :class:`~bsb.cell_types.CellType`
+        :param tag: Tag to store the set under. Defaults to
+          ``{pre_type.name}_to_{post_type.name}``.
+        :type tag: str
+        :returns: Existing or new connectivity set.
+        :rtype: :class:`~.connectivity_set.ConnectivitySet`
+        """
+        if tag is None:
+            tag = f"{pre_type.name}_to_{post_type.name}"
+        with engine._write():
+            if not cls.exists(engine, tag):
+                _create(engine, tag, pre_type, post_type)
+        cs = cls(engine, tag)
+        for given, stored in ((pre_type, cs._pre_name), (post_type, cs._post_name)):
+            if given.name != stored:
+                raise ValueError(
+                    f"Given and stored type mismatch: {given.name} vs {stored}"
+                )
+        cs.pre_type = pre_type
+        cs.post_type = post_type
+        return cs
+
+    def remove(self):
+        """
+        Remove the connectivity set and all of its data.
+        """
+        with self._engine._write():
+            del self._engine._data["connectivity"][self.tag]
+
+    def clear(self, chunks=None):
+        """
+        Clear the connections from and to the given chunks, or all connections.
+
+        :param chunks: If given, the specific chunks to clear.
+        :type chunks: List[bsb.storage.Chunk]
+        """
+        with self._engine._write():
+            if chunks is None:
+                for direction in ("inc", "out", "stats"):
+                    self._data[direction].clear()
+                self._data["cached_stats"] = None
+                return
+            self._data["cached_stats"] = None
+            ids = {chunk.id for chunk in chunklist(chunks)}
+            for direction in ("inc", "out"):
+                local_blocks = self._data[direction]
+                for lchunk in list(local_blocks.keys()):
+                    if lchunk in ids:
+                        removed = local_blocks.pop(lchunk).values()
+                    else:
+                        removed = [
+                            local_blocks[lchunk].pop(gchunk)
+                            for gchunk in ids
+                            if gchunk in local_blocks[lchunk]
+                        ]
+                    self._count(direction, lchunk, -sum(map(len, removed)))
+
+    def connect(self, pre_set, post_set, src_locs, dest_locs):
+        src_locs = _point_to_2d(src_locs)
+        dest_locs = _point_to_2d(dest_locs)
+        if not len(src_locs):
+            return
+        if len(src_locs) != len(dest_locs):
+            raise ValueError("Location matrices must be of same length.")
+        if pre_set._requires_morpho_mapping():
+            src_locs = pre_set._morpho_backmap(src_locs)
+        if post_set._requires_morpho_mapping():
+            dest_locs = post_set._morpho_backmap(dest_locs)
+        for data in self._demux(pre_set, post_set, src_locs, dest_locs):
+            if not len(data[-1]):
+                # Don't write empty data
+                continue
+            self.chunk_connect(*data)
+
+    def _demux(self, pre, post, src_locs, dst_locs):
+        src_chunks = pre.get_loaded_chunks()
+        lns = []
+        for src in src_chunks:
+            with pre.chunk_context([src]):
+                lns.append(len(pre))
+        # Iterate over each destination chunk
+        for dst in post.get_loaded_chunks():
+            # Count the number of cells
+            with post.chunk_context([dst]):
+                ln = len(post)
+            dst_idx = dst_locs[:, 0] < ln
+            dst_block = dst_locs[dst_idx]
+            src_block = src_locs[dst_idx]
+            for src, sln in zip(src_chunks, lns):
+                block_idx = (src_block[:, 0] >= 0) & (src_block[:, 0] < sln)
+                yield src, dst, src_block[block_idx], dst_block[block_idx]
+                src_block[:, 0] -= sln
+            dst_locs = dst_locs[~dst_idx]
+            src_locs = src_locs[~dst_idx]
+            # We sifted `ln` cells out of the dataset, so reduce the ids.
+            dst_locs[:, 0] -= ln
+        if len(dst_locs) > 0:
+            raise LocationOutOfBoundsError(
+                f"Received {len(dst_locs)} out of bounds locations:"
+                f"\n- Source locations:\n{src_locs}"
+                f"\n- Destinations:\n{dst_locs}"
+            )
+
+    def chunk_connect(self, src_chunk, dst_chunk, src_locs, dst_locs):
+        if len(src_locs) != len(dst_locs):
+            raise ValueError("Location matrices must be of same length.")
+        with self._engine._write():
+            self._append("inc", dst_chunk, src_chunk, dst_locs, src_locs)
+            self._append("out", src_chunk, dst_chunk, src_locs, dst_locs)
+
+    def _append(self, direction, local_, global_, lloc, gloc):
+        data = np.hstack((_point_to_2d(lloc), _point_to_2d(gloc))).astype(int)
+        self._count(direction, local_.id, len(data))
+        self._data["cached_stats"] = None
+        global_blocks = self._data[direction].setdefault(local_.id, {})
+        if global_.id in global_blocks:
+            data = np.concatenate((global_blocks[global_.id], data))
+        global_blocks[global_.id] = data
+
+    def _count(self, direction, chunk_id, count):
+        # Keep the connection counts of the chunks up to date, and drop empty chunks.
+        stats = self._data["stats"].setdefault(chunk_id, {"inc": 0, "out": 0})
+        stats[direction] += count
+        if not any(stats.values()):
+            del self._data["stats"][chunk_id]
+
+    def get_chunk_stats(self):
+        """
+        Count the incoming and outgoing connections of each chunk.
+
+        :returns: The incoming and outgoing connections per chunk id.
+        :rtype: Dict[str, Dict[str, int]]
+        """
+        return {str(k): v.copy() for k, v in self._data["stats"].items()}
+
+    def stats(self):
+        """
+        Compute the statistics of the connections. The statistics are cached until the
+        set or the placement of its cell types changes.
+
+        :rtype: ~bsb.storage.interfaces.ConnectivityStats
+        """
+        indices = (
+            self.pre_type.get_placement_set().get_chunk_index(),
+            self.post_type.get_placement_set().get_chunk_index(),
+        )
+        cached = self._data["cached_stats"]
+        if cached is None or cached._indices != indices:
+            cached = self._data["cached_stats"] = ConnectivityStats(self)
+        return cached
+
+    def get_local_chunks(self, direction):
+        return chunklist(Chunk.from_id(id, None) for id in self._data[direction])
+
+    def get_global_chunks(self, direction, local_):
+        return chunklist(
+            Chunk.from_id(id, None)
+            for id in self._data[direction].get(local_.id, {}).keys()
+        )
+
+    def nested_iter_connections(self, direction=None, local_=None, global_=None):
+        """
+        Iterates over the connectivity data, leaving room for the end-user to set up
+        nested for loops. See the ``fs`` engine's
+        :meth:`~bsb.storage.fs.connectivity_set.ConnectivitySet.nested_iter_connections`.
+        """
+        return CSIterator(self, direction, local_, global_)
+
+    def flat_iter_connections(self, direction=None, local_=None, global_=None):
+        """
+        Iterates over the connectivity data. See the ``fs`` engine's
+        :meth:`~bsb.storage.fs.connectivity_set.ConnectivitySet.flat_iter_connections`.
+        """
+        itr = CSIterator(self, direction, local_, global_)
+        for direction in get_dir_iter(direction):
+            for lchunk in itr.get_local_iter(direction, local_):
+                for gchunk in itr.get_global_iter(direction, lchunk, global_):
+                    conns = self.load_block_connections(direction, lchunk, gchunk)
+                    yield direction, lchunk, gchunk, conns
+
+    def load_block_connections(self, direction, local_, global_):
+        """
+        Load the connection block with given direction between the given local and global
+        chunk.
+
+        :param direction: Either ``inc`` to load the connections from the incoming
+          perspective or ``out`` for the outgoing perspective.
+        :type direction: str
+        :param local_: Local chunk
+        :type local_: ~bsb.storage.Chunk
+        :param global_: Global chunk
+        :type global_: ~bsb.storage.Chunk
+        :returns: The local and global connections locations
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+        """
+        block = self._data[direction].get(local_.id, {}).get(global_.id, _empty())
+        # Copy the block, loaded blocks may be changed in place by the caller.
+        block = block.copy()
+        return block[:, :3], block[:, 3:]
+
+    def load_local_connections(self, direction, local_):
+        """
+        Load all the connections of the given local chunk.
+
+        :param direction: Either ``inc`` to load the connections from the incoming
+          perspective or ``out`` for the outgoing perspective.
+        :type direction: str
+        :param local_: Local chunk
+        :type local_: ~bsb.storage.Chunk
+        :returns: The local connection locations, a vector of the global connection chunks
+          (1 chunk id per connection) and the global connections locations. To identify a
+          cell in the global connections, use the corresponding chunk id from the second
+          return value.
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+        """
+        global_blocks = self._data[direction].get(local_.id, {})
+        gchunks = sorted(global_blocks.keys())
+        blocks = [global_blocks[g] for g in gchunks]
+        data = np.concatenate([_empty(), *blocks])
+        col = np.repeat(gchunks, [len(b) for b in blocks]).astype(int)
+        return data[:, :3], col, data[:, 3:]
+
+
+def _empty():
+    return np.empty((0, 6), dtype=int)
+
+
+def _create(engine, tag, pre_type, post_type):
+    engine._data["connectivity"][tag] = {
+        "pre": pre_type,
+        "post": post_type,
+        "inc": {},
+        "out": {},
+        "stats": {},
+        "cached_stats": None,
+    }
@@ -0,0 +1,118 @@
+import io
+import json
+import time
+from uuid import uuid4
+
+from ..interfaces import FileStore as IFileStore
+
+
+class FileStore(IFileStore):
+    @property
+    def _files(self):
+        return self._engine._data["files"]
+
+    def all(self):
+        return {id: self.get_meta(id) for id in self._files}
+
+    def store(self, content, id=None, meta=None, encoding=None, overwrite=False):
+        if isinstance(content, str):
+            if encoding is None:
+                encoding = "utf-8"
+            content = content.encode(encoding)
+        if id is None:
+            id = str(uuid4())
+        if meta is None:
+            meta = {}
+        if not overwrite and self.has(id):
+            raise FileExistsError(f"Store already contains a file with id {id}")
+        self._files[id] = {
+            "content": bytes(content),
+            "meta": json.loads(json.dumps(meta)),
+            "mtime": time.time(),
+            "encoding": encoding,
+        }
+        return id
+
+    def load(self, id):
+        """
+        Load the content of an object in the file store.
+
+        :param id: id of the content to be loaded.
+        :type id: str
+        :returns: The content of the stored object
+        :rtype: str
+        :raises FileNotFoundError: The given id doesn't exist in the file store.
+        """
+        file = self._get_file(id)
+        content = file["content"]
+        encoding = file["encoding"]
+        return (content.decode(encoding) if encoding else content), self.get_meta(id)
+
+    def open_read(self, id):
+        return io.BytesIO(self._get_file(id)["content"])
+
+    def remove(self, id):
+        """
+        Remove the content of an object in the file store.
+
+        :param id: id of the content to be removed.
+        :type id: str
+        :raises FileNotFoundError: The given id doesn't exist in the file store.
+        """
+        self._get_file(id)
+        del self._files[id]
+
+    def store_active_config(self, config):
+        """
+        Store configuration in the file store and mark it as the active configuration of
+        the stored network.
+
+        :param config: Configuration to be stored
+        :type config: :class:`~.config.Configuration`
+        :returns: The id the config was stored under
+        :rtype: str
+        """
+        for stored in self.find_files(lambda _, meta: meta.get("active_config", False)):
+            self.remove(stored.id)
+        return self.store(json.dumps(config.__tree__()), meta={"active_config": True})
+
+    def load_active_config(self):
+        """
+        Load the active configuration stored in the file store.
+
+        :returns: The active configuration
+        :rtype: :class:`~.config.Configuration`
+        :raises Exception: When there's no active configuration in the file store.
+        """
+        from bsb.config import Configuration
+        from bsb.config._config import _bootstrap_components
+
+        stored = self.find_meta("active_config", True)
+        if stored is None:
+            raise Exception("No active config")
+        else:
+            content, meta = stored.load()
+            tree = json.loads(content)
+            _bootstrap_components(tree.get("components", []), self)
+            cfg = Configuration(**tree)
+            cfg._meta = meta
+            return cfg
+
+    def has(self, id):
+        return id in self._files
+
+    def get_mtime(self, id):
+        return self._get_file(id)["mtime"]
+
+    def get_encoding(self, id):
+        return self._get_file(id)["encoding"]
+
+    def get_meta(self, id):
+        # Return a copy, like the engines that read the metadata from disk.
+        return json.loads(json.dumps(self._get_file(id)["meta"]))
+
+    def _get_file(self, id):
+        try:
+            return self._files[id]
+        except KeyError:
+            raise FileNotFoundError(f"File with id '{id}' not found.") from None
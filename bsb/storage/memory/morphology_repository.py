@@ -0,0 +1,86 @@
+import numpy as np
+
+from ...exceptions import MissingMorphologyError, MorphologyRepositoryError
+from ..interfaces import (
+    MorphologyRepository as IMorphologyRepository,
+    StoredMorphology,
+)
+
+
+class MorphologyRepository(IMorphologyRepository):
+    """
+    Keeps an optimized copy of each saved morphology. Loading a morphology returns a new
+    copy, so that changes to loaded morphologies don't affect the repository.
+    """
+
+    @property
+    def _morphologies(self):
+        return self._engine._data["morphologies"]
+
+    def select(self, *selectors):
+        all_loaders = self.all()
+        selected = []
+        for selector in selectors:
+            selector.validate(all_loaders)
+            selected.extend(filter(selector.pick, all_loaders))
+        return selected
+
+    def preload(self, name):
+        return StoredMorphology(name, self._make_loader(name), self.get_meta(name))
+
+    def _make_loader(self, name):
+        def loader():
+            return self.load(name)
+
+        return loader
+
+    def get_meta(self, name):
+        return _copy_meta(self._get(name)[1])
+
+    def all(self):
+        return [self.preload(name) for name in self._morphologies]
+
+    def has(self, name):
+        return name in self._morphologies
+
+    def load(self, name):
+        morphology, meta = self._get(name)
+        loaded = morphology.copy()
+        loaded.meta = _copy_meta(meta)
+        return loaded
+
+    def save(self, name, morphology, overwrite=False):
+        with self._engine._write():
+            if name in self._morphologies and not overwrite:
+                raise MorphologyRepositoryError(
+                    f"A morphology called '{name}' already exists in "
+                    + f"`{self._engine.root}`."
+                )
+            stored = morphology.copy()
+            meta = dict(morphology.meta)
+            if len(stored):
+                meta["ldc"] = np.min(stored.points, axis=0)
+                meta["mdc"] = np.max(stored.points, axis=0)
+            else:
+                meta["ldc"] = meta["mdc"] = np.full(3, np.nan)
+            meta["name"] = name
+            self._morphologies[name] = (stored, meta)
+        return StoredMorphology(name, lambda: morphology, _copy_meta(meta))
+
+    def remove(self, name):
+        with self._engine._write():
+            if name not in self._morphologies:
+                raise MorphologyRepositoryError(f"'{name}' doesn't exist.")
+            del self._morphologies[name]
+
+    def _get(self, name):
+        try:
+            return self._morphologies[name]
+        except KeyError:
+            raise MissingMorphologyError(
+                f"`{self._engine.root}` contains no morphology named `{name}`."
+            ) from None
+
+
+def _copy_meta(meta):
+    return {k: v.copy() if isinstance(v, np.ndarray) else v for k, v in meta.items()}
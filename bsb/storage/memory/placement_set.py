@@ -0,0 +1,483 @@
+import contextlib
+import itertools
+
+import numpy as np
+
+from ..._encoding import EncodedLabels
+from ...exceptions import ChunkError, DatasetExistsError, DatasetNotFoundError
+from ...morphologies import MorphologySet, RotationSet
+from .._chunks import Chunk, ChunkIndex, chunklist
+from ..fs.placement_set import LabellingException, _MapSelector, _load_ids
+from ..interfaces import PlacementSet as IPlacementSet
+
+# Shape of a single cell's data in each of the per-chunk datasets
+_datasets = {
+    "position": ((3,), float),
+    "rotation": ((3,), float),
+    "morphology": ((), int),
+    "labels": ((), int),
+}
+
+
+class PlacementSet(IPlacementSet):
+    """
+    Keeps the placement data of a cell type in memory. Each chunk of the placement set
+    holds an array per dataset, and the chunk size, labelsets and morphology maps are
+    kept alongside the chunks, as in the ``meta.json`` of the ``fs`` engine. Loaded
+    datasets are copies of the stored arrays.
+
+    .. note::
+
+        Use :meth:`Scaffold.get_placement_set <bsb.core.Scaffold.get_placement_set>` to
+        correctly obtain a PlacementSet.
+    """
+
+    def __init__(self, engine, cell_type):
+        super().__init__(engine, cell_type)
+        self._chunks = []
+        self._labels = None
+        self._morphology_labels = None
+        if not self.exists(engine, cell_type):
+            raise DatasetNotFoundError(f"PlacementSet '{self.tag}' does not exist")
+
+    def __eq__(self, other):
+        return self._engine == getattr(other, "_engine", None) and self.tag == getattr(
+            other, "tag", None
+        )
+
+    @property
+    def _data(self):
+        return self._engine._data["placement"][self.tag]
+
+    @classmethod
+    def all(cls, engine):
+        """
+        Return all the placement sets of the engine.
+        """
+        return [
+            cls(engine, data["cell_type"]) for data in engine._data["placement"].values()
+        ]
+
+    @classmethod
+    def create(cls, engine, cell_type):
+        with engine._write():
+            if cell_type.name in engine._data["placement"]:
+                raise DatasetExistsError(
+                    f"PlacementSet '{cell_type.name}' already exists."
+                )
+            _create(engine, cell_type)
+        return cls(engine, cell_type)
+
+    @staticmethod
+    def exists(engine, cell_type):
+        return cell_type.name in engine._data["placement"]
+
+    @classmethod
+    def require(cls, engine, cell_type):
+        with engine._write():
+            if cell_type.name not in engine._data["placement"]:
+                _create(engine, cell_type)
+        return cls(engine, cell_type)
+
+    def remove(self):
+        """
+        Remove the placement set and all of its data.
+        """
+        with self._engine._write():
+            self._clear(self.get_all_chunks())
+            del self._engine._data["placement"][self.tag]
+
+    def clear(self, chunks=None):
+        with self._engine._write():
+            self._clear(self.get_loaded_chunks() if chunks is None else chunks)
+
+    def _clear(self, chunks):
+        stored = self._data["chunks"]
+        removed = {}
+        for chunk in chunklist(chunks):
+            key = str(chunk.id)
+            if key in stored:
+                removed[key] = stored.pop(key)["len"]
+        self._data["index"] = None
+        self._engine._track_placed({k: -n for k, n in removed.items()})
+
+    def get_all_chunks(self):
+        size = self._data["chunk_size"]
+        return chunklist(Chunk.from_id(int(c), size) for c in self._data["chunks"])
+
+    def get_loaded_chunks(self):
+        if not self._chunks:
+            return self.get_all_chunks()
+        else:
+            return self._chunks.copy()
+
+    @contextlib.contextmanager
+    def chunk_context(self, chunks):
+        old_chunks = self._chunks
+        self._chunks = chunklist(chunks)
+        try:
+            yield
+        finally:
+            self._chunks = old_chunks
+
+    def set_chunk_filter(self, chunks):
+        self._chunks = chunklist(chunks) if chunks is not None else []
+
+    def clear_chunk_filter(self):
+        self._chunks = []
+
+    def include_chunk(self, chunk):
+        """
+        Include a chunk in the data when loading datasets.
+        """
+        self._chunks = chunklist([*self._chunks, chunk])
+
+    def exclude_chunk(self, chunk):
+        """
+        Exclude a chunk from the data when loading datasets.
+        """
+        self._chunks.remove(chunk if isinstance(chunk, Chunk) else Chunk(chunk, None))
+
+    def get_chunk_stats(self):
+        return {k: chunk["len"] for k, chunk in self._data["chunks"].items()}
+
+    def get_chunk_index(self):
+        """
+        Return the index of the cell counts and offsets of the chunks. The index is kept
+        until data is appended to or cleared from the placement set.
+        """
+        if self._data["index"] is None:
+            self._data["index"] = ChunkIndex(self.get_chunk_stats())
+        return self._data["index"]
+
+    def load_ids(self):
+        return _load_ids(self.get_chunk_index(), self._chunks)
+
+    def load_positions(self):
+        with self._engine._read():
+            return self._filter(self._load_dataset("position"))
+
+    def load_rotations(self):
+        """
+        Load the cell rotations.
+
+        :raises: DatasetNotFoundError when there is no rotation information for this
+           cell type.
+        """
+        with self._engine._read():
+            data = self._load_dataset("rotation")
+            if len(data) == 0 and self._unfiltered_len() != 0:
+                raise DatasetNotFoundError("No rotation data available.")
+            return RotationSet(self._filter(data))
+
+    def load_morphologies(self, allow_empty=False):
+        """
+        Load the cell morphologies.
+
+        :raises: DatasetNotFoundError when the morphology data is not found.
+        """
+        with self._engine._read():
+            stored = self._data["chunks"]
+            chunk_maps = [
+                (stored[str(chunk.id)], stored[str(chunk.id)]["morphology_loaders"])
+                for chunk in self.get_loaded_chunks()
+                if str(chunk.id) in stored
+                and stored[str(chunk.id)]["morphology_loaders"] is not None
+            ]
+            if not chunk_maps:
+                if not allow_empty:
+                    raise DatasetNotFoundError("No morphology data available.")
+                return MorphologySet([], np.empty(0, dtype=int))
+            names = list(dict.fromkeys(itertools.chain(*(m for _, m in chunk_maps))))
+            loaders = {
+                m.name: m
+                for m in self._engine.morphologies.select(
+                    _MapSelector(ps=self, names=names)
+                )
+            }
+            data = np.concatenate(
+                [np.empty(0, dtype=int)]
+                + [
+                    np.array([names.index(n) for n in _map], dtype=int)[
+                        chunk_data.get("morphology", np.empty(0, dtype=int))
+                    ]
+                    for chunk_data, _map in chunk_maps
+                ]
+            )
+            return MorphologySet(
+                [loaders[name] for name in names],
+                self._filter(data),
+                labels=self._morphology_labels,
+            )
+
+    def load_additional(self, key=None):
+        with self._engine._read():
+            if key is None:
+                return {
+                    key: self._filter(self._load_dataset(key, "additional"))
+                    for key in self._data["additional"]
+                }
+            elif key not in self._data["additional"]:
+                raise DatasetNotFoundError(
+                    f"No additional data '{key}' in the '{self.tag}' placement set."
+                )
+            else:
+                return self._filter(self._load_dataset(key, "additional"))
+
+    def __iter__(self):
+        return itertools.zip_longest(
+            self.load_positions(),
+            self.load_morphologies(),
+        )
+
+    def __len__(self):
+        if self._labels:
+            return int(np.sum(self.get_label_mask(self._labels)))
+        else:
+            return self._unfiltered_len()
+
+    def _unfiltered_len(self):
+        stats = self.get_chunk_stats()
+        return sum(stats.get(str(c.id), 0) for c in self.get_loaded_chunks())
+
+    def append_data(
+        self,
+        chunk,
+        positions=None,
+        morphologies=None,
+        rotations=None,
+        additional=None,
+        count=None,
+    ):
+        """
+        Append data to the placement set.
+
+        :param chunk: The chunk to store data in.
+        :param positions: Cell positions
+        :type positions: :class:`numpy.ndarray`
+        :param rotations: Cell rotations
+        :type rotations: ~bsb.morphologies.RotationSet
+        :param morphologies: Cell morphologies
+        :type morphologies: ~bsb.morphologies.MorphologySet
+        :param count: Amount of entities to place. Excludes the use of any positional,
+          rotational or morphological data.
+        :type count: int
+        """
+        if not isinstance(chunk, Chunk):
+            chunk = Chunk(chunk, None)
+        if count is not None:
+            if not (positions is None and morphologies is None):
+                raise ValueError(
+                    "The `count` keyword is reserved for creating entities,"
+                    + " without any positional, or morphological data."
+                )
+        else:
+            positions = np.array(positions, dtype=float)
+            if positions.ndim < 2:
+                # Broadcast each value over all coordinates, like `[0]` for 1 cell at 0.
+                positions = np.repeat(positions.reshape(-1, 1), 3, axis=1)
+            count = len(positions)
+        with self._engine._write():
+            chunk_data = self._require_chunk(chunk)
+            if count:
+                if positions is not None:
+                    _append(chunk_data, "position", positions)
+                if morphologies is not None:
+                    self._append_morphologies(chunk_data, morphologies)
+                    if rotations is None:
+                        rotations = np.zeros((len(morphologies), 3))
+                if rotations is not None:
+                    _append(chunk_data, "rotation", np.asarray(rotations))
+                for key, ds in (additional or {}).items():
+                    self._append_additional(chunk_data, key, ds)
+            chunk_data["len"] += count
+            self._data["index"] = None
+            self._engine._track_placed({str(chunk.id): count})
+
+    def append_entities(self, chunk, count, additional=None):
+        self.append_data(chunk, count=count, additional=additional)
+
+    def append_additional(self, name, chunk, data):
+        if not isinstance(chunk, Chunk):
+            chunk = Chunk(chunk, None)
+        with self._engine._write():
+            self._append_additional(self._require_chunk(chunk), name, data)
+
+    def _append_additional(self, chunk_data, name, data):
+        if name not in self._data["additional"]:
+            self._data["additional"].append(name)
+        additional = chunk_data["additional"]
+        data = np.asarray(data)
+        if name in additional:
+            dtype = additional[name].dtype
+            additional[name] = np.concatenate((additional[name], data.astype(dtype)))
+        else:
+            additional[name] = data.copy()
+
+    def _append_morphologies(self, chunk_data, morphologies):
+        # Each chunk maps its morphology indices to the names of its own loaders, so
+        # new morphologies are appended to the map instead of remapping the chunk.
+        if chunk_data["morphology_loaders"] is None:
+            chunk_data["morphology_loaders"] = []
+        _map = chunk_data["morphology_loaders"]
+        for name in morphologies._serialize_loaders():
+            if name not in _map:
+                _map.append(name)
+        lookup = np.array(
+            [_map.index(name) for name in morphologies._serialize_loaders()], dtype=int
+        )
+        _append(chunk_data, "morphology", lookup[morphologies.get_indices(copy=False)])
+
+    def label(self, labels, cells):
+        cells = np.array(cells, copy=False, dtype=int)
+        with self._engine._write():
+            stats = self.get_chunk_stats()
+            len_ = sum(stats.values())
+            oob = cells[(cells < 0) | (cells >= len_)]
+            if len(oob):
+                raise LabellingException(
+                    f"Cell labels {oob} out of range for placement set with size {len_}."
+                )
+            # Keep 1 shared labelset lookup for all chunks.
+            labelsets = self._data["labelsets"]
+            ctr = 0
+            for chunk in self.get_all_chunks():
+                len_ = stats[str(chunk.id)]
+                block = cells[(cells >= ctr) & (cells < ctr + len_)] - ctr
+                ctr += len_
+                if not len(block):
+                    continue
+                chunk_data = self._data["chunks"][str(chunk.id)]
+                enc_labels = self._read_labels(chunk_data, labelsets)
+                enc_labels.labels = labelsets
+                enc_labels.label(labels, block)
+                chunk_data["labels"] = enc_labels.raw.copy()
+
+    def set_label_filter(self, labels):
+        self._labels = labels
+
+    def set_morphology_label_filter(self, morphology_labels):
+        """
+        Sets the labels by which any morphology loaded from this set will be filtered.
+
+        :param morphology_labels: List of labels to filter the morphologies by.
+        :type morphology_labels: List[str]
+        """
+        self._morphology_labels = morphology_labels
+
+    def get_labelled(self, labels):
+        mask = self.get_label_mask(labels)
+        return np.nonzero(mask)[0]
+
+    def get_label_mask(self, labels):
+        with self._engine._read():
+            stored = self._data["chunks"]
+            labelsets = self._data["labelsets"]
+            return EncodedLabels.concatenate(
+                *(
+                    self._read_labels(stored[str(chunk.id)], labelsets)
+                    for chunk in self.get_loaded_chunks()
+                    if str(chunk.id) in stored
+                )
+            ).get_mask(labels)
+
+    def transfer(self, target):
+        """
+        Append all the data of this placement set to another placement set.
+
+        :param target: The placement set to append to. Can be of any engine.
+        :type target: ~bsb.storage.interfaces.PlacementSet
+        """
+        has_morphologies = any(
+            chunk_data["morphology_loaders"] is not None
+            for chunk_data in self._data["chunks"].values()
+        )
+        all_labels = []
+        for chunk in self.get_all_chunks():
+            chunk_data = self._data["chunks"][str(chunk.id)]
+            all_labels.append(self._read_labels(chunk_data, self._data["labelsets"]))
+            with self.chunk_context([chunk]):
+                additional = self.load_additional()
+                if "position" not in chunk_data:
+                    target.append_data(
+                        chunk, count=chunk_data["len"], additional=additional
+                    )
+                    continue
+                if has_morphologies:
+                    morphologies = self.load_morphologies(allow_empty=True)
+                    if not len(morphologies):
+                        morphologies = None
+                else:
+                    morphologies = None
+                target.append_data(
+                    chunk,
+                    self.load_positions(),
+                    morphologies=morphologies,
+                    rotations=chunk_data.get("rotation"),
+                    additional=additional,
+                )
+        if not all_labels:
+            return
+        labels = EncodedLabels.concatenate(*all_labels)
+        for code, labelset in labels.labels.items():
+            cells = np.nonzero(labels.raw == code)[0]
+            if labelset and len(cells):
+                target.label(sorted(labelset), cells)
+
+    def _read_labels(self, chunk_data, labelsets):
+        data = np.zeros(chunk_data["len"], dtype=int)
+        stored = chunk_data.get("labels", ())
+        data[: len(stored)] = stored
+        return EncodedLabels(chunk_data["len"], buffer=data, labels=labelsets)
+
+    def _filter(self, data):
+        if self._labels:
+            return data[self.get_label_mask(self._labels)]
+        return data
+
+    def _load_dataset(self, name, collection=None):
+        shape, dtype = _datasets.get(name, ((), float))
+        stored = self._data["chunks"]
+        chunked_data = []
+        for chunk in self.get_loaded_chunks():
+            chunk_data = stored.get(str(chunk.id), {})
+            if collection is not None:
+                chunk_data = chunk_data.get(collection, {})
+            if len(data := chunk_data.get(name, ())):
+                chunked_data.append(data)
+        if not chunked_data:
+            return np.empty((0, *shape), dtype=dtype)
+        # Always copy, so that the stored data can't be changed through loaded data.
+        return np.concatenate(chunked_data)
+
+    def _require_chunk(self, chunk):
+        fsize = self._data["chunk_size"]
+        size = chunk.dimensions
+        if fsize is None or np.all(np.isnan(fsize)):
+            if not np.all(np.isnan(size)):
+                self._data["chunk_size"] = size.tolist()
+        elif not np.all(np.isnan(size)) and not np.allclose(fsize, size):
+            raise ChunkError(f"Chunk size mismatch. Stored: {fsize}. Given: {size}")
+        return self._data["chunks"].setdefault(
+            str(chunk.id), {"len": 0, "morphology_loaders": None, "additional": {}}
+        )
+
+
+def _append(chunk_data, name, data):
+    shape, dtype = _datasets[name]
+    data = np.asarray(data, dtype=dtype).reshape(-1, *shape)
+    if name in chunk_data:
+        chunk_data[name] = np.concatenate((chunk_data[name], data))
+    else:
+        chunk_data[name] = data.copy()
+
+
+def _create(engine, cell_type):
+    engine._data["placement"][cell_type.name] = {
+        "cell_type": cell_type,
+        "chunks": {},
+        "chunk_size": None,
+        "labelsets": EncodedLabels.none(0).labels,
+        "additional": [],
+        "index": None,
+    }
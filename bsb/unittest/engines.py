@@ -14,6 +14,7 @@ from . import (
     get_all_morphology_paths,
     get_morphology_path,
 )
+import threading
 import time
 import numpy as np
 from collections import defaultdict
@@ -289,6 +290,30 @@ class TestPlacementSet(
         )
         self.assertEqual(len(ps), len(rot), "expected equal amounts of rotations")
 
+    def test_load_boxes(self):
+        self.network.cell_types.test_cell.spatial.morphologies.append(
+            dict(names=["test_cell_A", "test_cell_B"])
+        )
+        self.network.placement.ch4_c25.distribute.rotations = dict(strategy="random")
+        mA = Morphology.from_swc(get_morphology_path("2branch.swc"))
+        mB = Morphology.from_swc(get_morphology_path("2comp.swc"))
+        self.network.morphologies.save("test_cell_A", mA, overwrite=True)
+        self.network.morphologies.save("test_cell_B", mB, overwrite=True)
+        self.network.compile(clear=True)
+        ps = self.network.get_placement_set("test_cell")
+        boxes = ps.load_boxes()
+        self.assertEqual((100, 6), boxes.shape, "expected a box per cell")
+        iters = (
+            ps.load_morphologies(),
+            ps.load_positions(),
+            ps.load_rotations(),
+        )
+        for box, morpho, pos, rot in zip(boxes, *iters):
+            points = rot.apply(morpho.points) + pos
+            self.assertAll(box[:3] <= np.min(points, axis=0) + 1e-9, "point below box")
+            self.assertAll(box[3:] >= np.max(points, axis=0) - 1e-9, "point above box")
+        self.assertEqual(100, len(ps.load_box_tree()), "expected a tree of all boxes")
+
     def test_4chunks_25cells(self):
         self.network.compile()
         ps = self.network.get_placement_set("test_cell")
@@ -358,6 +383,41 @@ class TestPlacementSet(
             1, len(ps), f"PlacementSet placement {len(ps)} after 1 list type input"
         )
 
+    def test_spatial_queries(self):
+        self.network.compile()
+        ps = self.network.get_placement_set("test_cell")
+        pos = ps.load_positions()
+        ldc, mdc = np.min(pos, axis=0), np.max(pos, axis=0)
+        center, radius = (ldc + mdc) / 2, np.min(mdc - ldc) / 3
+        ids, positions = ps.query_box(ldc, center)
+        expected = np.nonzero(np.all((pos >= ldc) & (pos <= center), axis=1))[0]
+        self.assertClose(expected, ids, "box query ids differ")
+        self.assertClose(pos[expected], positions, "box query positions differ")
+        ids, positions = ps.query_sphere(center, radius)
+        expected = np.nonzero(np.linalg.norm(pos - center, axis=1) <= radius)[0]
+        self.assertClose(expected, ids, "sphere query ids differ")
+        self.assertClose(pos[expected], positions, "sphere query positions differ")
+        points = [ldc, center, mdc]
+        ids, positions = ps.nearest(points, k=3)
+        self.assertEqual((3, 3), ids.shape)
+        for point, nearest, nearest_pos in zip(points, ids, positions):
+            dist = np.linalg.norm(pos - point, axis=1)
+            self.assertClose(np.sort(dist)[:3], dist[nearest], "not the nearest cells")
+            self.assertClose(pos[nearest], nearest_pos)
+        self.assertEqual((1, 100), ps.nearest(center, k=1000)[0].shape)
+
+    def test_nearest_none(self):
+        self.network.compile()
+        ps = self.network.get_placement_set("test_cell")
+        points = np.zeros((2, 3))
+        ids, positions = ps.nearest(points, k=0)
+        self.assertEqual((2, 0), ids.shape)
+        self.assertEqual((2, 0, 3), positions.shape)
+        ps = self.network.get_placement_set("test_cell", labels=["unused"])
+        ids, positions = ps.nearest(points, k=3)
+        self.assertEqual((2, 0), ids.shape, "filtered cells should not be found")
+        self.assertEqual((2, 0, 3), positions.shape)
+
     def test_label(self):
         self.network.compile()
         ps = self.network.get_placement_set("test_cell")
@@ -560,6 +620,65 @@ class TestConnectivitySet(
         self.assertEqual(10000, len(pre), "expected full 10k presynaptic locs")
         self.assertEqual(10000, len(post), "expected full 10k postsynaptic locs")
 
+    def test_prefetch(self):
+        cs = self.network.get_connectivity_set("all_to_all")
+        itr = cs.load_connections().as_globals().prefetch(2)
+        self.assertFalse(itr._scoped, "copies should keep the iterator settings")
+        threads = []
+        load_offsets = itr._chunk_offsets
+
+        def chunk_offsets(*args):
+            threads.append(threading.current_thread())
+            return load_offsets(*args)
+
+        itr._chunk_offsets = chunk_offsets
+        for expected, prefetched in zip(cs.load_connections().all(), itr.all()):
+            self.assertClose(expected, prefetched, "prefetched blocks differ")
+        self.assertEqual(
+            [threading.current_thread()] * 2,
+            threads,
+            "offsets should be loaded once, before the blocks are prefetched",
+        )
+        for _ in itr:
+            # Stopping early should stop the background thread.
+            break
+
+    def test_as_sparse(self):
+        cs = self.network.get_connectivity_set("all_to_all")
+        matrix = cs.as_sparse()
+        self.assertEqual("csr", matrix.format, "expected CSR matrix by default")
+        self.assertEqual((100, 100), matrix.shape, "expected a row/col per cell")
+        self.assertEqual(10000, matrix.nnz, "expected all to all connections")
+        pre, post = cs.load_connections().as_globals().all()
+        expected = np.zeros((100, 100), dtype=int)
+        np.add.at(expected, (pre[:, 0], post[:, 0]), 1)
+        self.assertClose(expected, matrix.toarray(), "sparse matrix differs")
+        self.assertEqual("coo", cs.as_sparse(format="coo").format)
+        branches = cs.as_sparse(granularity="branch")
+        self.assertClose(
+            expected, branches.toarray(), "cells without morphology should have 1 row"
+        )
+        blocks = list(cs.as_sparse_blocks(format="csc"))
+        self.assertEqual(16, len(blocks), "expected 4 x 4 chunk blocks")
+        for _, _, block in blocks:
+            self.assertEqual("csc", block.format)
+            self.assertEqual((25, 25), block.shape, "expected a row/col per chunk cell")
+            self.assertEqual(625, block.nnz, "expected all to all block connections")
+        with self.assertRaises(ValueError):
+            cs.as_sparse(granularity="synapse")
+
+    def test_stats(self):
+        cs = self.network.get_connectivity_set("all_to_all")
+        stats = cs.stats()
+        self.assertEqual(10000, len(stats), "expected all to all connections")
+        self.assertClose(100, stats.out_degree, "expected 100 targets per cell")
+        self.assertClose(100, stats.in_degree, "expected 100 sources per cell")
+        self.assertEqual(100, stats.out_degree_histogram[100])
+        self.assertEqual(100, np.sum(stats.in_degree_histogram))
+        self.assertEqual(cs.get_chunk_stats(), stats.chunk_counts)
+        self.assertClose([0, 10000], stats.multapses, "expected no multapses")
+        self.assertEqual(10000, stats.pairs)
+
     def test_load_local(self):
         cs = self.network.get_connectivity_set("all_to_all")
         chunks = cs.get_local_chunks("inc")
@@ -71,7 +71,7 @@ setuptools.setup(
     ],
     entry_points={
         "console_scripts": ["bsb = bsb.cli:handle_cli"],
-        "bsb.storage.engines": ["fs = bsb.storage.fs"],
+        "bsb.storage.engines": ["fs = bsb.storage.fs", "memory = bsb.storage.memory"],
         "bsb.simulation_backends": [
             "arbor = bsb.simulators.arbor",
             "nest = bsb.simulators.nest",
@@ -92,6 +92,12 @@ setuptools.setup(
             "version = bsb._options:version",
             "config = bsb._options:config",
             "profiling = bsb._options:profiling",
+            "pool_backend = bsb._options:pool_backend",
+            "pool_workers = bsb._options:pool_workers",
+            "pool_trace = bsb._options:pool_trace",
+            "pool_progress = bsb._options:pool_progress",
+            "write_buffer = bsb._options:write_buffer",
+            "dataset_cache = bsb._options:dataset_cache",
         ],
     },
     python_requires="~=3.8",
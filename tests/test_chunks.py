@@ -5,6 +5,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 from bsb.core import Scaffold
 from bsb.config import from_json
 from bsb.storage import Chunk
+from bsb.storage._chunks import ChunkIndex
 from bsb.exceptions import *
 from bsb.unittest import get_config_path, skip_parallel, timeout, NumpyTestCase
 
@@ -107,3 +108,31 @@ class TestChunks(unittest.TestCase, NumpyTestCase):
                     Chunk.from_id(Chunk(coords, None).id, None),
                     "Chunks not bijective.",
                 )
+
+
+class TestChunkIndex(unittest.TestCase, NumpyTestCase):
+    def test_offsets(self):
+        index = ChunkIndex({"4294967296": 5, "0": 3, "1": 0, "65536": 2})
+        self.assertEqual(10, len(index))
+        self.assertClose([0, 1, 65536, 4294967296], index.ids, "ids should be sorted")
+        self.assertClose([0, 3, 3, 5], index.offsets)
+        self.assertEqual(5, index.offset(Chunk([0, 0, 1], None)))
+        self.assertEqual(2, index.count(65536))
+        self.assertEqual(0, index.count(Chunk([5, 5, 5], None)))
+        with self.assertRaises(KeyError):
+            index.offset(Chunk([5, 5, 5], None))
+
+    def test_offsets_of(self):
+        index = ChunkIndex({"4294967296": 5, "0": 3, "1": 0, "65536": 2})
+        self.assertClose([3, 0, 3, 5], index.offsets_of([65536, 0, 1, 4294967296]))
+        self.assertEqual(0, len(index.offsets_of([])))
+        with self.assertRaises(KeyError):
+            index.offsets_of([0, 2])
+        with self.assertRaises(KeyError):
+            ChunkIndex({}).offsets_of([0])
+
+    def test_scoped(self):
+        index = ChunkIndex({"0": 3, "1": 4, "2": 5})
+        scoped = index.scoped([Chunk([2, 0, 0], None), Chunk([0, 0, 0], None)])
+        self.assertClose([0, 2], scoped.ids)
+        self.assertClose([0, 3], scoped.offsets)
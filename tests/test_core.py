@@ -2,9 +2,9 @@ import unittest
 import os
 from bsb.core import Scaffold
 from bsb.storage.interfaces import PlacementSet
-from bsb.config import Configuration
+from bsb.config import Configuration, from_json
 from bsb import core
-from bsb.unittest import RandomStorageFixture
+from bsb.unittest import RandomStorageFixture, FixedPosConfigFixture, get_config_path
 
 
 class TestCore(unittest.TestCase):
@@ -76,3 +76,55 @@ class TestProfiling(RandomStorageFixture, unittest.TestCase, engine_name="hdf5")
             len(bsb.profiling.get_active_session()._meters), 0, "missing meters"
         )
         bsb.options.profiling = False
+
+
+class TestPlan(
+    FixedPosConfigFixture, RandomStorageFixture, unittest.TestCase, engine_name="hdf5"
+):
+    def setUp(self):
+        super().setUp()
+        self.cfg.connectivity.add(
+            "all_to_all",
+            dict(
+                strategy="bsb.connectivity.AllToAll",
+                presynaptic=dict(cell_types=["test_cell"]),
+                postsynaptic=dict(cell_types=["test_cell"]),
+            ),
+        )
+        self.netw = Scaffold(self.cfg, self.storage)
+
+    def test_plan(self):
+        plan = self.netw.plan()
+        self.assertEqual(8, plan.jobs, "should queue 4 placement and 4 connect jobs")
+        self.assertEqual(100, plan.cells, "should count the fixed positions")
+        self.assertEqual(100 * 100, plan.connections, "should count all pairs")
+        self.assertEqual(100 * 24, plan["ch4_c25"].storage, "should store positions")
+        self.assertEqual(25 * 24, plan["ch4_c25"].memory, "should place 25 per job")
+        self.assertGreater(plan["all_to_all"].memory, 0)
+        self.assertIn("all_to_all", str(plan), "should report each strategy")
+        self.assertEqual(0, len(self.netw.get_placement_set("test_cell")), "dry run")
+
+    def test_plan_skip(self):
+        plan = self.netw.plan(skip_connectivity=True)
+        self.assertEqual(4, plan.jobs, "should only plan placement")
+        self.assertEqual(0, plan.connections)
+
+    def test_plan_error(self):
+        self.netw.placement.ch4_c25.positions = None
+        plan = self.netw.plan()
+        self.assertIsNotNone(plan["ch4_c25"].error, "should report planning errors")
+        self.assertIn("Could not plan 'ch4_c25'", str(plan))
+
+    def test_plan_unchunked(self):
+        cfg = from_json(get_config_path("test_single.json"))
+        cfg.placement["test_placement"] = dict(
+            strategy="bsb.placement.ParallelArrayPlacement",
+            cell_types=["test_cell"],
+            partitions=["test_layer"],
+            spacing_x=50,
+            angle=0,
+        )
+        plan = Scaffold(cfg, self.storage).plan()
+        self.assertIsNone(plan["test_placement"].error, "unchunked job not guessed")
+        self.assertEqual(1, plan["test_placement"].jobs)
+        self.assertEqual(40, plan.cells, "should guess the cell count of the volume")
@@ -0,0 +1,391 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bsb.storage import Chunk, FileDependency, Storage
+from bsb.storage._cache import dataset_cache
+from bsb.storage.fs import _npy, file_store
+from bsb.unittest import NumpyTestCase, RandomStorageFixture
+from bsb.unittest.engines import (
+    TestStorage as _TestStorage,
+    TestPlacementSet as _TestPlacementSet,
+    TestConnectivitySet as _TestConnectivitySet,
+    TestMorphologyRepository as _TestMorphologyRepository,
+)
+from bsb.cell_types import CellType
+from bsb.morphologies import Morphology, Branch
+from bsb.morphologies.selector import NameSelector
+from bsb.exceptions import MissingMorphologyError, MorphologyRepositoryError
+
+
+class TestStorage(_TestStorage, unittest.TestCase, engine_name="fs"):
+    pass
+
+
+class TestPlacementSet(_TestPlacementSet, unittest.TestCase, engine_name="fs"):
+    pass
+
+
+class TestMemoryMappedPlacementSet(
+    RandomStorageFixture, NumpyTestCase, unittest.TestCase, engine_name="fs"
+):
+    def setUp(self):
+        super().setUp()
+        self.ct = CellType(name="test_cell", spatial=dict(radius=2, count=10))
+        self.ps = self.storage.require_placement_set(self.ct)
+        self.chunks = [Chunk([0, 0, 0], [100] * 3), Chunk([1, 0, 0], [100] * 3)]
+
+    @patch.object(dataset_cache, "_budget", 0)
+    def test_zero_copy(self):
+        pos = np.random.random((10, 3)) * 100
+        self.ps.append_data(self.chunks[0], pos[:6])
+        self.ps.append_data(self.chunks[0], pos[6:])
+        self.ps.set_chunk_filter([self.chunks[0]])
+        loaded = self.ps.load_positions()
+        self.assertIsInstance(loaded, np.memmap, "single chunk should be memory mapped")
+        self.assertClose(pos, loaded)
+
+    def test_interrupted_append(self):
+        path = self.ps._dataset_path(self.chunks[0], "position")
+        self.ps.append_data(self.chunks[0], np.zeros((2, 3)))
+        # Rows written by an append that was interrupted before the header was updated.
+        with open(path, "ab") as f:
+            f.write(np.full((5, 3), 9.0).tobytes())
+        self.assertEqual(2, len(_npy.load(path)), "unfinished rows should be ignored")
+        _npy.append(path, np.ones((1, 3)))
+        self.assertClose([[0] * 3] * 2 + [[1] * 3], _npy.load(path))
+        loaded = _npy.load(path)
+        self.assertEqual(loaded.offset + loaded.nbytes, os.path.getsize(path))
+
+    def test_chunk_filter(self):
+        self.ps.append_data(self.chunks[1], np.ones((3, 3)))
+        self.ps.append_data(self.chunks[0], np.zeros((2, 3)))
+        self.assertClose(
+            [0, 0, 1, 1, 1], self.ps.load_positions()[:, 0], "chunks should be ordered"
+        )
+        self.ps.set_chunk_filter([self.chunks[1]])
+        self.assertEqual(3, len(self.ps))
+        self.assertClose([2, 3, 4], self.ps.load_ids())
+        self.ps.clear()
+        self.ps.set_chunk_filter(None)
+        self.assertEqual(2, len(self.ps), "only the filtered chunk should be cleared")
+        self.assertEqual({str(self.chunks[0].id): 2}, self.ps.get_chunk_stats())
+        self.assertEqual(
+            2, self.storage.get_chunk_stats()[str(self.chunks[0].id)]["placed"]
+        )
+
+    def test_additional(self):
+        self.ps.append_data(
+            self.chunks[0], np.zeros((4, 3)), additional={"radius": np.arange(4)}
+        )
+        self.ps.append_data(
+            self.chunks[1], np.zeros((2, 3)), additional={"radius": np.arange(2)}
+        )
+        self.assertClose([0, 1, 2, 3, 0, 1], self.ps.load_additional("radius"))
+        self.assertEqual(["radius"], list(self.ps.load_additional().keys()))
+
+    def test_chunk_index_cache(self):
+        self.ps.append_data(self.chunks[1], np.ones((3, 3)))
+        index = self.ps.get_chunk_index()
+        self.assertIs(index, self.ps.get_chunk_index(), "index should be cached")
+        self.ps.append_data(self.chunks[0], np.zeros((2, 3)))
+        index = self.ps.get_chunk_index()
+        self.assertEqual(2, index.offset(self.chunks[1]), "append should invalidate")
+        self.ps.set_chunk_filter([self.chunks[0]])
+        self.ps.clear()
+        self.assertEqual(0, self.ps.get_chunk_index().offset(self.chunks[1]))
+
+    @patch.object(dataset_cache, "_budget", 2**20)
+    def test_dataset_cache(self):
+        self.ps.append_data(self.chunks[0], np.zeros((4, 3)))
+        self.ps.load_positions()
+        with patch.object(_npy, "load", wraps=_npy.load) as spy:
+            other = self.storage.get_placement_set(self.ct)
+            loaded = other.load_positions()
+            self.assertEqual(0, spy.call_count, "expected cached positions")
+            self.assertIsInstance(loaded, np.memmap, "cached data was copied")
+            self.assertTrue(np.shares_memory(loaded, other.load_positions()))
+            self.assertFalse(loaded.flags.writeable, "cached data should be read-only")
+            with self.assertRaises(ValueError):
+                loaded[:] = 1
+            self.ps.append_data(self.chunks[0], np.ones((2, 3)))
+            self.assertEqual(6, len(other.load_positions()), "append should invalidate")
+            self.assertEqual(1, spy.call_count)
+
+    def test_readonly_loads(self):
+        self.ps.append_data(self.chunks[0], np.zeros((2, 3)))
+        self.ps.append_data(self.chunks[1], np.ones((3, 3)))
+        self.ps.label(["tag"], [0, 2])
+        for budget in (0, 2**20):
+            with patch.object(dataset_cache, "_budget", budget):
+                for chunks, labels in (
+                    ([self.chunks[0]], None),
+                    (self.chunks, None),
+                    (self.chunks, ["tag"]),
+                ):
+                    self.ps.set_chunk_filter(chunks)
+                    self.ps.set_label_filter(labels)
+                    loaded = self.ps.load_positions()
+                    self.assertFalse(
+                        loaded.flags.writeable,
+                        f"{len(chunks)} chunks, {labels} loaded writable with {budget}",
+                    )
+
+    def test_entities(self):
+        self.ps.append_entities(self.chunks[0], 5)
+        self.assertEqual(5, len(self.ps))
+        self.assertEqual((0, 3), self.ps.load_positions().shape)
+
+
+class TestConnectivitySet(_TestConnectivitySet, unittest.TestCase, engine_name="fs"):
+    def test_stats_cache(self):
+        cs = self.network.get_connectivity_set("all_to_all")
+        stats = cs.stats()
+        self.assertIs(stats, cs.stats(), "stats should be cached")
+        cs.clear()
+        self.assertEqual(0, len(cs.stats()), "clear should invalidate the stats")
+
+    def test_block_mmap(self):
+        cs = self.network.get_connectivity_set("all_to_all")
+        lchunk = cs.get_local_chunks("out")[0]
+        gchunk = cs.get_global_chunks("out", lchunk)[0]
+        local_locs, global_locs = cs.load_block_connections("out", lchunk, gchunk)
+        self.assertIsInstance(local_locs.base, np.memmap, "blocks should be mmapped")
+        self.assertEqual((625, 3), global_locs.shape)
+        # Iterators offset the loaded blocks in place, without touching the storage.
+        local_locs[:, 0] += 100
+        self.assertClose(
+            local_locs[:, 0] - 100,
+            cs.load_block_connections("out", lchunk, gchunk)[0][:, 0],
+        )
+
+    def test_concurrent_writers(self):
+        ct = self.network.cell_types.test_cell
+        cs = self.network.require_connectivity_set(ct, ct, "concurrent")
+        chunk = self.chunks[0]
+        locs = np.zeros((100, 3), dtype=int)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(16):
+                executor.submit(cs.chunk_connect, chunk, chunk, locs, locs)
+        self.assertEqual(1600, len(cs), "appends of concurrent writers lost")
+        stats = self.network.storage.get_chunk_stats()[str(chunk.id)]
+        self.assertEqual(1600 + 2500, stats["connections"]["out"])
+
+    def test_partial_writes(self):
+        ct = self.network.cell_types.test_cell
+        cs = self.network.require_connectivity_set(ct, ct, "partial")
+        chunk = self.chunks[0]
+        engine = self.network.storage._engine
+        write = os.write
+
+        def partial_write(fd, data):
+            # Write at most half a row at a time, and let the other writers run.
+            time.sleep(0.0001)
+            return write(fd, data[:24])
+
+        # The writers should only lock the files they write to, not the engine.
+        with patch.object(os, "write", partial_write), patch.object(
+            engine, "_write", side_effect=AssertionError("engine locked")
+        ):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = [
+                    executor.submit(
+                        cs.chunk_connect, chunk, chunk, *[np.full((50, 3), i)] * 2
+                    )
+                    for i in range(16)
+                ]
+                for future in futures:
+                    future.result()
+        local_locs, global_locs = cs.load_block_connections("out", chunk, chunk)
+        blocks = local_locs.reshape(16, 150)
+        self.assertTrue(np.all(blocks == blocks[:, :1]), "appends of writers interleaved")
+        self.assertClose(local_locs, global_locs)
+
+    def test_clear(self):
+        cs = self.network.get_connectivity_set("all_to_all")
+        self.assertEqual(10000, len(cs.stats()))
+        cs.clear([self.chunks[0]])
+        self.assertEqual(3 * 3 * 625, len(cs), "connections from and to chunk remain")
+        self.assertEqual(len(cs), len(cs.stats()), "stats should be invalidated")
+        self.assertEqual(3, len(cs.get_local_chunks("inc")))
+        self.assertEqual(
+            {"inc": 625 * 3, "out": 625 * 3},
+            cs.get_chunk_stats()[str(self.chunks[1].id)],
+            "cleared blocks should be subtracted from the stats",
+        )
+        cs.clear()
+        self.assertEqual(0, len(cs))
+        self.assertEqual({}, cs.get_chunk_stats())
+        self.assertEqual(0, len(cs.stats()))
+        cs.chunk_connect(
+            self.chunks[0], self.chunks[1], [[0, -1, -1]] * 2, [[3, 2, 1]] * 2
+        )
+        self.assertClose([0, 0, 1], cs.stats().multapses, "expected 1 double synapse")
+
+
+class TestMorphologyRepository(
+    _TestMorphologyRepository, unittest.TestCase, engine_name="fs"
+):
+    def _morpho(self):
+        branch = Branch(
+            np.arange(30, dtype=float).reshape(10, 3),
+            np.ones(10),
+            properties={"thickness": np.linspace(0, 1, 10)},
+        )
+        branch.label(["dendrites"], [1, 2, 3])
+        branch.attach_child(Branch(np.ones((5, 3)), np.ones(5)))
+        return Morphology([branch], meta={"species": "mouse"})
+
+    def test_meta_without_points(self):
+        self.mr.save("A", self._morpho())
+        self.mr.save("B", self._morpho())
+        # Removing the point data must not affect metadata queries
+        for name in ("A", "B"):
+            os.remove(
+                os.path.join(
+                    self.mr._path(self.mr._read_index()[name]["dir"]), "points.npy"
+                )
+            )
+        meta = self.mr.get_meta("A")
+        self.assertEqual("A", meta["name"])
+        self.assertEqual("mouse", meta["species"])
+        self.assertClose([0, 1, 1], meta["ldc"])
+        self.assertClose([27, 28, 29], meta["mdc"])
+        self.assertEqual(["A", "B"], sorted(self.mr.list()))
+        selected = self.mr.select(NameSelector(names=["A"]))
+        self.assertEqual(["A"], [m.name for m in selected])
+        self.assertTrue(self.mr.has("A"))
+        self.assertFalse(self.mr.has("C"))
+        with self.assertRaises(MissingMorphologyError):
+            self.mr.get_meta("C")
+
+    def test_memory_mapped_load(self):
+        m = self._morpho()
+        self.mr.save("A", m)
+        lm = self.mr.load("A")
+        self.assertEqual(m, lm)
+        self.assertIsInstance(lm._shared._points.base, np.memmap)
+        self.assertClose(np.linspace(0, 1, 10), lm.branches[0].thickness)
+        self.assertEqual(3, np.sum(lm.get_label_mask(["dendrites"])))
+        # Copy-on-write, changes to the loaded morphology aren't written to disk
+        lm.points[:] = 0
+        self.assertClose(m.points, self.mr.load("A").points)
+
+    def test_overwrite_remove(self):
+        self.mr.save("A", self._morpho())
+        with self.assertRaises(MorphologyRepositoryError):
+            self.mr.save("A", self._morpho())
+        self.mr.save("A", Morphology([Branch(np.ones((2, 3)), np.ones(2))]), True)
+        self.assertEqual(2, len(self.mr.load("A")))
+        self.mr.remove("A")
+        self.assertFalse(self.mr.has("A"))
+        with self.assertRaises(MissingMorphologyError):
+            self.mr.load("A")
+
+
+class TestFileStore(RandomStorageFixture, unittest.TestCase, engine_name="fs"):
+    def setUp(self):
+        super().setUp()
+        self.files = self.storage.files
+
+    def test_find_meta(self):
+        self.files.store("a", id="a", meta={"source": "x.swc", "tags": [1]})
+        self.files.store("b", id="b", meta={"source": "y.swc"})
+        self.assertEqual("b", self.files.find_meta("source", "y.swc").id)
+        self.assertEqual("a", self.files.find_meta("tags", [1]).id)
+        self.files.store("c", id="a", meta={"source": "z.swc"}, overwrite=True)
+        self.assertIsNone(self.files.find_meta("source", "x.swc"), "stale meta found")
+        self.files.remove("b")
+        self.assertIsNone(self.files.find_meta("source", "y.swc"), "removed file found")
+        self.assertEqual({"a": {"source": "z.swc"}}, self.files.all())
+        self.assertIsNone(self.files.find_id("b"))
+
+    def test_shared_log(self):
+        other = Storage("fs", self.storage.root)
+        self.assertFalse(other.files.has("a"))
+        self.files.store("hello", id="a", meta={"x": 1})
+        self.assertEqual(("hello", {"x": 1}), other.files.load("a"))
+        with open(self.files.log_path(), "r") as f:
+            self.assertEqual(1, len(f.readlines()), "expected 1 record per store")
+
+    def test_compact(self):
+        with patch.object(file_store, "_compact_threshold", 3):
+            for i in range(6):
+                self.files.store(str(i), id="a", overwrite=True)
+        with open(self.files.log_path(), "r") as f:
+            self.assertLess(len(f.readlines()), 6, "log should be compacted")
+        self.assertEqual(("5", {}), self.files.load("a"))
+        self.assertEqual(["a"], list(self.files.all().keys()))
+
+    def test_migrate(self):
+        self.files.store("hello", id="a", meta={"x": 1})
+        log = self.files.log_path()
+        with open(log, "r") as f:
+            record = json.loads(f.readline())
+        legacy = os.path.join(self.storage.root, "file_meta")
+        os.makedirs(legacy)
+        with open(os.path.join(legacy, file_store._id_to_path("a")), "w") as f:
+            json.dump({k: v for k, v in record.items() if k != "id"}, f)
+        os.remove(log)
+        other = Storage("fs", self.storage.root)
+        self.assertEqual({"x": 1}, other.files.get_meta("a"))
+        self.assertFalse(os.path.exists(legacy), "legacy meta should be removed")
+
+    def test_streams(self):
+        with self.files.open_write("a", meta={"x": 1}) as f:
+            f.write(b"hello ")
+            f.write(b"world")
+        with self.files.open_read("a") as f:
+            self.assertEqual(b"hello world", f.read())
+        with self.assertRaises(FileExistsError):
+            with self.files.open_write("a"):
+                pass
+        with self.assertRaises(RuntimeError):
+            with self.files.open_write("a", overwrite=True) as f:
+                f.write(b"partial")
+                raise RuntimeError()
+        self.assertEqual((b"hello world", {"x": 1}), self.files.load("a"))
+        path = self.files.get_local_path("a")
+        self.assertEqual(
+            [os.path.basename(path)], os.listdir(os.path.dirname(path)), "tmp remains"
+        )
+
+    def test_provide_stored_path(self):
+        with tempfile.TemporaryDirectory() as dir:
+            source = os.path.join(dir, "data.txt")
+            with open(source, "w") as f:
+                f.write("hello")
+            file = FileDependency(source, file_store=self.files)
+            file.update()
+        with file.provide_locally() as (path, encoding):
+            stored = file.get_stored_file()
+            self.assertEqual(self.files.get_local_path(stored.id), path)
+            with open(path, "rb") as f:
+                self.assertEqual(b"hello", f.read())
+
+    def test_deduplicate(self):
+        self.files.store("hello", id="a")
+        self.files.store("hello", id="b", meta={"x": 1})
+        self.assertEqual(self.files.get_local_path("a"), self.files.get_local_path("b"))
+        self.assertEqual(1, len(os.listdir(self.files.file_path())))
+        self.files.remove("a")
+        self.assertEqual(("hello", {"x": 1}), self.files.load("b"))
+        self.files.store("bye", id="b", overwrite=True)
+        self.assertEqual(1, len(os.listdir(self.files.file_path())), "blob remains")
+        self.assertEqual(("bye", {}), self.files.load("b"))
+
+    def test_copy_links_blobs(self):
+        self.files.store("hello", id="a")
+        with tempfile.TemporaryDirectory() as dir:
+            root = os.path.join(dir, "copy")
+            self.storage.copy(root)
+            copy = Storage("fs", root)
+            self.assertEqual(("hello", {}), copy.files.load("a"))
+            stat = os.stat(copy.files.get_local_path("a"))
+            self.assertEqual(os.stat(self.files.get_local_path("a")).st_ino, stat.st_ino)
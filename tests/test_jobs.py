@@ -0,0 +1,661 @@
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from bsb import options
+from bsb.core import Scaffold
+from bsb.exceptions import InputError, JobPoolError
+from bsb.services import MPI
+from bsb.services.policy import JobPolicy
+from bsb.storage import Chunk
+from bsb.services.pool import (
+    ConnectivityJob,
+    JobJournal,
+    JobPool,
+    PlacementBatchJob,
+    ProgressSink,
+    create_progress_sinks,
+)
+from bsb.unittest import FixedPosConfigFixture, RandomStorageFixture, NumpyTestCase
+
+
+def _fail(scaffold):
+    raise RuntimeError("job failed")
+
+
+def _succeed(scaffold):
+    pass
+
+
+def _write_and_hang(scaffold):
+    ps = scaffold.cell_types.test_cell.get_placement_set()
+    scaffold.storage.append_data(ps, Chunk([0, 0, 0], [100] * 3), np.zeros((5, 3)))
+    time.sleep(10)
+
+
+def _hang_without_alarms(scaffold):
+    signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])
+    time.sleep(10)
+
+
+@unittest.skipIf(MPI.get_size() > 1, "Local backends are not used under MPI.")
+class TestLocalBackends(
+    FixedPosConfigFixture,
+    RandomStorageFixture,
+    NumpyTestCase,
+    unittest.TestCase,
+    engine_name="hdf5",
+):
+    def setUp(self):
+        super().setUp()
+        self.network = Scaffold(self.cfg, self.storage)
+
+    def test_unknown_backend(self):
+        pool = JobPool(self.network, backend="carrier_pigeons")
+        with self.assertRaises(JobPoolError):
+            pool.parallel
+
+    def test_process_placement(self):
+        pool = JobPool(self.network, backend="processes", workers=2)
+        self.assertTrue(pool.parallel, "process pool should be parallel")
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        pool.execute()
+        ps = self.network.get_placement_set("test_cell")
+        self.assertEqual(100, len(ps), "should place all cells from worker processes")
+        self.assertEqual(4, len(ps.get_all_chunks()), "should have placed in 4 chunks")
+        self.assertClose(
+            sorted(self.cfg.placement.ch4_c25.positions.tolist()),
+            sorted(ps.load_positions().tolist()),
+        )
+
+    def test_thread_placement(self):
+        pool = JobPool(self.network, backend="threads", workers=4)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        self.assertTrue(all(j._thread_safe for j in pool._queue), "should be thread safe")
+        pool.execute()
+        ps = self.network.get_placement_set("test_cell")
+        self.assertEqual(100, len(ps), "should place all cells from worker threads")
+        self.assertEqual(4, len(ps.get_all_chunks()), "should have placed in 4 chunks")
+
+    def test_thread_unsafe_jobs(self):
+        pool = JobPool(self.network, backend="threads", workers=4)
+        running = []
+        overlap = []
+
+        def job(scaffold):
+            running.append(1)
+            overlap.append(len(running))
+            time.sleep(0.01)
+            running.pop()
+
+        for _ in range(8):
+            pool.queue(job)
+        pool.execute()
+        self.assertEqual(8, len(overlap), "all jobs should have run")
+        self.assertEqual(1, max(overlap), "unsafe jobs should run one at a time")
+
+    def test_process_error(self):
+        pool = JobPool(self.network, backend="processes", workers=2)
+        pool.queue(_fail)
+        with self.assertRaises(RuntimeError, msg="worker error should be reraised"):
+            pool.execute()
+
+    def test_prepare_error(self):
+        pool = JobPool(self.network, backend="threads", workers=2)
+        pool.queue(_succeed)
+        engine = self.network.storage._engine
+        lock = getattr(engine, "_lock", None)
+
+        def sort():
+            raise RuntimeError("sort failed")
+
+        pool._sort_by_cost = sort
+        with self.assertRaises(RuntimeError, msg="preparation error should be raised"):
+            pool.execute()
+        self.assertIs(lock, getattr(engine, "_lock", None), "should restore engine lock")
+
+    def test_cost_order(self):
+        pool = JobPool(self.network, backend="threads", workers=1)
+        order = []
+
+        def job(scaffold, i):
+            order.append(i)
+
+        for i, cost in enumerate((1, 5, None, 3, 5)):
+            pool.queue(job, (i,), cost=cost)
+        pool.execute()
+        self.assertEqual([1, 4, 3, 0, 2], order, "should run most expensive jobs first")
+
+    def test_serial_order(self):
+        pool = JobPool(self.network, backend="serial")
+        order = []
+        for i, cost in enumerate((1, 5, 3)):
+            pool.queue(lambda scaffold, i: order.append(i), (i,), cost=cost)
+        pool.execute()
+        self.assertEqual([0, 1, 2], order, "serial execution should keep queue order")
+
+    def test_placement_cost(self):
+        pool = JobPool(self.network)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        costs = [j.get_cost(pool) for j in pool._queue]
+        self.assertEqual([25] * 4, costs, "cost should be the positions per chunk")
+
+    def test_roi_cell_count(self):
+        self.network.compile(clear=True)
+        pool = JobPool(self.network)
+        cell_types = [self.network.cell_types.test_cell]
+        self.assertEqual(100, pool._count_roi_cells(cell_types, self.chunks))
+        self.assertEqual(25, pool._count_roi_cells(cell_types, self.chunks[:1]))
+
+    def test_queued_roi_cell_count(self):
+        pool = JobPool(self.network)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        cell_types = [self.network.cell_types.test_cell]
+        self.assertEqual(
+            100,
+            pool._count_roi_cells(cell_types, self.chunks),
+            "should count the cells that the queued placement jobs will place",
+        )
+        self.assertEqual(25, pool._count_roi_cells(cell_types, self.chunks[:1]))
+
+    def test_coalesce(self):
+        pool = JobPool(self.network, backend="processes", workers=2, batch_cost=50)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        pool._coalesce(pool.backend)
+        self.assertEqual(2, len(pool._queue), "should batch 4 chunks into 2 jobs")
+        self.assertTrue(all(isinstance(j, PlacementBatchJob) for j in pool._queue))
+        self.assertEqual([50, 50], [j.get_cost(pool) for j in pool._queue])
+        pool = JobPool(self.network, backend="processes", workers=2, batch_cost=0)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        pool._coalesce(pool.backend)
+        self.assertEqual(4, len(pool._queue), "batch cost 0 should disable batching")
+
+    def test_batch_placement(self):
+        completed = []
+        pool = JobPool(
+            self.network,
+            listeners=[completed.append],
+            backend="processes",
+            workers=2,
+            batch_cost=100,
+        )
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        pool.execute()
+        ps = self.network.get_placement_set("test_cell")
+        self.assertEqual(100, len(ps), "should place all cells")
+        self.assertEqual(4, len(ps.get_all_chunks()), "should store cells per chunk")
+        self.assertEqual(4, len(completed), "should complete each batched job")
+
+    def test_telemetry(self):
+        pool = JobPool(self.network, backend="processes", workers=2)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        jobs = pool._queue.copy()
+        pool.execute()
+        for job in jobs:
+            t = job.telemetry
+            self.assertLessEqual(t["queued"], t["start"], "should start after queueing")
+            self.assertLessEqual(t["start"], t["end"], "should end after starting")
+            self.assertEqual(25, t["rows"], "should count the placed cells")
+            self.assertNotEqual(os.getpid(), t["pid"], "should run in a worker process")
+
+    def test_trace(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "trace.json")
+            pool = JobPool(self.network, trace=path)
+            self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+            pool.execute()
+            pool = JobPool(self.network, trace=path)
+            pool.queue(lambda scaffold: None)
+            pool.execute()
+            with open(path, "r") as f:
+                events = json.load(f)["traceEvents"]
+        self.assertEqual(5, len(events), "should trace the jobs of both pools")
+        self.assertEqual(
+            ["X"] * 5, [e["ph"] for e in events], "should be complete events"
+        )
+        self.assertEqual([25] * 4 + [0], [e["args"]["rows"] for e in events])
+        self.assertEqual("ch4_c25", events[0]["name"])
+
+
+@unittest.skipIf(MPI.get_size() > 1, "Local backends are not used under MPI.")
+class TestJobPolicy(
+    FixedPosConfigFixture,
+    RandomStorageFixture,
+    NumpyTestCase,
+    unittest.TestCase,
+    engine_name="hdf5",
+):
+    def setUp(self):
+        super().setUp()
+        self.network = Scaffold(self.cfg, self.storage)
+
+    def test_config(self):
+        policy = self.network.placement.ch4_c25.policy
+        self.assertEqual(0, policy.retries, "should not retry by default")
+        self.assertEqual("abort", policy.on_failure, "should abort by default")
+        self.network.placement.ch4_c25.policy = dict(retries=2, on_failure="skip")
+        pool = JobPool(self.network)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        self.assertTrue(all(j._policy.retries == 2 for j in pool._queue))
+
+    def test_retry(self):
+        for backend in ("serial", "threads"):
+            with self.subTest(backend=backend):
+                pool = JobPool(self.network, backend=backend, workers=2)
+                attempts = []
+
+                def flaky(scaffold):
+                    attempts.append(1)
+                    if len(attempts) < 3:
+                        raise RuntimeError("flaky")
+
+                job = pool.queue(flaky)
+                job._policy = JobPolicy(retries=2)
+                with self.assertWarns(UserWarning):
+                    pool.execute()
+                self.assertEqual(3, len(attempts), "should retry until it succeeds")
+
+    def test_abort(self):
+        for backend in ("serial", "processes"):
+            with self.subTest(backend=backend):
+                pool = JobPool(self.network, backend=backend, workers=2)
+                job = pool.queue(_fail)
+                job._policy = JobPolicy(retries=1)
+                with self.assertRaises(RuntimeError), self.assertWarns(UserWarning):
+                    pool.execute()
+
+    def test_skip(self):
+        for backend in ("serial", "processes"):
+            with self.subTest(backend=backend):
+                completed = []
+                pool = JobPool(
+                    self.network,
+                    listeners=[completed.append],
+                    backend=backend,
+                    workers=2,
+                )
+                job = pool.queue(_fail)
+                job._policy = JobPolicy(on_failure="skip")
+                pool.queue(_succeed)
+                with self.assertWarns(UserWarning):
+                    pool.execute()
+                self.assertEqual(2, len(completed), "should continue after skipping")
+                self.assertTrue(job.telemetry["skipped"], "should report the skip")
+                self.assertIn("job failed", job.telemetry["error"])
+
+    def test_timeout(self):
+        pool = JobPool(self.network, backend="threads", workers=2)
+        job = pool.queue(lambda scaffold: time.sleep(3))
+        job._policy = JobPolicy(timeout=0.5, on_failure="skip")
+        start = time.time()
+        with self.assertWarns(UserWarning):
+            pool.execute()
+        self.assertLess(time.time() - start, 3, "should not wait for the timed out job")
+        self.assertIn("timed out", job.telemetry["error"])
+
+    def test_timeout_processes(self):
+        pool = JobPool(self.network, backend="processes", workers=2)
+        job = pool.queue(_write_and_hang)
+        job._policy = JobPolicy(timeout=0.5, retries=1, on_failure="skip")
+        start = time.time()
+        with self.assertWarns(UserWarning):
+            pool.execute()
+        self.assertLess(time.time() - start, 5, "should stop the timed out attempts")
+        self.assertIn("timed out", job.telemetry["error"])
+        for _ in range(20):
+            if not multiprocessing.active_children():
+                break
+            time.sleep(0.1)
+        self.assertEqual([], multiprocessing.active_children(), "workers left running")
+        ps = self.network.get_placement_set("test_cell")
+        self.assertEqual(0, len(ps), "timed out attempts should not write data")
+
+    def test_terminate_stuck_process(self):
+        pool = JobPool(self.network, backend="processes", workers=2)
+        job = pool.queue(_hang_without_alarms)
+        job._policy = JobPolicy(timeout=0.5, on_failure="skip")
+        start = time.time()
+        with self.assertWarns(UserWarning):
+            pool.execute()
+        self.assertLess(time.time() - start, 5, "should not wait for the stuck worker")
+        for _ in range(20):
+            if not multiprocessing.active_children():
+                break
+            time.sleep(0.1)
+        self.assertEqual([], multiprocessing.active_children(), "stuck worker left")
+
+    def test_interrupt_thread(self):
+        pool = JobPool(self.network, backend="threads", workers=2)
+        stopped = []
+
+        def spin(scaffold):
+            try:
+                while True:
+                    time.sleep(0.01)
+            finally:
+                stopped.append(1)
+
+        job = pool.queue(spin)
+        job._policy = JobPolicy(timeout=0.5, on_failure="skip")
+        with self.assertWarns(UserWarning):
+            pool.execute()
+        time.sleep(0.1)
+        self.assertEqual([1], stopped, "timed out thread should be interrupted")
+
+    def test_retry_discards_writes(self):
+        pool = JobPool(self.network, backend="threads", workers=2)
+        attempts = []
+        chunk = Chunk([0, 0, 0], [100] * 3)
+
+        def flaky(scaffold):
+            attempts.append(1)
+            ps = scaffold.cell_types.test_cell.get_placement_set()
+            for _ in range(5):
+                scaffold.storage.append_data(ps, chunk, np.zeros((1, 3)))
+            if len(attempts) < 2:
+                raise RuntimeError("flaky")
+
+        job = pool.queue(flaky)
+        job._policy = JobPolicy(retries=1)
+        # Flush the write buffer on every append.
+        options.write_buffer = 1
+        try:
+            with self.assertWarns(UserWarning):
+                pool.execute()
+        finally:
+            del options.write_buffer
+        ps = self.network.get_placement_set("test_cell")
+        self.assertEqual(5, len(ps), "failed attempt should not write data")
+
+
+class _EventSink(ProgressSink):
+    def __init__(self):
+        self.events = []
+
+    def on_start(self, progress):
+        self.events.append("start")
+
+    def on_event(self, progress, event, job):
+        self.events.append(event)
+
+    def on_end(self, progress):
+        self.events.append("end")
+
+
+@unittest.skipIf(MPI.get_size() > 1, "Local backends are not used under MPI.")
+class TestJobProgress(
+    FixedPosConfigFixture,
+    RandomStorageFixture,
+    NumpyTestCase,
+    unittest.TestCase,
+    engine_name="hdf5",
+):
+    def setUp(self):
+        super().setUp()
+        self.network = Scaffold(self.cfg, self.storage)
+
+    def test_progress(self):
+        for backend in ("serial", "threads", "processes"):
+            with self.subTest(backend=backend):
+                sink = _EventSink()
+                pool = JobPool(self.network, backend=backend, workers=2, progress=[sink])
+                self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+                pool.execute()
+                progress = pool.progress
+                self.assertEqual(4, progress.total)
+                self.assertEqual(4, progress.finished, "should count finished jobs")
+                self.assertEqual(0, len(progress.running), "no jobs should be running")
+                self.assertTrue(progress.is_done())
+                self.assertEqual("start", sink.events[0])
+                self.assertEqual("end", sink.events[-1])
+                self.assertEqual(4, sink.events.count("dispatched"))
+                self.assertEqual(4, sink.events.count("finished"))
+
+    def test_failed_progress(self):
+        sink = _EventSink()
+        pool = JobPool(self.network, backend="processes", workers=2, progress=[sink])
+        pool.queue(_fail)
+        with self.assertRaises(RuntimeError):
+            pool.execute()
+        self.assertEqual(1, pool.progress.failed, "should count failed jobs")
+        self.assertIn("failed", sink.events)
+
+    def test_json_sink(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "progress.jsonl")
+            pool = JobPool(
+                self.network,
+                backend="threads",
+                workers=2,
+                progress=create_progress_sinks(f"json:{path}"),
+            )
+            self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+            pool.execute()
+            with open(path, "r") as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(10, len(lines), "should write start, 8 job events and end")
+        self.assertEqual("end", lines[-1]["event"])
+        self.assertEqual(4, lines[-1]["finished"])
+        self.assertIn("ch4_c25", lines[1]["job"])
+
+    def test_sink_spec(self):
+        self.assertEqual([], create_progress_sinks(None))
+        self.assertEqual(2, len(create_progress_sinks("log,json")))
+        with self.assertRaises(JobPoolError):
+            create_progress_sinks("carrier_pigeons")
+
+
+@unittest.skipIf(MPI.get_size() > 1, "Journal is tested without MPI.")
+class TestJobJournal(
+    FixedPosConfigFixture,
+    RandomStorageFixture,
+    NumpyTestCase,
+    unittest.TestCase,
+    engine_name="hdf5",
+):
+    def setUp(self):
+        super().setUp()
+        self.network = Scaffold(self.cfg, self.storage)
+
+    def test_journal(self):
+        self.network.compile(resume=True)
+        journal = JobJournal(self.network.files, resume=True)
+        self.assertEqual(4, len(journal), "should journal each placement job")
+        self.assertIn(f"placement/ch4_c25/{self.chunks[0].id}", journal)
+        journal = JobJournal(self.network.files)
+        self.assertEqual(0, len(journal), "new journal should start empty")
+        journal.flush()
+        journal = JobJournal(self.network.files, resume=True)
+        self.assertEqual(0, len(journal), "new journal should overwrite the stored one")
+
+    def test_resume(self):
+        self.network.compile(resume=True)
+        # Drop a chunk from the journal, as if the compilation was interrupted.
+        journal = JobJournal(self.network.files, resume=True)
+        journal.discard(f"placement/ch4_c25/{self.chunks[0].id}")
+        journal.flush()
+        completed = []
+        pool = JobPool(self.network, listeners=[completed.append], journal=journal)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        pool.execute()
+        self.assertEqual(4, len(completed), "skipped jobs should complete")
+        ps = self.network.get_placement_set("test_cell")
+        self.assertEqual(100, len(ps), "unfinished chunk should be cleared and redone")
+        self.assertEqual(4, len(JobJournal(self.network.files, resume=True)))
+
+    def test_no_journal(self):
+        self.network.compile()
+        self.assertFalse(
+            self.network.files.has(JobJournal.file_id), "should only journal on resume"
+        )
+
+    def test_resume_compile(self):
+        self.network.compile(resume=True)
+        self.network.compile(resume=True)
+        ps = self.network.get_placement_set("test_cell")
+        self.assertEqual(100, len(ps), "completed compilation should be skipped")
+        with self.assertRaises(InputError):
+            self.network.compile(resume=True, clear=True)
+
+
+@unittest.skipIf(MPI.get_size() > 1, "Local backends are not used under MPI.")
+class TestChunkDependencies(
+    FixedPosConfigFixture,
+    RandomStorageFixture,
+    NumpyTestCase,
+    unittest.TestCase,
+    engine_name="hdf5",
+):
+    def setUp(self):
+        super().setUp()
+        self.cfg.connectivity.add(
+            "all_to_all",
+            dict(
+                strategy="bsb.connectivity.AllToAll",
+                presynaptic=dict(cell_types=["test_cell"]),
+                postsynaptic=dict(cell_types=["test_cell"]),
+            ),
+        )
+        self.network = Scaffold(self.cfg, self.storage)
+
+    def test_roi_deps(self):
+        pool = JobPool(self.network)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        jobs = {job._c.id: job for job in pool._queue}
+        pre, post = self.chunks[0], self.chunks[3]
+        strategy = self.network.connectivity.all_to_all
+        job = pool.queue_connectivity(strategy, [pre], [post])
+        self.assertEqual(
+            {jobs[pre.id], jobs[post.id]},
+            job._deps,
+            "should only depend on the placement of the chunks in the ROI",
+        )
+
+    def test_connectivity_key(self):
+        pool = JobPool(self.network)
+        strategy = self.network.connectivity.all_to_all
+        pre = [self.chunks[0]]
+        keys = {
+            pool.queue_connectivity(strategy, pre, [post]).get_key()
+            for post in self.chunks
+        }
+        self.assertEqual(4, len(keys), "jobs with different post ROI should differ")
+
+    def test_queued_chunks(self):
+        pool = JobPool(self.network)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        self.network.connectivity.all_to_all.queue(pool)
+        self.assertEqual(8, len(pool._queue), "should queue a job per queued pre chunk")
+
+    def test_queued_connectivity_cost(self):
+        pool = JobPool(self.network)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        self.network.connectivity.all_to_all.queue(pool)
+        costs = [j.get_cost(pool) for j in pool._queue if isinstance(j, ConnectivityJob)]
+        self.assertEqual([25 * 100] * 4, costs, "should estimate the unplaced cells")
+
+    def test_overlap(self):
+        self.network.run_placement_and_connectivity()
+        self.assertEqual(100, len(self.network.get_placement_set("test_cell")))
+        cs = self.network.get_connectivity_set("all_to_all")
+        self.assertEqual(100 * 100, len(cs), "should connect all to all")
+
+    def test_completed_deps(self):
+        pool = JobPool(self.network, backend="threads", workers=2)
+        dep = pool.queue(_succeed)
+        pool.execute()
+        completed = []
+        pool = JobPool(self.network, listeners=[completed.append], backend="threads")
+        job = pool.queue(_succeed, deps=[dep])
+        self.assertEqual(set(), job._deps, "completed deps should be discarded")
+        pool.execute()
+        self.assertEqual([job], completed, "job should run after completed deps")
+
+    def test_late_after_early(self):
+        # A strategy that connects after placement, that comes after one that connects
+        # during placement, depends on jobs of the earlier pool.
+        self.cfg.connectivity.add(
+            "late",
+            dict(
+                strategy="bsb.connectivity.AllToAll",
+                presynaptic=dict(cell_types=["test_cell"]),
+                postsynaptic=dict(cell_types=["test_cell"]),
+                after=["all_to_all"],
+            ),
+        )
+        self.network.connectivity.late.roi_before_placement = False
+        options.pool_backend = "threads"
+        try:
+            self.network.run_placement_and_connectivity()
+        finally:
+            del options.pool_backend
+        cs = self.network.get_connectivity_set("late")
+        self.assertEqual(100 * 100, len(cs), "should connect all to all")
+
+    def test_threaded_overlap(self):
+        pool = JobPool(self.network, backend="threads", workers=4)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        self.network.connectivity.all_to_all.queue(pool)
+        pool.execute()
+        cs = self.network.get_connectivity_set("all_to_all")
+        self.assertEqual(100 * 100, len(cs), "should connect all to all")
+
+
+@unittest.skipIf(MPI.get_size() > 1, "Local backends are not used under MPI.")
+class TestResumeConnectivity(
+    FixedPosConfigFixture,
+    RandomStorageFixture,
+    NumpyTestCase,
+    unittest.TestCase,
+    engine_name="fs",
+):
+    def setUp(self):
+        super().setUp()
+        self.cfg.connectivity.add(
+            "all_to_all",
+            dict(
+                strategy="bsb.connectivity.AllToAll",
+                presynaptic=dict(cell_types=["test_cell"]),
+                postsynaptic=dict(cell_types=["test_cell"]),
+            ),
+        )
+        self.network = Scaffold(self.cfg, self.storage)
+
+    def test_resume_connectivity(self):
+        self.network.compile(resume=True)
+        # Drop a placement chunk from the journal, as if the compilation was interrupted.
+        journal = JobJournal(self.network.files, resume=True)
+        self.assertEqual(8, len(journal), "should journal placement and connectivity")
+        journal.discard(f"placement/ch4_c25/{self.chunks[0].id}")
+        pool = JobPool(self.network, journal=journal)
+        self.network.placement.ch4_c25.queue(pool, self.chunk_size)
+        self.network.connectivity.all_to_all.queue(pool)
+        pool.execute()
+        redone = [job for job in pool._executed if isinstance(job, ConnectivityJob)]
+        self.assertEqual(4, len(redone), "connections to the chunk should be redone")
+        cs = self.network.get_connectivity_set("all_to_all")
+        self.assertEqual(100 * 100, len(cs), "connections should be cleared and redone")
+
+    def test_resume_unjournaled_connectivity(self):
+        self.network.compile(resume=True)
+        # A connectivity job that wrote its connections, and another that partially
+        # wrote them, before the compilation was killed and their keys were journaled.
+        strategy = self.network.connectivity.all_to_all
+        journal = JobJournal(self.network.files, resume=True)
+        pool = JobPool(self.network, journal=journal)
+        strategy.queue(pool)
+        for job in pool._queue[:2]:
+            journal.discard(job.get_key())
+        cs = self.network.get_connectivity_set("all_to_all")
+        locs = np.zeros((10, 3), dtype=int)
+        cs.chunk_connect(self.chunks[0], self.chunks[1], locs, locs)
+        journal.flush()
+        self.network.compile(resume=True)
+        cs = self.network.get_connectivity_set("all_to_all")
+        self.assertEqual(100 * 100, len(cs), "resumed connections duplicated")
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from bsb.cell_types import CellType
+from bsb.core import Scaffold
+from bsb.exceptions import JobPoolError
+from bsb.morphologies import Branch, Morphology, MorphologySet
+from bsb.services import JobPool
+from bsb.storage import Chunk, FileDependency, Storage
+from bsb.unittest import NumpyTestCase, RandomStorageFixture
+from bsb.unittest.engines import (
+    TestStorage as _TestStorage,
+    TestPlacementSet as _TestPlacementSet,
+    TestConnectivitySet as _TestConnectivitySet,
+    TestMorphologyRepository as _TestMorphologyRepository,
+)
+
+
+class TestStorage(_TestStorage, unittest.TestCase, engine_name="memory"):
+    def test_not_on_disk(self):
+        self.assertTrue(self.storage.exists())
+        self.assertFalse(os.path.exists(self.storage.root))
+
+
+class TestPlacementSet(_TestPlacementSet, unittest.TestCase, engine_name="memory"):
+    pass
+
+
+class TestMorphologyRepository(
+    _TestMorphologyRepository, unittest.TestCase, engine_name="memory"
+):
+    def test_load_copy(self):
+        self.mr.save("A", Morphology([Branch(np.zeros((3, 3)), np.ones(3))]))
+        self.mr.load("A").points[:] = 1
+        self.assertClose(0, self.mr.load("A").points, "stored morphology changed")
+
+
+class TestConnectivitySet(_TestConnectivitySet, unittest.TestCase, engine_name="memory"):
+    def test_stats_cache(self):
+        cs = self.network.get_connectivity_set("all_to_all")
+        stats = cs.stats()
+        self.assertIs(stats, cs.stats(), "stats should be cached")
+        cs.clear()
+        self.assertEqual(0, len(cs.stats()), "clear should invalidate the stats")
+
+    def test_load_copy(self):
+        cs = self.network.get_connectivity_set("all_to_all")
+        lchunk = cs.get_local_chunks("out")[0]
+        gchunk = cs.get_global_chunks("out", lchunk)[0]
+        local_locs, _ = cs.load_block_connections("out", lchunk, gchunk)
+        local_locs[:, 0] += 100
+        self.assertClose(
+            local_locs[:, 0] - 100,
+            cs.load_block_connections("out", lchunk, gchunk)[0][:, 0],
+        )
+
+    def test_processes_backend(self):
+        pool = JobPool(self.network, backend="processes")
+        pool.queue(print)
+        with self.assertRaises(JobPoolError):
+            pool.execute()
+
+
+class TestFileStore(RandomStorageFixture, unittest.TestCase, engine_name="memory"):
+    def test_streams(self):
+        files = self.storage.files
+        with files.open_write("a", encoding="utf-8") as f:
+            f.write("hello".encode())
+        self.assertEqual(("hello", {}), files.load("a"))
+        with files.open_read("a") as f:
+            self.assertEqual(b"hello", f.read())
+        self.assertIsNone(files.get_local_path("a"))
+
+    def test_provide_locally(self):
+        with tempfile.TemporaryDirectory() as dir:
+            source = os.path.join(dir, "data.txt")
+            with open(source, "w") as f:
+                f.write("hello")
+            file = FileDependency(source, file_store=self.storage.files)
+            file.update()
+        with file.provide_locally() as (path, encoding):
+            with open(path, "rb") as f:
+                self.assertEqual(b"hello", f.read())
+
+
+class TestPersist(
+    RandomStorageFixture, NumpyTestCase, unittest.TestCase, engine_name="memory"
+):
+    def setUp(self):
+        super().setUp()
+        self.ct = CellType(name="test_cell", spatial=dict(radius=2, count=10))
+        self.chunks = [Chunk([0, 0, 0], [100] * 3), Chunk([1, 0, 0], [100] * 3)]
+        self.morpho = Morphology([Branch(np.ones((4, 3)), np.ones(4))])
+        self.storage.morphologies.save("A", self.morpho)
+        ps = self.storage.require_placement_set(self.ct)
+        loaders = [self.storage.morphologies.preload("A")]
+        for i, chunk in enumerate(self.chunks):
+            ps.append_data(
+                chunk,
+                np.full((5, 3), i, dtype=float),
+                MorphologySet(loaders, np.zeros(5, dtype=int)),
+                np.full((5, 3), 10.0 * i),
+                additional={"radius": np.arange(5)},
+            )
+        ps.label(["tagged"], [1, 7])
+        cs = self.storage.require_connectivity_set(self.ct, self.ct, "loop")
+        cs.chunk_connect(self.chunks[0], self.chunks[1], [[0, -1, -1]], [[4, -1, -1]])
+        self.storage.files.store("hello", id="greeting", meta={"x": 1})
+
+    def test_copy_to_fs(self):
+        with tempfile.TemporaryDirectory() as dir:
+            root = os.path.join(dir, "network")
+            copy = self.storage.copy(root, engine="fs")
+            self.assertEqual("fs", copy.format)
+            fs = Storage("fs", root, missing_ok=False)
+            ps = fs.get_placement_set(self.ct)
+            self.assertClose(
+                self.storage.get_placement_set(self.ct).load_positions(),
+                ps.load_positions(),
+            )
+            self.assertClose(np.repeat([0, 10], 5), np.array(ps.load_rotations())[:, 0])
+            self.assertClose(np.tile(np.arange(5), 2), ps.load_additional("radius"))
+            self.assertClose([1, 7], ps.get_labelled(["tagged"]))
+            self.assertEqual(self.morpho, ps.load_morphologies().get(0))
+            cs = fs.get_connectivity_set("loop")
+            self.assertEqual(1, len(cs))
+            self.assertClose(
+                [[4, -1, -1]], cs.load_local_connections("inc", self.chunks[1])[0]
+            )
+            self.assertEqual(("hello", {"x": 1}), fs.files.load("greeting"))
+            self.assertTrue(self.storage.exists(), "copy should keep the original")
+
+    def test_copy_to_memory(self):
+        copy = self.storage.copy(self.storage.root + "_copy")
+        self.addCleanup(copy.remove)
+        self.assertEqual("memory", copy.format)
+        self.assertEqual(10, len(copy.get_placement_set(self.ct)))
+        with self.assertRaises(FileExistsError):
+            self.storage.copy(copy.root)
@@ -325,6 +325,31 @@ class TestPlacementStrategies(
         self.assertAll(pos[:, 1] <= cfg.partitions.test_layer.data.mdc[1], "not in layer")
         self.assertAll(pos[:, 1] >= cfg.partitions.test_layer.data.ldc[1], "not in layer")
 
+    def test_parallel_arrays_connectivity(self):
+        # The single placement job places cells in many chunks, so the cells can only be
+        # connected after the placement.
+        cfg = from_json(get_config_path("test_single.json"))
+        cfg.network.chunk_size = 30
+        network = Scaffold(cfg, self.storage)
+        cfg.placement["test_placement"] = dict(
+            strategy="bsb.placement.ParallelArrayPlacement",
+            cell_types=["test_cell"],
+            partitions=["test_layer"],
+            spacing_x=50,
+            angle=0,
+        )
+        cfg.connectivity["all_to_all"] = dict(
+            strategy="bsb.connectivity.AllToAll",
+            presynaptic=dict(cell_types=["test_cell"]),
+            postsynaptic=dict(cell_types=["test_cell"]),
+        )
+        network.compile(clear=True)
+        self.assertGreater(
+            len(network.get_placement_set("test_cell").get_all_chunks()), 1
+        )
+        cs = network.get_connectivity_set("all_to_all")
+        self.assertEqual(39 * 39, len(cs), "cells outside the first chunk not connected")
+
 
 class TestVoxelDensities(unittest.TestCase):
     def test_particle_vd(self):
@@ -1,5 +1,109 @@
 import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from bsb.cell_types import CellType
+from bsb.storage import Chunk
+from bsb.storage._cache import DatasetCache
+from bsb.unittest import NumpyTestCase, RandomStorageFixture
 
 
 class TestUtil(unittest.TestCase):
     pass
+
+
+class TestDatasetCache(NumpyTestCase, unittest.TestCase):
+    def setUp(self):
+        self.cache = DatasetCache(budget=200)
+        self.engine = type("Engine", (), {"format": "fs", "root": "net"})()
+        self.chunk = Chunk([0, 0, 0], None)
+
+    def load(self, dataset, token=0, n=10):
+        return self.cache.get(
+            self.engine, "A", self.chunk, dataset, token, lambda: np.arange(n)
+        )
+
+    def test_hit(self):
+        data = self.load("a")
+        self.assertFalse(data.flags.writeable, "cached data should be read-only")
+        self.assertIs(data, self.load("a"))
+        self.assertIsNot(data, self.load("a", token=1), "changed token should reload")
+        self.cache.invalidate(self.engine, "A", [self.chunk])
+        self.assertEqual(0, len(self.cache))
+
+    def test_lru(self):
+        a = self.load("a")
+        self.load("b")
+        self.load("a")
+        self.load("c")
+        self.assertEqual(160, len(self.cache))
+        self.assertIs(a, self.load("a"), "recently used dataset evicted")
+        self.load("d", n=100)
+        self.assertEqual(160, len(self.cache), "datasets over budget shouldn't be kept")
+        self.cache.resize(0)
+        self.assertEqual(0, len(self.cache))
+        self.assertTrue(self.load("a").flags.writeable, "0 budget should disable cache")
+
+
+class TestWriteBuffer(
+    RandomStorageFixture, NumpyTestCase, unittest.TestCase, engine_name="memory"
+):
+    def setUp(self):
+        super().setUp()
+        self.ct = CellType(name="test_cell", spatial=dict(radius=2, count=10))
+        self.ps = self.storage.require_placement_set(self.ct)
+        self.chunks = [Chunk([0, 0, 0], [100] * 3), Chunk([1, 0, 0], [100] * 3)]
+
+    def test_bulk_append(self):
+        with patch.object(self.ps, "append_data", wraps=self.ps.append_data) as spy:
+            with self.storage.buffered():
+                for i in range(10):
+                    self.storage.append_data(
+                        self.ps,
+                        self.chunks[i % 2],
+                        np.full((2, 3), i),
+                        additional={"i": np.full(2, i)},
+                    )
+                self.assertEqual(0, len(self.ps), "appends should be buffered")
+            self.assertEqual(2, spy.call_count, "expected 1 append per chunk")
+        self.assertEqual(20, len(self.ps))
+        self.assertClose(
+            [0, 0, 2, 2, 4, 4, 6, 6, 8, 8], self.ps.load_additional("i")[:10]
+        )
+
+    def test_budget(self):
+        with self.storage.buffered(budget=100):
+            self.storage.append_data(self.ps, self.chunks[0], np.zeros((2, 3)))
+            self.assertEqual(0, len(self.ps), "budget not exceeded yet")
+            self.storage.append_data(self.ps, self.chunks[0], np.zeros((4, 3)))
+            self.assertEqual(6, len(self.ps), "exceeded budget should flush")
+
+    def test_discard_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.storage.buffered():
+                self.storage.append_data(self.ps, self.chunks[0], np.zeros((2, 3)))
+                raise RuntimeError()
+        self.assertEqual(0, len(self.ps), "failed context should discard data")
+
+    def test_unbuffered(self):
+        self.storage.append_data(self.ps, self.chunks[0], np.zeros((2, 3)))
+        self.assertEqual(2, len(self.ps), "outside of a buffer, data is written")
+        with self.storage.buffered(budget=0):
+            self.storage.append_data(self.ps, self.chunks[0], np.zeros((2, 3)))
+            self.assertEqual(4, len(self.ps), "0 budget should disable buffer")
+
+    def test_connect(self):
+        self.storage.append_data(self.ps, self.chunks[0], np.zeros((2, 3)))
+        self.storage.append_data(self.ps, self.chunks[1], np.zeros((3, 3)))
+        cs = self.storage.require_connectivity_set(self.ct, self.ct, "buffered")
+        with self.storage.buffered():
+            with self.ps.chunk_context([self.chunks[1]]):
+                locs = np.array([[0, -1, -1], [2, -1, -1]])
+                self.storage.connect(cs, self.ps, self.ps, locs, locs)
+                locs[:] = 0
+            self.storage.connect(cs, self.ps, self.ps, [[0, -1, -1]], [[4, -1, -1]])
+            self.assertEqual(0, len(cs), "connections should be buffered")
+        self.assertEqual(3, len(cs))
+        src, _, dest = cs.load_local_connections("inc", self.chunks[1])
+        self.assertClose([0, 2, 2], sorted(src[:, 0]), "chunk context not restored")